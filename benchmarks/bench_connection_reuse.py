@@ -0,0 +1,157 @@
+"""
+Connection-reuse load test of the shared transport against a local mock server.
+
+A keep-alive HTTP/1.1 server stands in for the Inspeq and Anthropic APIs and
+counts the TCP connections it accepts. The same concurrent load is sent with
+the stock InspeqEval (requests.post, one connection per call) and through
+the SharedTransport pools.
+
+    python benchmarks/bench_connection_reuse.py --requests 2000 --threads 32
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse, json, logging, os, socket, sys, threading, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from inspeq.client import InspeqEval  # noqa: E402
+from transport import SharedTransport, TransportConfig  # noqa: E402
+
+INSPEQ_RESPONSE = json.dumps(
+    {
+        "status": 200,
+        "message": "All LLM evaluations successful",
+        "results": [
+            {
+                "metric_name": "RESPONSE_TONE_EVALUATION",
+                "score": 0.75,
+                "passed": True,
+                "evaluation_details": {"actual_value": 0.75, "threshold_score": 0.5},
+                "metrics_config": {"custom_labels": ["Negative", "Neutral", "Positive"]},
+                "metric_evaluation_status": "EVAL_COMPLETE",
+            }
+        ],
+        "remaining_credits": 1000,
+    }
+).encode()
+
+ANTHROPIC_RESPONSE = json.dumps(
+    {
+        "id": "msg_bench",
+        "type": "message",
+        "role": "assistant",
+        "model": "claude-3-5-sonnet-latest",
+        "content": [{"type": "text", "text": "Benchmark response."}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": 10, "output_tokens": 4},
+    }
+).encode()
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    lock = threading.Lock()
+    latency = 0.0
+
+    def setup(self):
+        super().setup()
+        # Headers and body are separate writes; avoid Nagle/delayed-ACK stalls
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with MockHandler.lock:
+            MockHandler.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.latency)
+        body = ANTHROPIC_RESPONSE if self.path.startswith("/v1/messages") else INSPEQ_RESPONSE
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def run_load(label, call, requests, threads):
+    MockHandler.connections = 0
+    latencies = []
+    start = time.perf_counter()
+
+    def one(_):
+        t = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - t)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(
+        f"{label:<36} {requests / elapsed:>9.0f} req/s "
+        f"p50 {latencies[len(latencies) // 2] * 1000:>6.2f} ms "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:>6.2f} ms "
+        f"{MockHandler.connections:>6} connections"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.002, help="Mock server latency (s)")
+    args = parser.parse_args(argv)
+
+    MockHandler.latency = args.latency
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    ThreadingHTTPServer.request_queue_size = 1024
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    input_data = [{"prompt": "p", "response": "r", "context": "c"}]
+    stock = InspeqEval(inspeq_api_key="bench", inspeq_project_id="bench", inspeq_api_url=url)
+    transport = SharedTransport(TransportConfig(max_connections=args.threads))
+    pooled = transport.inspeq_client("bench", "bench")
+    pooled.inspeq_api_url = url
+
+    from anthropic import Anthropic
+
+    claude = Anthropic(
+        api_key="bench", base_url=url, http_client=transport.anthropic_http_client()
+    )
+
+    print(f"{args.requests} requests, {args.threads} threads")
+    run_load(
+        "inspeq: stock requests.post",
+        lambda: stock.evaluate_llm_task(["RESPONSE_TONE"], input_data, "bench"),
+        args.requests,
+        args.threads,
+    )
+    run_load(
+        "inspeq: shared transport",
+        lambda: pooled.evaluate_llm_task(["RESPONSE_TONE"], input_data, "bench"),
+        args.requests,
+        args.threads,
+    )
+    run_load(
+        "anthropic: shared transport",
+        lambda: claude.messages.create(
+            model="claude-3-5-sonnet-latest",
+            max_tokens=16,
+            messages=[{"role": "user", "content": "hi"}],
+        ),
+        args.requests,
+        args.threads,
+    )
+    print(json.dumps(transport.stats(), indent=2))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
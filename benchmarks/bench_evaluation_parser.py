@@ -0,0 +1,173 @@
+"""
+Memory and parse-time comparison of the slotted MetricResult / lazy
+EvaluationParser against the previous dict-backed, eagerly parsed classes.
+
+    python benchmarks/bench_evaluation_parser.py --responses 20000 --metrics 5
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import argparse, gc, os, random, sys, time, tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from evaluation_parser import EvaluationParser  # noqa: E402
+
+
+@dataclass
+class LegacyMetricResult:
+    """MetricResult as it was before slots and tuple labels"""
+
+    metric_name: str
+    score: float
+    passed: bool
+    actual_value: str
+    labels: List[str]
+    threshold_score: str
+    custom_labels: List[str]
+    status: str
+    error_message: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "LegacyMetricResult":
+        evaluation_details = data.get("evaluation_details", {})
+        metrics_config = data.get("metrics_config", {})
+        try:
+            score = float(data.get("score", 0))
+        except (ValueError, TypeError):
+            score = 0.0
+        labels = evaluation_details.get("metric_labels", []) or []
+        if not isinstance(labels, list):
+            labels = [str(labels)]
+        return cls(
+            metric_name=data.get("metric_name", "UNKNOWN"),
+            score=score,
+            passed=data.get("passed", False),
+            actual_value=str(evaluation_details.get("actual_value", "N/A")),
+            labels=labels,
+            threshold_score=str(evaluation_details.get("threshold_score", "N/A")),
+            custom_labels=metrics_config.get("custom_labels", []),
+            status=data.get("metric_evaluation_status", "UNKNOWN"),
+            error_message=data.get("error_message"),
+        )
+
+
+class LegacyEvaluationParser:
+    """EvaluationParser as it was before lazy decoding"""
+
+    def __init__(self, evaluation_data: Dict):
+        self.status = evaluation_data.get("status", "UNKNOWN")
+        self.message = evaluation_data.get("message", "No message available")
+        self.remaining_credits = evaluation_data.get("remaining_credits", "N/A")
+        self.results = [
+            LegacyMetricResult.from_dict(result)
+            for result in evaluation_data.get("results", [])
+        ]
+
+    def get_failed_metrics(self):
+        return [r for r in self.results if not r.passed]
+
+
+METRICS = [
+    "RESPONSE_TONE",
+    "ANSWER_RELEVANCE",
+    "FACTUAL_CONSISTENCY",
+    "READABILITY",
+    "CLARITY",
+    "COHERENCE",
+    "TOXICITY",
+    "DATA_LEAKAGE",
+]
+
+
+def make_responses(count, metric_count, seed=7):
+    """Evaluation responses shaped like the Inspeq SDK's evaluate_llm_task output"""
+    rng = random.Random(seed)
+    responses = []
+    for _ in range(count):
+        results = []
+        for metric in METRICS[:metric_count]:
+            score = rng.random()
+            results.append(
+                {
+                    "metric_name": f"{metric}_EVALUATION",
+                    "score": f"{score:.4f}",
+                    "passed": score > 0.05,
+                    "evaluation_details": {
+                        "actual_value": score,
+                        "threshold_score": 0.5,
+                        "metric_labels": [rng.choice(["Positive", "Neutral", "Negative"])],
+                    },
+                    "metrics_config": {
+                        "custom_labels": ["Negative", "Neutral", "Positive"],
+                    },
+                    "metric_evaluation_status": "EVAL_COMPLETE",
+                }
+            )
+        responses.append(
+            {
+                "status": 200,
+                "message": "All LLM evaluations successful",
+                "results": results,
+                "remaining_credits": 1000,
+            }
+        )
+    return responses
+
+
+def measure(label, function):
+    # Time and memory are measured in separate runs, tracemalloc slows the code down
+    gc.collect()
+    start = time.perf_counter()
+    kept = function()
+    elapsed = time.perf_counter() - start
+    del kept
+
+    gc.collect()
+    tracemalloc.start()
+    kept = function()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<48} {elapsed * 1000:>9.1f} ms {current / 1024 / 1024:>9.2f} MiB")
+    del kept
+    return elapsed, current
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--responses", type=int, default=20000)
+    parser.add_argument("--metrics", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    responses = make_responses(args.responses, args.metrics)
+    print(
+        f"{args.responses} responses x {args.metrics} metrics\n"
+        f"{'scenario':<48} {'time':>12} {'retained':>13}"
+    )
+
+    legacy_full = measure(
+        "legacy: parse all results",
+        lambda: [LegacyEvaluationParser(r).results for r in responses],
+    )
+    lazy_full = measure(
+        "slotted/lazy: parse all results",
+        lambda: [EvaluationParser(r).results for r in responses],
+    )
+    legacy_failed = measure(
+        "legacy: any failed?",
+        lambda: [bool(LegacyEvaluationParser(r).get_failed_metrics()) for r in responses],
+    )
+    lazy_failed = measure(
+        "slotted/lazy: any failed? (has_failures)",
+        lambda: [EvaluationParser(r).has_failures() for r in responses],
+    )
+
+    print(
+        f"\nfull parse: {legacy_full[0] / lazy_full[0]:.2f}x faster, "
+        f"{legacy_full[1] / max(lazy_full[1], 1):.2f}x less memory retained"
+    )
+    print(f"failure check: {legacy_failed[0] / lazy_failed[0]:.2f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Cold-start benchmark for the Lambda handlers, the API and AIClient.
+
+Every target is imported in a fresh interpreter, `repeat` times, and the
+median is reported for two phases:
+
+  import  - loading the module (what a Lambda init / API worker boot pays)
+  init    - building the clients on first use (what the first invocation pays)
+
+With --check, exits non-zero when a median exceeds the target documented
+in benchmarks/README.md. --importtime NAME prints the slowest modules of
+one target, from `python -X importtime`.
+
+    python benchmarks/bench_import_time.py --repeat 5 --check
+    python benchmarks/bench_import_time.py --importtime api
+"""
+
+import argparse, os, statistics, subprocess, sys, tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SRC = os.path.join(ROOT, "src")
+LAMBDAS = os.path.join(SRC, "lambda_functions")
+
+# name: (sys.path entry, module, first-use statement, (import target ms, init target ms))
+TARGETS = {
+    "call_inspeq_preeval": (LAMBDAS, "call_inspeq_preeval", "m._get_client()", (10, 300)),
+    "call_inspeq_llm_evaluation": (
+        LAMBDAS,
+        "call_inspeq_llm_evaluation",
+        "m._get_client()",
+        (10, 300),
+    ),
+    "call_bedrock": (LAMBDAS, "call_bedrock", "m._get_client()", (20, 500)),
+    "call_guardrails": (LAMBDAS, "call_guardrails", "m._get_registry()", (20, 500)),
+    "ai_client": (SRC, "ai_client", "m.AIClient()", (60, 50)),
+    "api": (SRC, "api", "m.get_ai_client()", (700, 50)),
+}
+
+ENV = {
+    "AWS_DEFAULT_REGION": "us-east-1",
+    "CLAUDE_API_KEY": "bench",
+    "INSPEQ_API_KEY": "bench",
+    "INSPEQ_PROJECT_ID": "bench",
+    "INSPEQAPI": "bench",
+    "INSPEQPROJECT": "bench",
+    "GUARDRAIL_STATE_PATH": os.devnull,
+    "RESULTS_DIR": os.path.join(tempfile.gettempdir(), "bench_import_time"),
+}
+
+PROBE = """
+import importlib, sys, time
+sys.path.insert(0, {path!r})
+t = time.perf_counter()
+m = importlib.import_module({module!r})
+imported = time.perf_counter()
+{first_use}
+done = time.perf_counter()
+print((imported - t) * 1000, (done - imported) * 1000)
+"""
+
+
+def measure(name, repeat):
+    path, module, first_use, _ = TARGETS[name]
+    code = PROBE.format(path=path, module=module, first_use=first_use)
+    env = {**os.environ, **ENV}
+    imports, inits = [], []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True
+        ).stdout.split()
+        imports.append(float(output[-2]))
+        inits.append(float(output[-1]))
+    return statistics.median(imports), statistics.median(inits)
+
+
+def importtime(name, top):
+    """Slowest modules of one target by cumulative import time"""
+    path, module, _, _ = TARGETS[name]
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            f"import sys; sys.path.insert(0, {path!r}); import {module}",
+        ],
+        env={**os.environ, **ENV},
+        capture_output=True,
+        text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, package = line[len("import time:") :].split("|")
+        rows.append((int(cumulative), package.rstrip()))
+    for cumulative, package in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative / 1000:>9.1f} ms {package}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("targets", nargs="*", help=f"Any of {', '.join(TARGETS)} (default: all)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--check", action="store_true", help="Fail when a target is exceeded")
+    parser.add_argument("--importtime", metavar="TARGET", choices=list(TARGETS))
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args(argv)
+
+    unknown = set(args.targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"unknown targets: {', '.join(sorted(unknown))}")
+
+    if args.importtime:
+        importtime(args.importtime, args.top)
+        return 0
+
+    failures = []
+    print(f"{'target':<28} {'import':>9} {'init':>9} {'target import/init':>20}")
+    for name in args.targets or TARGETS:
+        import_ms, init_ms = measure(name, args.repeat)
+        import_target, init_target = TARGETS[name][3]
+        flag = ""
+        if import_ms > import_target or init_ms > init_target:
+            failures.append(name)
+            flag = "  over target"
+        print(
+            f"{name:<28} {import_ms:>7.1f}ms {init_ms:>7.1f}ms "
+            f"{import_target:>10}/{init_target:<4} ms{flag}"
+        )
+
+    if args.check and failures:
+        print(f"Cold start over target: {', '.join(failures)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+Time to score the lexical metrics in-process with LocalMetrics, on one
+process and across the process pool, against sending them to a stand-in
+Inspeq evaluator with the round-trip latency of the real API.
+
+    python benchmarks/bench_local_metrics.py --items 5000 --workers 4
+"""
+
+import argparse, os, random, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from local_metrics import LOCAL_METRICS, LocalMetrics, evaluate_batch  # noqa: E402
+from stand_ins import FakeInspeqEval  # noqa: E402
+
+WORDS = (
+    "bank regulation market capital reporting standard risk europe insurance "
+    "profile audience growth trend share digital payment climate liquidity"
+).split()
+
+
+def make_items(count, seed=7):
+    generator = random.Random(seed)
+    items = []
+    for _ in range(count):
+        context = " ".join(generator.choices(WORDS, k=300))
+        response = " ".join(generator.choices(WORDS, k=120))
+        items.append({"prompt": "Summarize the context", "context": context, "response": response})
+    return items
+
+
+def timed(label, function):
+    started = time.perf_counter()
+    results = function()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {elapsed * 1000:>10.0f} ms  {len(results):>8} results")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=250)
+    parser.add_argument(
+        "--latency", type=float, default=1.5, help="Stand-in Inspeq latency per call (s)"
+    )
+    args = parser.parse_args(argv)
+
+    metrics = list(LOCAL_METRICS)
+    items = make_items(args.items)
+    print(f"{args.items} items, {len(metrics)} metrics, {args.workers} workers")
+
+    remote = FakeInspeqEval(latency=args.latency)
+    timed(
+        "Inspeq (one item)",
+        lambda: remote.evaluate_llm_task(metrics_list=metrics, input_data=items[:1])["results"],
+    )
+    timed("local, one item", lambda: evaluate_batch(metrics, items[:1]))
+    single = timed("local, one process", lambda: evaluate_batch(metrics, items))
+
+    engine = LocalMetrics(
+        max_workers=args.workers, process_threshold=1, chunk_size=args.chunk_size
+    )
+    try:
+        timed("local, process pool (cold)", lambda: engine.evaluate(metrics, items))
+        pooled = timed("local, process pool (warm)", lambda: engine.evaluate(metrics, items))
+    finally:
+        engine.close()
+    assert [r["score"] for r in single] == [r["score"] for r in pooled]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+"""
+Offline benchmark of the evaluation pipeline against recorded upstream
+responses, compared with a stored baseline.
+
+Anthropic, Bedrock and Inspeq are replaced by the replaying clients in
+replay.py, which return the recordings in benchmarks/fixtures after the
+given latencies (multiplied by --scale, so a run takes seconds, not
+minutes). Every path runs the sample request from example-call.md:
+
+    parser         EvaluationParser over the recorded Inspeq responses, 100 per operation
+    sequential     AIClient.complete_evaluation_flow, one flow at a time
+    threads        AIClient flows on a thread pool
+    async          AsyncAIClient.acomplete_evaluation_flow, gathered
+    batched        async flows with Inspeq calls packed by BatchEvaluator
+    state_machine  state_machine.json with the Lambda handlers, run locally
+
+For each path the script reports throughput, p50/p95/p99 latency and the
+peak traced memory, then compares them with the baseline. A path slower or
+larger than the baseline by more than the tolerance fails the run.
+
+    python benchmarks/bench_pipeline.py                  # compare with the baseline
+    python benchmarks/bench_pipeline.py --save-baseline  # record a new baseline
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse, asyncio, contextlib, io, json, logging, os, sys, time, tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+# Credentials are never used, and a cache hit would skip the replayed calls
+for _name in ("CLAUDE_API_KEY", "INSPEQ_API_KEY", "INSPEQ_PROJECT_ID"):
+    os.environ.setdefault(_name, "offline-benchmark")
+os.environ["RESPONSE_CACHE"] = "false"
+
+from ai_client import AIClient  # noqa: E402
+from async_ai_client import AsyncAIClient  # noqa: E402
+from batch_evaluator import BatchEvaluator  # noqa: E402
+from evaluation_parser import EvaluationParser  # noqa: E402
+from local_state_machine import (  # noqa: E402
+    LocalStateMachine,
+    install_stand_ins,
+    load_handlers,
+    sns_publish,
+)
+from resilience import Resilience, UpstreamPolicy  # noqa: E402
+from result_sink import NullSink  # noqa: E402
+from speculation import Speculation, SpeculationPolicy  # noqa: E402
+from stand_ins import FakeBedrockControl, RecordingSNS  # noqa: E402
+
+from replay import (  # noqa: E402
+    FIXTURES,
+    ReplayAnthropic,
+    ReplayAsyncAnthropic,
+    ReplayBedrockRuntime,
+    ReplayInspeqEval,
+    load_fixture,
+    sample_request,
+)
+
+BASELINE = os.path.join(FIXTURES, "baseline.json")
+STATE_MACHINE = os.path.join(os.path.dirname(__file__), "..", "state_machine.json")
+PROMPT_METRICS = ["DATA_LEAKAGE"]
+RESPONSE_METRICS = ["ANSWER_RELEVANCE", "FACTUAL_CONSISTENCY"]
+PARSER_BATCH = 100
+PATHS = ("parser", "sequential", "threads", "async", "batched", "state_machine")
+
+
+def percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * percent / 100))
+    return sorted_values[index]
+
+
+class Pipeline:
+    """Builds fresh clients for each path so no path inherits another's state"""
+
+    def __init__(self, args):
+        self.args = args
+        self.request = sample_request()
+
+    def latency(self, name):
+        return getattr(self.args, f"{name}_latency") * self.args.scale
+
+    def jitter(self, name):
+        return self.latency(name) * self.args.jitter
+
+    def inspeq(self):
+        return ReplayInspeqEval(
+            latency=self.latency("inspeq"),
+            jitter=self.jitter("inspeq"),
+            per_metric=self.args.inspeq_per_metric * self.args.scale,
+        )
+
+    def client(self, cls, **kwargs):
+        # The limiter would otherwise cap the replayed upstreams at their production rates
+        unlimited = UpstreamPolicy(rate=1e6, burst=10**6, max_rate=1e7)
+        client = cls(
+            result_sink=NullSink(),  # disk speed stays out of the numbers
+            resilience=Resilience({"anthropic": unlimited, "inspeq": unlimited}),
+            speculation=Speculation(SpeculationPolicy.from_env()),
+            **kwargs,
+        )
+        client.inspeq_eval = self.inspeq()
+        if isinstance(client, AsyncAIClient):
+            client.async_claude_client = ReplayAsyncAnthropic(
+                self.latency("anthropic"), self.jitter("anthropic")
+            )
+        else:
+            client.claude_client = ReplayAnthropic(
+                self.latency("anthropic"), self.jitter("anthropic")
+            )
+        return client
+
+    def flow(self, client):
+        started = time.perf_counter()
+        result = client.complete_evaluation_flow(
+            prompt=self.request["prompt"],
+            context=self.request["context"],
+            prompt_metrics=PROMPT_METRICS,
+            response_metrics=RESPONSE_METRICS,
+            retry_delay=0,
+        )
+        if "error" in result:
+            raise RuntimeError(f"Flow failed: {result['error']}")
+        return time.perf_counter() - started
+
+    def run_parser(self):
+        responses = [
+            load_fixture("inspeq_prompt_evaluation.json"),
+            load_fixture("inspeq_response_evaluation.json"),
+        ]
+        # One operation is PARSER_BATCH parses; single parses are too short to time steadily
+        latencies = []
+        for _ in range(self.args.parses // PARSER_BATCH):
+            started = time.perf_counter()
+            for i in range(PARSER_BATCH):
+                parser = EvaluationParser(responses[i % 2])
+                parser.has_failures()
+                parser.results
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    def run_sequential(self):
+        client = self.client(AIClient)
+        return [self.flow(client) for _ in range(self.args.flows)]
+
+    def run_threads(self):
+        client = self.client(AIClient)
+        with ThreadPoolExecutor(max_workers=self.args.concurrency) as pool:
+            return list(pool.map(lambda _: self.flow(client), range(self.args.concurrent_flows)))
+
+    async def _gather(self, client):
+        slots = asyncio.Semaphore(self.args.concurrency)
+
+        async def flow():
+            async with slots:
+                started = time.perf_counter()
+                result = await client.acomplete_evaluation_flow(
+                    prompt=self.request["prompt"],
+                    context=self.request["context"],
+                    prompt_metrics=PROMPT_METRICS,
+                    response_metrics=RESPONSE_METRICS,
+                    retry_delay=0,
+                )
+                if "error" in result:
+                    raise RuntimeError(f"Flow failed: {result['error']}")
+                return time.perf_counter() - started
+
+        try:
+            return await asyncio.gather(*(flow() for _ in range(self.args.concurrent_flows)))
+        finally:
+            await client.aclose()
+
+    def run_async(self):
+        client = self.client(AsyncAIClient, max_workers=self.args.concurrency)
+        return asyncio.run(self._gather(client))
+
+    def run_batched(self):
+        client = self.client(AsyncAIClient, max_workers=self.args.concurrency)
+        evaluator = BatchEvaluator(client.inspeq_eval)
+        client.inspeq_eval = evaluator
+        try:
+            return asyncio.run(self._gather(client))
+        finally:
+            evaluator.close()
+
+    def run_state_machine(self):
+        handlers, modules = load_handlers()
+        install_stand_ins(
+            modules,
+            inspeq=self.inspeq(),
+            bedrock_runtime=ReplayBedrockRuntime(self.latency("bedrock"), self.jitter("bedrock")),
+            bedrock_control=FakeBedrockControl(latency=0),
+        )
+        machine = LocalStateMachine(
+            STATE_MACHINE,
+            handlers=handlers,
+            services={"arn:aws:states:::sns:publish": sns_publish(RecordingSNS())},
+        )
+        execution_input = {
+            **self.request,
+            "prompt_metrics": PROMPT_METRICS,
+            "response_metrics": RESPONSE_METRICS,
+        }
+        # The handlers print their results for CloudWatch
+        with contextlib.redirect_stdout(io.StringIO()):
+            executions = machine.execute_many(
+                [execution_input] * self.args.executions, concurrency=self.args.concurrency
+            )
+        failed = [e for e in executions if e.status != "SUCCEEDED"]
+        if failed:
+            raise RuntimeError(f"Execution failed: {failed[0].error} {failed[0].cause}")
+        return [execution.duration for execution in executions]
+
+
+def measure(pipeline, path):
+    tracemalloc.start()
+    started = time.perf_counter()
+    latencies = sorted(getattr(pipeline, f"run_{path}")())
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "operations": len(latencies),
+        "throughput_per_s": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 4),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 4),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 4),
+        "peak_memory_kib": round(peak / 1024, 1),
+    }
+
+
+def compare(results, baseline, tolerance, memory_tolerance):
+    """Lines describing every metric outside its tolerance; empty when nothing regressed"""
+    regressions = []
+    for path, current in results.items():
+        previous = baseline.get(path)
+        if previous is None:
+            continue
+        checks = [("throughput_per_s", -1, tolerance)]
+        checks += [(key, 1, tolerance) for key in ("p50_ms", "p95_ms", "p99_ms")]
+        checks.append(("peak_memory_kib", 1, memory_tolerance))
+        for key, direction, allowed in checks:
+            before, after = previous[key], current[key]
+            if before <= 0:
+                continue
+            change = (after - before) / before
+            if change * direction > allowed:
+                regressions.append(
+                    f"{path:<14} {key:<16} {before:>12} -> {after:<12} ({change:+.0%}, "
+                    f"tolerance {allowed:.0%})"
+                )
+    return regressions
+
+
+def config(args) -> dict:
+    """The settings a baseline is only comparable under"""
+    return {
+        key: getattr(args, key)
+        for key in (
+            "scale",
+            "anthropic_latency",
+            "bedrock_latency",
+            "inspeq_latency",
+            "inspeq_per_metric",
+            "jitter",
+            "flows",
+            "concurrent_flows",
+            "executions",
+            "parses",
+            "concurrency",
+        )
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="*", help=f"Paths to run (default: all of {', '.join(PATHS)})")
+    parser.add_argument("--scale", type=float, default=0.02, help="Multiplier for every latency")
+    parser.add_argument("--anthropic-latency", type=float, default=8.0)
+    parser.add_argument("--bedrock-latency", type=float, default=8.0)
+    parser.add_argument("--inspeq-latency", type=float, default=0.3)
+    parser.add_argument("--inspeq-per-metric", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.2, help="Jitter as a fraction of latency")
+    parser.add_argument("--flows", type=int, default=20)
+    parser.add_argument("--concurrent-flows", type=int, default=200)
+    parser.add_argument("--executions", type=int, default=50)
+    parser.add_argument("--parses", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--memory-tolerance", type=float, default=0.5)
+    parser.add_argument("--output", help="Also write the results as JSON to this file")
+    args = parser.parse_args(argv)
+    unknown = set(args.paths) - set(PATHS)
+    if unknown:
+        parser.error(f"unknown paths: {', '.join(sorted(unknown))}")
+
+    for name in ("ai_client", "async_ai_client", "batch_evaluator", "resilience", "speculation"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    pipeline = Pipeline(args)
+    results = {}
+    print(
+        f"{'path':<14} {'ops':>6} {'ops/s':>10} {'p50 ms':>10} {'p95 ms':>10} "
+        f"{'p99 ms':>10} {'peak KiB':>10}"
+    )
+    for path in args.paths or PATHS:
+        result = results[path] = measure(pipeline, path)
+        print(
+            f"{path:<14} {result['operations']:>6} {result['throughput_per_s']:>10.1f} "
+            f"{result['p50_ms']:>10.3f} {result['p95_ms']:>10.3f} {result['p99_ms']:>10.3f} "
+            f"{result['peak_memory_kib']:>10.1f}"
+        )
+
+    report = {"config": config(args), "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                previous = json.load(f)
+            if previous["config"] == report["config"]:
+                report["results"] = {**previous["results"], **results}
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; record one with --save-baseline")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline["config"] != report["config"]:
+        sys.exit(
+            "The baseline was recorded with different settings; rerun with them or "
+            f"record a new one with --save-baseline:\n{json.dumps(baseline['config'])}"
+        )
+    regressions = compare(
+        results, baseline["results"], args.tolerance, args.memory_tolerance
+    )
+    if regressions:
+        print("\nREGRESSION against the baseline:")
+        print("\n".join(f"  {line}" for line in regressions))
+        sys.exit(1)
+    print("\nNo regression against the baseline")
+
+
+if __name__ == "__main__":
+    main()
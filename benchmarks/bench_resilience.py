@@ -0,0 +1,172 @@
+"""
+Goodput of the resilience layer against a fake flaky upstream.
+
+The fake upstream serves `--capacity` requests per second and answers 429
+with retry-after above that. Its schedule is healthy, then a partial outage
+(`--partial-failure` of the calls answer 503), then a full outage, then
+healthy again. The same worker threads call it with the previous nested
+retry loops (3 flow attempts x 3 call attempts, fixed exponential backoff)
+and through resilience.Upstream. Per second, the script reports successful
+calls and the upstream attempts it took to get them.
+
+    python benchmarks/bench_resilience.py --threads 16 --phase 3
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse, logging, os, random, statistics, sys, threading, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from resilience import Upstream, UpstreamPolicy, UpstreamUnavailable  # noqa: E402
+
+
+class FakeAPIError(Exception):
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"API call failed with status code {status_code}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class FlakyUpstream:
+    """Capacity-limited fake upstream following a healthy / partial / full outage / healthy schedule"""
+
+    def __init__(self, capacity, latency, phase, partial_failure, seed=7):
+        self.capacity = capacity
+        self.latency = latency
+        self.phase = phase
+        self.partial_failure = partial_failure
+        self.started = time.monotonic()
+        self.attempts = {}
+        self._slice = None
+        self._served = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def stage(self, elapsed) -> str:
+        return ("healthy", "partial outage", "full outage", "healthy")[
+            min(int(elapsed // self.phase), 3)
+        ]
+
+    def __call__(self):
+        now = time.monotonic()
+        elapsed = now - self.started
+        second = int(elapsed)
+        with self._lock:
+            self.attempts[second] = self.attempts.get(second, 0) + 1
+            # Admit at most capacity / 10 requests per 100 ms slice
+            current = int(elapsed * 10)
+            if current != self._slice:
+                self._slice, self._served = current, 0
+            if self._served >= self.capacity / 10:
+                raise FakeAPIError(429, retry_after=(current + 1) / 10 - elapsed)
+            self._served += 1
+            draw = self._random.random()
+
+        stage = self.stage(elapsed)
+        if stage == "full outage" or (stage == "partial outage" and draw < self.partial_failure):
+            time.sleep(self.latency / 5)
+            raise FakeAPIError(503)
+        time.sleep(self.latency)
+        return "ok"
+
+
+def legacy_call(upstream, delay):
+    """The previous behaviour: complete_evaluation_flow's loop around _retry_operation"""
+    for flow_attempt in range(3):
+        for attempt in range(3):
+            try:
+                return upstream()
+            except Exception:
+                if attempt == 2:
+                    break
+                time.sleep(delay * 2**attempt + random.uniform(0, delay))
+        if flow_attempt < 2:
+            time.sleep(delay)
+    raise RuntimeError("All retry attempts failed")
+
+
+def run(name, call, args):
+    upstream = FlakyUpstream(args.capacity, args.latency, args.phase, args.partial_failure)
+    duration = args.phase * 4
+    successes = {}
+    failures = {}
+    latencies = []
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            started = time.monotonic()
+            elapsed = started - upstream.started
+            if elapsed >= duration:
+                return
+            try:
+                call(upstream)
+                outcome = successes
+            except (Exception, UpstreamUnavailable):
+                outcome = failures
+                # A caller that got an error moves on to other work for a while
+                time.sleep(args.latency)
+            finished = time.monotonic()
+            with lock:
+                second = int(finished - upstream.started)
+                outcome[second] = outcome.get(second, 0) + 1
+                if outcome is successes:
+                    latencies.append(finished - started)
+
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        for _ in range(args.threads):
+            pool.submit(worker)
+
+    print(f"\n{name}")
+    print(f"{'second':>6} {'stage':<15} {'ok/s':>6} {'failed/s':>9} {'attempts/s':>11}")
+    for second in range(duration):
+        print(
+            f"{second:>6} {upstream.stage(second + 0.5):<15} {successes.get(second, 0):>6} "
+            f"{failures.get(second, 0):>9} {upstream.attempts.get(second, 0):>11}"
+        )
+    ok = sum(successes.values())
+    attempts = sum(upstream.attempts.values())
+    p95 = statistics.quantiles(latencies, n=20)[18] * 1000 if len(latencies) > 1 else 0.0
+    print(
+        f"total ok {ok}, failed {sum(failures.values())}, upstream attempts {attempts} "
+        f"({attempts / max(ok, 1):.2f} per success), p95 latency {p95:.0f} ms"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--capacity", type=float, default=200, help="Upstream requests per second")
+    parser.add_argument("--latency", type=float, default=0.05, help="Upstream latency (s)")
+    parser.add_argument("--phase", type=int, default=3, help="Seconds per schedule stage")
+    parser.add_argument("--partial-failure", type=float, default=0.5)
+    parser.add_argument(
+        "--delay", type=float, default=0.05, help="Base backoff (s) for both clients"
+    )
+    args = parser.parse_args(argv)
+    logging.getLogger("resilience").setLevel(logging.ERROR)
+
+    print(
+        f"{args.threads} threads, capacity {args.capacity:.0f}/s, {args.latency * 1000:.0f} ms "
+        f"latency, {args.phase}s per stage, {args.partial_failure:.0%} failures in the partial outage"
+    )
+    run("nested retries (previous)", lambda upstream: legacy_call(upstream, args.delay), args)
+
+    policy = UpstreamPolicy(
+        rate=args.capacity,
+        max_rate=args.capacity * 5,
+        burst=args.threads,
+        max_wait=args.phase,
+        failure_threshold=args.threads,
+        recovery_time=args.phase / 6,
+        base_delay=args.delay,
+        max_delay=args.delay * 8,
+        retry_ratio=0.5,
+    )
+    resilient = Upstream("bench", policy)
+    run("resilience.Upstream", lambda upstream: resilient.call(upstream), args)
+    print(f"upstream stats: {resilient.stats()}")
+
+
+if __name__ == "__main__":
+    main()
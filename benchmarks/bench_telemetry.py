@@ -0,0 +1,53 @@
+"""
+Per-call cost of the telemetry instrumentation, disabled and enabled, for
+the span, counter and gauge calls the evaluation flows make.
+
+    python benchmarks/bench_telemetry.py --calls 200000
+"""
+
+import argparse, os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from telemetry import Telemetry  # noqa: E402
+
+
+def per_call(calls, function):
+    started = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter() - started) / calls * 1e9
+
+
+def stage(telemetry):
+    def run():
+        with telemetry.span("generate") as span:
+            span.set("output_tokens", 512)
+        telemetry.count("claude_tokens_total", 512, kind="output")
+        telemetry.gauge("inspeq_remaining_credits", 1000)
+
+    return run
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200_000)
+    args = parser.parse_args(argv)
+
+    baseline = per_call(args.calls, lambda: None)
+    for label, telemetry in (
+        ("disabled", Telemetry(enabled=False)),
+        ("enabled", Telemetry(enabled=True)),
+    ):
+        cost = per_call(args.calls, stage(telemetry)) - baseline
+        print(f"{label:<10} {cost:>8.0f} ns per instrumented stage")
+    enabled = Telemetry(enabled=True)
+    for _ in range(1000):
+        stage(enabled)()
+    started = time.perf_counter()
+    enabled.render()
+    print(f"{'render':<10} {(time.perf_counter() - started) * 1e6:>8.0f} us per scrape")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Stand-ins for the Anthropic, Bedrock and Inspeq clients that replay the
+recorded responses in benchmarks/fixtures after a configurable latency.
+
+Unlike src/stand_ins.py, which makes up small responses, these return the
+full recorded payloads (the SDK response shape from inspeqai-sdk.md and a
+complete blog post for the sample request in example-call.md), so parsing,
+copying and serialization cost what they cost in production.
+"""
+
+from io import BytesIO
+from types import SimpleNamespace
+import asyncio, copy, json, os, random, re, threading, time
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+EXAMPLE_CALL = os.path.join(os.path.dirname(FIXTURES), "..", "example-call.md")
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def sample_request():
+    """The prompt and context of the curl call in example-call.md"""
+    with open(EXAMPLE_CALL, encoding="utf-8") as f:
+        text = f.read()
+    body = re.search(r"-d '(.*)'\s*$", text, re.S).group(1)
+    return json.loads(body.replace("'\\''", "'"))
+
+
+class _Latency:
+    """Seeded latency draws: `latency` seconds plus up to `jitter`"""
+
+    def __init__(self, latency, jitter=0.0, seed=7):
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self, extra=0.0) -> float:
+        with self._lock:
+            self.calls += 1
+            return self.latency + extra + self._random.uniform(0, self.jitter)
+
+
+class ReplayInspeqEval(_Latency):
+    """
+    InspeqEval replaying the recorded evaluations: one result per metric and
+    input item, copied from the recorded result of that metric (or the first
+    recorded result, renamed, for metrics without a recording).
+    """
+
+    def __init__(self, latency=0.3, jitter=0.0, per_metric=0.0, seed=7):
+        super().__init__(latency, jitter, seed)
+        self.per_metric = per_metric
+        self.templates = {}
+        self.envelope = None
+        for name in ("inspeq_prompt_evaluation.json", "inspeq_response_evaluation.json"):
+            recorded = load_fixture(name)
+            self.envelope = {k: v for k, v in recorded.items() if k != "results"}
+            for result in recorded["results"]:
+                self.templates[result["metric_name"].removesuffix("_EVALUATION")] = result
+        self.credits = self.envelope["remaining_credits"]
+
+    def _result(self, metric, item, task_name):
+        template = self.templates.get(metric)
+        if template is None:
+            template = next(iter(self.templates.values()))
+        result = copy.deepcopy(template)
+        result["metric_name"] = f"{metric}_EVALUATION"
+        result["task_name"] = task_name
+        for key in ("prompt", "response", "context"):
+            result[key] = item.get(key)
+        return result
+
+    def evaluate_llm_task(self, metrics_list, input_data, task_name=None, metrics_config=None):
+        time.sleep(self.draw(self.per_metric * len(metrics_list) * len(input_data)))
+        results = [
+            self._result(metric, item, task_name) for item in input_data for metric in metrics_list
+        ]
+        with self._lock:
+            self.credits -= len(results)
+            credits = self.credits
+        return {**self.envelope, "results": results, "remaining_credits": credits}
+
+
+def _message(recorded):
+    """An anthropic Message-like object built from a recorded response"""
+    return SimpleNamespace(
+        **{
+            **recorded,
+            "content": [SimpleNamespace(**block) for block in recorded["content"]],
+            "usage": SimpleNamespace(**recorded["usage"]),
+        }
+    )
+
+
+class ReplayAnthropic(_Latency):
+    """Anthropic client whose messages.create replays the recorded message"""
+
+    def __init__(self, latency=1.0, jitter=0.0, seed=7):
+        super().__init__(latency, jitter, seed)
+        self.recorded = load_fixture("anthropic_message.json")
+        self.messages = SimpleNamespace(create=self.create)
+
+    def create(self, **kwargs):
+        time.sleep(self.draw())
+        return _message(self.recorded)
+
+
+class ReplayAsyncAnthropic(ReplayAnthropic):
+    """AsyncAnthropic counterpart of ReplayAnthropic"""
+
+    async def create(self, **kwargs):
+        await asyncio.sleep(self.draw())
+        return _message(self.recorded)
+
+
+class ReplayBedrockRuntime(_Latency):
+    """bedrock-runtime client whose invoke_model replays the recorded body"""
+
+    def __init__(self, latency=1.0, jitter=0.0, seed=7):
+        super().__init__(latency, jitter, seed)
+        self.body = json.dumps(load_fixture("bedrock_invoke_model.json")).encode("utf-8")
+
+    def invoke_model(self, modelId, body, **kwargs):
+        time.sleep(self.draw())
+        return {"body": BytesIO(self.body)}
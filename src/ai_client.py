@@ -1,14 +1,47 @@
-from anthropic import Anthropic
-from inspeq.client import InspeqEval
 from dotenv import load_dotenv
-import json, logging, os
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import json, logging, os, threading, time
 from datetime import datetime
 
+from env_policy import env_flag
+from model_router import get_model_router
+from prompt_cache import add_usage, get_prompt_cache, usage_dict
+from resilience import UpstreamUnavailable, get_resilience
+from response_cache import default_response_cache
+from result_sink import get_result_sink
+from speculation import get_speculation
+from streaming import DEFAULT_CHECKS, ResponseStreamMonitor, StreamAborted
+from telemetry import get_telemetry
+from token_budget import get_token_budget, merge_parts
+
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 )
 logger = logging.getLogger(__name__)
 
+# max_tokens when the prompt and context do not ask for a length. Giving
+# enough space to the context and prompt to fit should they be included in
+# the response as well
+DEFAULT_MAX_TOKENS = 1500
+
+
+class AIClientError(Exception):
+    """Raised when a step of the evaluation flow cannot be completed"""
+
+
+def metric_failed(metric) -> bool:
+    """
+    Whether an Inspeq metric result counts as failed: it did not pass, or
+    its evaluation failed. Every flow gates the prompt and flags the
+    response with this one check.
+    """
+    return (
+        metric.get("passed") is False
+        or metric.get("metric_evaluation_status") == "FAILED"
+        or metric.get("Status") == "FAILED"
+    )
+
 
 class AIClient:
     """
@@ -21,6 +54,7 @@ class AIClient:
 
     Attributes:
         claude (Anthropic): An instance of the Anthropic API client (not AWS Bedrock).
+        bedrock_client: bedrock-runtime client for generations routed to Bedrock.
         inspeq_eval (InspeqEval): An instance of the Inspeq evaluation client.
 
     Raises:
@@ -29,7 +63,18 @@ class AIClient:
 
 
 class AIClient:
-    def __init__(self):
+    def __init__(
+        self,
+        result_sink=None,
+        transport=None,
+        response_cache=None,
+        resilience=None,
+        speculation=None,
+        telemetry=None,
+        prompt_cache=None,
+        token_budget=None,
+        model_router=None,
+    ):
         try:
             # Validate required environment variables
             load_dotenv()
@@ -42,52 +87,304 @@ class AIClient:
             ):
                 raise Exception("Missing required environment variables")
 
-            self.claude_client = Anthropic(api_key=os.getenv("CLAUDE_API_KEY"))
-            self.inspeq_eval = InspeqEval(
-                inspeq_api_key=os.getenv("INSPEQ_API_KEY"),
-                inspeq_project_id=os.getenv("INSPEQ_PROJECT_ID"),
+            # The SDK clients (and the anthropic/inspeq imports) are built on
+            # first use, so importing and constructing the client stays cheap
+            self._transport = transport
+            self._claude_client = None
+            self._bedrock_client = None
+            self._inspeq_eval = None
+            self._stream_executor = None
+            self._init_lock = threading.Lock()
+            self.result_sink = result_sink or get_result_sink()
+            # Rate limiter, circuit breaker and retry budget per upstream,
+            # shared by every client in the process
+            self.resilience = resilience or get_resilience()
+            # When to generate before the prompt gate has passed, and what it costs
+            self.speculation = speculation or get_speculation()
+            # Stage spans, token counts and credits (TELEMETRY=true)
+            self.telemetry = telemetry or get_telemetry()
+            # Sends the context as a cacheable system block (PROMPT_CACHE_*)
+            self.prompt_cache = prompt_cache or get_prompt_cache()
+            # Picks max_tokens, trims and splits the context (TOKEN_BUDGET_*)
+            self.token_budget = token_budget or get_token_budget()
+            # Model tier and backend order per generation (MODEL_ROUTER_*)
+            self.model_router = model_router or get_model_router()
+            # Optional semantic cache of Claude's responses (RESPONSE_CACHE=true)
+            self.response_cache = (
+                response_cache if response_cache is not None else default_response_cache()
             )
 
         except Exception as e:
             logger.error(f"Failed to initialize AIClient: {str(e)}")
             raise Exception(f"Initialization failed: {str(e)}")
 
-    def _save_response(self, response_data) -> None:
-        """Save response data to JSON file with timestamp"""
-        try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"response_{timestamp}.json"
+    @property
+    def transport(self):
+        """Connection pools shared by every client in the process"""
+        if self._transport is None:
+            from transport import get_transport
+
+            self._transport = get_transport()
+        return self._transport
+
+    @property
+    def claude_client(self):
+        if self._claude_client is None:
+            with self._init_lock:
+                if self._claude_client is None:
+                    from anthropic import Anthropic
 
-            with open(filename, "a") as f:
-                json_data = {"timestamp": timestamp, "data": response_data}
-                f.write(json.dumps(json_data) + "\n")
+                    # Retries are left to the resilience layer
+                    self._claude_client = Anthropic(
+                        api_key=os.getenv("CLAUDE_API_KEY"),
+                        http_client=self.transport.anthropic_http_client(),
+                        max_retries=0,
+                    )
+        return self._claude_client
+
+    @claude_client.setter
+    def claude_client(self, client):
+        self._claude_client = client
+
+    @property
+    def bedrock_client(self):
+        """bedrock-runtime client for generations routed to Bedrock"""
+        if self._bedrock_client is None:
+            with self._init_lock:
+                if self._bedrock_client is None:
+                    import boto3
+
+                    # Retries are left to the resilience layer
+                    self._bedrock_client = boto3.client(
+                        "bedrock-runtime",
+                        config=self.transport.botocore_config(
+                            retries={"mode": "standard", "total_max_attempts": 1}
+                        ),
+                    )
+        return self._bedrock_client
+
+    @bedrock_client.setter
+    def bedrock_client(self, client):
+        self._bedrock_client = client
+
+    @property
+    def inspeq_eval(self):
+        if self._inspeq_eval is None:
+            with self._init_lock:
+                if self._inspeq_eval is None:
+                    evaluator = self.transport.inspeq_client(
+                        os.getenv("INSPEQ_API_KEY"), os.getenv("INSPEQ_PROJECT_ID")
+                    )
+                    if env_flag("LOCAL_METRICS"):
+                        # Lexical metrics are scored in-process; NumPy is only
+                        # loaded when they are
+                        from local_metrics import default_local_metrics
+
+                        evaluator = default_local_metrics(evaluator)
+                    self._inspeq_eval = evaluator
+        return self._inspeq_eval
+
+    @inspeq_eval.setter
+    def inspeq_eval(self, evaluator):
+        self._inspeq_eval = evaluator
+
+    @property
+    def stream_executor(self):
+        """Pool running the streaming flows' background prompt evaluations"""
+        if self._stream_executor is None:
+            with self._init_lock:
+                if self._stream_executor is None:
+                    self._stream_executor = ThreadPoolExecutor(
+                        max_workers=32, thread_name_prefix="stream-prompt"
+                    )
+        return self._stream_executor
+
+    def _save_response(self, response_data, prompt=None) -> None:
+        """Queue response data with timestamp (and prompt, for analytics) on the result sink"""
+        try:
+            with self.telemetry.span("save"):
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                record = {"timestamp": timestamp, "data": response_data}
+                if prompt is not None:
+                    record["prompt"] = prompt
+                self.result_sink.write(record)
 
         except Exception as e:
             logger.error(f"Failed to save response: {str(e)}")
 
-    def ask_claude(self, prompt, context):
-        """Send request to Claude API with error handling and logging"""
-        payload = (
-            f"Leverage the context:{context} to execute the following prompt:{prompt}"
+    def _cached_response(self, prompt, context, metrics=None):
+        """Cache hit for the prompt when a response cache is configured"""
+        if self.response_cache is None:
+            return None
+        hit = self.response_cache.get(prompt, context, metrics=metrics)
+        if hit is not None:
+            logger.info(f"Response served from the {hit.tier} cache tier ({hit.similarity:.2f})")
+        return hit
+
+    def _cache_response(self, prompt, context, response):
+        if self.response_cache is None or not response:
+            return None
+        return self.response_cache.put(prompt, context, response)
+
+    def _cache_evaluation(self, key, metrics, evaluation) -> None:
+        if self.response_cache is not None and key is not None:
+            self.response_cache.attach_evaluation(key, metrics, evaluation)
+
+    def _plan(self, prompt, context, split=True):
+        return self.token_budget.plan(
+            prompt, context, default_max_tokens=DEFAULT_MAX_TOKENS, split=split
+        )
+
+    def _route(self, plan, metrics=None):
+        # The prompt at four characters per token; counting its tokens is not worth the time
+        return self.model_router.route(
+            len(plan.prompt) // 4 + plan.context_tokens,
+            plan.max_tokens,
+            metrics,
+            default="anthropic",
         )
 
+    def _claude_request(self, plan, model, backend="anthropic") -> dict:
+        """
+        Arguments of a Messages API call for a token budget plan: the context
+        goes in a system block marked for prompt caching, the prompt in the
+        user message, and max_tokens follows the requested length
+        """
+        return {
+            "model": model,
+            "max_tokens": plan.max_tokens,
+            **self.prompt_cache.request(
+                plan.prompt, plan.context, bedrock_model=model if backend == "bedrock" else None
+            ),
+        }
+
+    def _invoke_bedrock(self, request) -> SimpleNamespace:
+        """Send a Messages API request through Bedrock; returns a Message-like object"""
+        body = {key: value for key, value in request.items() if key != "model"}
+        response = self.bedrock_client.invoke_model(
+            modelId=request["model"],
+            body=json.dumps({"anthropic_version": "bedrock-2023-05-31", **body}),
+        )
+        response_body = json.loads(response["body"].read())
+        return SimpleNamespace(
+            content=[SimpleNamespace(**block) for block in response_body["content"]],
+            usage=response_body.get("usage"),
+        )
+
+    def _call_backend(self, backend, request):
+        if backend == "bedrock":
+            return self.resilience.upstream("bedrock").call(self._invoke_bedrock, request)
+        return self.resilience.upstream("anthropic").call(
+            self.claude_client.messages.create, **request
+        )
+
+    def _generate(self, plan, usage=None, metrics=None) -> str:
+        """Generate on the routed backends in order, moving on when one fails"""
+        route = self._route(plan, metrics)
+        for index, (backend, model) in enumerate(route.candidates):
+            started = time.monotonic()
+            try:
+                with self.telemetry.span("generate", backend=backend, tier=route.tier) as span:
+                    message = self._call_backend(
+                        backend, self._claude_request(plan, model, backend)
+                    )
+                    self._record_tokens(message, span)
+            except Exception as e:
+                self.model_router.record(backend, time.monotonic() - started, ok=False)
+                if index + 1 == len(route.candidates):
+                    e.upstream = backend
+                    raise
+                self.model_router.fell_back(backend, e)
+                continue
+            self._record_route(route, backend, message, time.monotonic() - started)
+            self._record_usage(message, usage)
+            return message.content[0].text
+
+    def _record_route(self, route, backend, message, seconds) -> None:
+        usage = usage_dict(getattr(message, "usage", None))
+        self.model_router.record(
+            backend, seconds, ok=True, output_tokens=usage.get("output_tokens")
+        )
+        self.telemetry.count("claude_generations_total", backend=backend, tier=route.tier)
+
+    def ask_claude(
+        self, prompt, context, use_cache=True, usage=None, metrics=None, failed_backends=None
+    ):
+        """
+        Send request to Claude API with error handling and logging.
+
+        When a usage dict is given, it receives the call's input_tokens,
+        output_tokens and prompt cache read and write tokens. A generation
+        split by the token budget sends one request per context section in
+        parallel and merges their texts. `metrics`, the response metrics the
+        output will be evaluated on, feed the model router's choice of tier.
+        When the generation fails, the backend it last failed on is appended
+        to `failed_backends`, if given.
+        """
+        if use_cache:
+            hit = self._cached_response(prompt, context)
+            if hit is not None:
+                return hit.response
+
         try:
             logger.info("Sending request to Claude API")
-            message = self.claude_client.messages.create(
-                model="claude-3-5-sonnet-latest",
-                # Giving enough space to the context and prompt to fit should
-                # they be included in the response as well
-                max_tokens=1500,
-                messages=[{"role": "user", "content": payload}],
-            )
-            response = message.content[0].text
+            plan = self._plan(prompt, context)
+            if plan.parts:
+                usages = [{} for _ in plan.parts]
+                with ThreadPoolExecutor(max_workers=len(plan.parts)) as pool:
+                    response = merge_parts(
+                        pool.map(self._generate, plan.parts, usages, [metrics] * len(usages))
+                    )
+                if usage is not None:
+                    for part_usage in usages:
+                        add_usage(usage, part_usage)
+            else:
+                response = self._generate(plan, usage, metrics)
             logger.info("Successfully received response from Claude")
+            if use_cache:
+                self._cache_response(prompt, context, response)
             return response
 
         except Exception as e:
             logger.error(f"Claude API error: {str(e)}")
+            if failed_backends is not None:
+                failed_backends.append(getattr(e, "upstream", "anthropic"))
             return None
 
+    def _record_usage(self, message, usage) -> None:
+        if getattr(message, "usage", None) is None:
+            return
+        recorded = self.prompt_cache.record(message.usage)
+        if usage is not None:
+            add_usage(usage, recorded)
+
+    def _record_tokens(self, message, span) -> None:
+        if not self.telemetry.enabled or getattr(message, "usage", None) is None:
+            return
+        usage = usage_dict(message.usage)
+        for name, tokens in usage.items():
+            span.set(name, tokens)
+        self.telemetry.count_tokens(usage)
+
+    def _record_credits(self, results) -> None:
+        if isinstance(results, dict):
+            self.telemetry.gauge("inspeq_remaining_credits", results.get("remaining_credits"))
+
+    def _record_attempt(self, attempt, outcome) -> None:
+        self.telemetry.count(
+            "evaluation_flow_attempts_total", attempt=str(attempt + 1), outcome=outcome
+        )
+
+    def stream_claude(self, prompt, context, metrics=None):
+        """Stream Claude's response, yielding text as it arrives (Anthropic API, routed tier)"""
+        logger.info("Opening streaming request to Claude API")
+        plan = self._plan(prompt, context, split=False)
+        model = self.model_router.model("anthropic", self._route(plan, metrics).tier)
+        with self.claude_client.messages.stream(**self._claude_request(plan, model)) as stream:
+            yield from stream.text_stream
+            self._record_usage(stream.get_final_message(), None)
+        logger.info("Claude stream completed")
+
     def evaluate_prompt(
         self,
         prompt: str,
@@ -105,11 +402,14 @@ class AIClient:
                 }
             ]
 
-            results = self.inspeq_eval.evaluate_llm_task(
-                metrics_list=metrics,
-                input_data=input_data,
-                task_name="prompt_evaluation_v3",
-            )
+            with self.telemetry.span("pre_eval"):
+                results = self.resilience.upstream("inspeq").call(
+                    self.inspeq_eval.evaluate_llm_task,
+                    metrics_list=metrics,
+                    input_data=input_data,
+                    task_name="prompt_evaluation_v3",
+                )
+            self._record_credits(results)
             logger.info("Prompt evaluation completed successfully")
             return results
 
@@ -135,11 +435,14 @@ class AIClient:
                 }
             ]
 
-            results = self.inspeq_eval.evaluate_llm_task(
-                metrics_list=metrics,
-                input_data=input_data,
-                task_name="response_evaluation_v3",
-            )
+            with self.telemetry.span("post_eval"):
+                results = self.resilience.upstream("inspeq").call(
+                    self.inspeq_eval.evaluate_llm_task,
+                    metrics_list=metrics,
+                    input_data=input_data,
+                    task_name="response_evaluation_v3",
+                )
+            self._record_credits(results)
             logger.info("Response evaluation completed successfully")
             return results
 
@@ -155,80 +458,258 @@ class AIClient:
         response_metrics=None,
         max_retries=3,
         retry_delay=1,
+        cancel_on_failed_prompt=False,
     ):
-        """Complete flow: evaluate prompt, get Anthropic's Claude response, evaluate response with Inspeq AI"""
+        """
+        Complete flow: evaluate prompt, get Anthropic's Claude response, evaluate response with Inspeq AI.
+
+        Each call is retried by the resilience layer; a flow retry only
+        repeats the steps that failed, and stops early once the failing
+        upstream's circuit is open. When the speculation policy allows it,
+        Claude starts generating while the prompt is evaluated and its output
+        is held until the gate has passed. If cancel_on_failed_prompt is set
+        and any prompt metric fails, that output is discarded and the result
+        is returned without a response.
+        """
         result = {}
+        hit = cache_key = None
+        run = None  # speculative generation, kept across attempts
+        failed_backends = []  # backend of each failed generation, latest last
+        executor = None  # only built when a generation is speculated
 
-        for attempt in range(max_retries):
-            try:
-                logger.info(f"Starting evaluation flow - Attempt {attempt + 1}")
-
-                # Step 1: Evaluate the prompt
-                prompt_evaluation = self._retry_operation(
-                    self.evaluate_prompt,
-                    prompt=prompt,
-                    context=context,
-                    metrics=prompt_metrics,
-                )
-                result["prompt_evaluation"] = prompt_evaluation
-                if any(
-                    metric.get("metric_evaluation_status") == "FAILED"
-                    for metric in prompt_evaluation.get("results", [])
-                ):
-                    result["failed_metrics"] = True
-
-                # Step 2: Get response from Claude
-                claude_response = self._retry_operation(
-                    self.ask_claude,
-                    prompt,
-                    context,
-                )
-                if not claude_response:
-                    raise AIClientError("Failed to get response from Claude")
-                result["response"] = claude_response
-
-                # Step 3: Evaluate the response
-                response_evaluation = self._retry_operation(
-                    self.evaluate_response,
-                    prompt=prompt,
-                    context=context,
-                    response=claude_response,
-                    metrics=response_metrics,
-                )
-                result["response_evaluation"] = response_evaluation
-                if any(
-                    metric.get("Status") == "FAILED"
-                    for metric in response_evaluation.get("results", [])
-                ):
-                    result["failed_metrics"] = True
-
-                # For bookkeeping, save the complete response locally
-                self._save_response(result)
-                logger.info("Evaluation flow completed successfully")
-                return result
+        try:
+            for attempt in range(max_retries):
+                try:
+                    logger.info(f"Starting evaluation flow - Attempt {attempt + 1}")
 
-            except Exception as e:
-                logger.warning(f"Attempt {attempt + 1} failed: {str(e)}")
-                if attempt < max_retries - 1:
-                    time.sleep(retry_delay)
-                else:
-                    logger.error("All retry attempts failed")
-                    return {
-                        "error": str(e),
-                        "prompt_evaluation": result.get("prompt_evaluation"),
-                        "response": result.get("response"),
-                        "response_evaluation": result.get("response_evaluation"),
-                    }
-
-    def _retry_operation(self, operation, *args, **kwargs):
-        """Helper method to retry operations with exponential backoff"""
-        max_retries = kwargs.pop("max_retries", 3)
-        for attempt in range(max_retries):
-            try:
-                return operation(*args, **kwargs)
-            except Exception as e:
-                if attempt == max_retries - 1:
-                    raise
-                wait_time = (2**attempt) + random.uniform(0, 1)
-                logger.warning(f"Operation failed, retrying in {wait_time:.2f} seconds")
-                time.sleep(wait_time)
+                    # A cached response (and its evaluation) replaces the generation
+                    if hit is None and "response" not in result:
+                        hit = self._cached_response(prompt, context, metrics=response_metrics)
+                        if hit is not None:
+                            cache_key = hit.key
+                            result["cache"] = hit.info()
+                            result["response"] = hit.response
+
+                    if (
+                        run is None
+                        and "response" not in result
+                        and "prompt_evaluation" not in result
+                        and self.speculation.should_speculate(prompt, context)
+                    ):
+                        run = self.speculation.start()
+                        executor = executor or ThreadPoolExecutor(max_workers=1)
+                        run.future = executor.submit(
+                            self.ask_claude,
+                            prompt,
+                            context,
+                            use_cache=False,
+                            usage=run.usage,
+                            metrics=response_metrics,
+                            failed_backends=failed_backends,
+                        )
+
+                    # Step 1: Evaluate the prompt
+                    if "prompt_evaluation" not in result:
+                        prompt_evaluation = self.evaluate_prompt(
+                            prompt=prompt, context=context, metrics=prompt_metrics
+                        )
+                        if prompt_evaluation is None:
+                            raise self._step_failed("Failed to evaluate prompt", "inspeq")
+                        result["prompt_evaluation"] = prompt_evaluation
+                        failed = self._has_failed_metrics(prompt_evaluation)
+                        self.speculation.record_gate(not failed, run)
+                        if failed:
+                            result["failed_metrics"] = True
+                            if cancel_on_failed_prompt:
+                                logger.warning("Prompt evaluation failed, discarding generation")
+                                if run is not None:
+                                    self._discard_speculation(run)
+                                    run = None
+                                self._save_response(result, prompt=prompt)
+                                return result
+
+                    # Step 2: Get response from Claude (the speculative generation
+                    # when one is running), unless the cache already answered
+                    if "response" not in result:
+                        if run is not None:
+                            claude_response = run.future.result()
+                            self.speculation.commit(run)
+                            run = None
+                        else:
+                            claude_response = self.ask_claude(
+                                prompt,
+                                context,
+                                use_cache=False,
+                                metrics=response_metrics,
+                                failed_backends=failed_backends,
+                            )
+                        if not claude_response:
+                            raise self._generation_failed(failed_backends)
+                        cache_key = self._cache_response(prompt, context, claude_response)
+                        result["response"] = claude_response
+
+                    # Step 3: Evaluate the response
+                    response_evaluation = hit.evaluation(response_metrics) if hit else None
+                    if response_evaluation is None:
+                        response_evaluation = self.evaluate_response(
+                            prompt=prompt,
+                            context=context,
+                            response=result["response"],
+                            metrics=response_metrics,
+                        )
+                        if response_evaluation is None:
+                            raise self._step_failed("Failed to evaluate response", "inspeq")
+                        self._cache_evaluation(cache_key, response_metrics, response_evaluation)
+                    result["response_evaluation"] = response_evaluation
+                    if self._has_failed_metrics(response_evaluation):
+                        result["failed_metrics"] = True
+
+                    # For bookkeeping, save the complete response locally
+                    self._save_response(result, prompt=prompt)
+                    self._record_attempt(attempt, "ok")
+                    logger.info("Evaluation flow completed successfully")
+                    return result
+
+                except Exception as e:
+                    self._record_attempt(attempt, "error")
+                    logger.warning(f"Attempt {attempt + 1} failed: {str(e)}")
+                    if attempt < max_retries - 1 and not self._circuit_open(e):
+                        time.sleep(retry_delay)
+                    else:
+                        logger.error("All retry attempts failed")
+                        return {
+                            "error": str(e),
+                            "prompt_evaluation": result.get("prompt_evaluation"),
+                            "response": result.get("response"),
+                            "response_evaluation": result.get("response_evaluation"),
+                        }
+        finally:
+            if run is not None:
+                self._discard_speculation(run)
+            if executor is not None:
+                executor.shutdown(wait=False)
+
+    def _discard_speculation(self, run) -> None:
+        """
+        Cancel a speculative generation (a Future or an asyncio Task), or count
+        its tokens as wasted once it finishes
+        """
+        if run.future.cancel() or run.future.cancelled():
+            self.speculation.discard(run, cancelled=True)
+        else:
+            run.future.add_done_callback(lambda _: self.speculation.discard(run))
+
+    @staticmethod
+    def _step_failed(message, upstream):
+        error = AIClientError(message)
+        error.upstream = upstream
+        return error
+
+    def _generation_failed(self, failed_backends):
+        # The flow retry is judged by the circuit of the backend that failed
+        backend = failed_backends[-1] if failed_backends else "anthropic"
+        return self._step_failed(f"Failed to get response from Claude on {backend}", backend)
+
+    def _circuit_open(self, error) -> bool:
+        """Whether the upstream behind a failed step is refusing calls, so retrying is pointless"""
+        if isinstance(error, UpstreamUnavailable):
+            return True
+        upstream = getattr(error, "upstream", None)
+        return upstream is not None and self.resilience.upstream(upstream).breaker.state == "open"
+
+    @staticmethod
+    def _has_failed_metrics(evaluation) -> bool:
+        return any(metric_failed(metric) for metric in (evaluation or {}).get("results", []))
+
+    @staticmethod
+    def _failed_prompt_metric(evaluation):
+        """Name of the first failed metric of a prompt evaluation, or None"""
+        for metric in (evaluation or {}).get("results", []):
+            if metric_failed(metric):
+                return metric.get("metric_name", "UNKNOWN")
+        return None
+
+    def stream_evaluation_flow(
+        self,
+        prompt,
+        context=None,
+        prompt_metrics=None,
+        response_metrics=None,
+        safety_metrics=None,
+        checks=DEFAULT_CHECKS,
+        cancel_on_failed_prompt=False,
+    ):
+        """
+        Streaming flow: yield Claude's text as it arrives while checking finished paragraphs.
+
+        The prompt evaluation runs in the background so it does not delay the
+        first token. Yields {"type": "token", "text": ...} events followed by
+        one final "result", "aborted" (a check or safety metric failed on a
+        finished chunk) or "error" event carrying the same keys as
+        complete_evaluation_flow's result. With cancel_on_failed_prompt, the
+        stream also stops with an "aborted" event once the prompt evaluation
+        reports a failed metric.
+        """
+        result = {}
+        prompt_future = self.stream_executor.submit(
+            self.evaluate_prompt, prompt=prompt, context=context, metrics=prompt_metrics
+        )
+        monitor = ResponseStreamMonitor(
+            checks=checks,
+            evaluator=self.inspeq_eval,
+            safety_metrics=safety_metrics,
+            prompt=prompt,
+            context=context or "",
+        )
+
+        tokens = self.stream_claude(prompt, context, response_metrics)
+        stream = monitor.monitor(tokens)
+
+        def cancel():
+            failed = self._failed_prompt_metric(prompt_future.result())
+            if failed:
+                logger.warning("Prompt evaluation failed, cancelling generation")
+                raise StreamAborted(failed, "Prompt evaluation failed", monitor.text)
+
+        try:
+            for text in stream:
+                yield {"type": "token", "text": text}
+                if cancel_on_failed_prompt and prompt_future.done():
+                    cancel()
+
+            if cancel_on_failed_prompt:
+                cancel()
+            result["prompt_evaluation"] = prompt_future.result()
+            result["response"] = monitor.text
+            response_evaluation = self.evaluate_response(
+                prompt=prompt,
+                context=context,
+                response=monitor.text,
+                metrics=response_metrics,
+            )
+            result["response_evaluation"] = response_evaluation
+            if any(
+                self._has_failed_metrics(evaluation)
+                for evaluation in (result["prompt_evaluation"], response_evaluation)
+            ):
+                result["failed_metrics"] = True
+
+            self._save_response(result, prompt=prompt)
+            yield {"type": "result", **result}
+
+        except StreamAborted as e:
+            result["prompt_evaluation"] = prompt_future.result()
+            result["response"] = e.text
+            result["failed_metrics"] = True
+            result["aborted"] = {"metric": e.metric, "reason": e.reason}
+            self._save_response(result, prompt=prompt)
+            yield {"type": "aborted", **result}
+
+        except Exception as e:
+            logger.error(f"Streaming evaluation flow failed: {str(e)}")
+            yield {"type": "error", "error": str(e), "response": monitor.text}
+
+        finally:
+            # Closing the generators closes Claude's stream when it stopped early
+            stream.close()
+            tokens.close()
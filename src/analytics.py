@@ -0,0 +1,344 @@
+from array import array
+from datetime import datetime, timezone
+import argparse, glob, gzip, hashlib, json, logging, os, sqlite3
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("prompt_evaluation", "response_evaluation")
+BUCKET_SECONDS = {"hour": 3600, "day": 86400, "week": 7 * 86400}
+
+
+def iter_records(paths):
+    """Yield saved result records from JSONL (plain, gzip, zstd), SQLite and Parquet files"""
+    for path in paths:
+        if os.path.isdir(path):
+            yield from iter_records(sorted(glob.glob(os.path.join(path, "*"))))
+            continue
+        name = os.path.basename(path)
+        try:
+            if name.endswith((".sqlite3", ".db")):
+                yield from _iter_sqlite(path)
+            elif name.endswith(".parquet"):
+                yield from _iter_parquet(path)
+            elif name.endswith((".jsonl", ".json", ".jsonl.gz", ".jsonl.zst")):
+                yield from _iter_jsonl(path)
+        except Exception as e:
+            logger.error(f"Failed to read {path}: {str(e)}")
+
+
+def _iter_jsonl(path):
+    if path.endswith(".gz"):
+        f = gzip.open(path, "rt", encoding="utf-8")
+    elif path.endswith(".zst"):
+        import io, zstandard
+
+        f = io.TextIOWrapper(
+            zstandard.ZstdDecompressor().stream_reader(open(path, "rb")), encoding="utf-8"
+        )
+    else:
+        f = open(path, encoding="utf-8")
+    with f:
+        for line in f:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def _record(timestamp, prompt, data) -> dict:
+    record = {"timestamp": timestamp, "data": json.loads(data)}
+    if prompt is not None:
+        record["prompt"] = prompt
+    return record
+
+
+def _iter_sqlite(path):
+    db = sqlite3.connect(path)
+    try:
+        columns = [row[1] for row in db.execute("PRAGMA table_info(responses)")]
+        # Databases written before prompts were saved have no prompt column
+        prompt = "prompt" if "prompt" in columns else "NULL"
+        for row in db.execute(f"SELECT timestamp, {prompt}, data FROM responses"):
+            yield _record(*row)
+    finally:
+        db.close()
+
+
+def _iter_parquet(path):
+    import pyarrow.parquet as pq
+
+    parquet = pq.ParquetFile(path)
+    # Files written before prompts were saved have no prompt column
+    has_prompt = "prompt" in parquet.schema_arrow.names
+    columns = ["timestamp", "prompt", "data"] if has_prompt else ["timestamp", "data"]
+    for batch in parquet.iter_batches(columns=columns):
+        timestamps = batch.column("timestamp").to_pylist()
+        data = batch.column("data").to_pylist()
+        prompts = batch.column("prompt").to_pylist() if has_prompt else [None] * len(data)
+        yield from map(_record, timestamps, prompts, data)
+
+
+class _Categories:
+    """Dictionary-encodes strings into dense integer codes"""
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def code(self, value) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class ResultTable:
+    """
+    Columnar view over saved evaluation results, one row per metric result.
+
+    Columns are NumPy arrays; metric names, stages and prompts are stored as
+    integer codes into the matching `*_names` lists. Rows are appended to
+    compact typed arrays while reading, so no per-row objects are kept.
+
+    Attributes:
+        timestamp (np.ndarray): Epoch seconds of the saved record (NaN if unknown).
+        stage (np.ndarray): Index into STAGES.
+        metric (np.ndarray): Code into metric_names.
+        prompt (np.ndarray): Code into prompt_names.
+        score (np.ndarray): Metric score (NaN if missing).
+        passed (np.ndarray): Whether the metric passed.
+    """
+
+    def __init__(self, timestamp, stage, metric, prompt, score, passed, metric_names, prompt_names):
+        self.timestamp = timestamp
+        self.stage = stage
+        self.metric = metric
+        self.prompt = prompt
+        self.score = score
+        self.passed = passed
+        self.metric_names = metric_names
+        self.prompt_names = prompt_names
+
+    def __len__(self) -> int:
+        return len(self.metric)
+
+    @classmethod
+    def load(cls, paths) -> "ResultTable":
+        """Read every record once, appending metric rows straight into typed columns"""
+        timestamps, stages, metrics, prompts = array("d"), array("b"), array("i"), array("i")
+        scores, passed = array("d"), array("b")
+        metric_names, prompt_names = _Categories(), _Categories()
+        parsed_timestamps = {}
+
+        for record in iter_records(paths):
+            data = record.get("data", record)
+            if not isinstance(data, dict):
+                continue
+
+            raw_timestamp = record.get("timestamp")
+            timestamp = parsed_timestamps.get(raw_timestamp)
+            if timestamp is None:
+                timestamp = parsed_timestamps[raw_timestamp] = _parse_timestamp(raw_timestamp)
+
+            prompt_key = record.get("prompt") or record.get("id")
+            if prompt_key is None:
+                prompt_code = -1
+            else:
+                prompt_code = prompt_names.code(_prompt_label(prompt_key))
+
+            for stage_index, stage in enumerate(STAGES):
+                evaluation = data.get(stage)
+                if not isinstance(evaluation, dict):
+                    continue
+                for result in evaluation.get("results") or []:
+                    try:
+                        score = float(result.get("score"))
+                    except (TypeError, ValueError):
+                        score = float("nan")
+                    timestamps.append(timestamp)
+                    stages.append(stage_index)
+                    metrics.append(metric_names.code(result.get("metric_name", "UNKNOWN")))
+                    prompts.append(prompt_code)
+                    scores.append(score)
+                    passed.append(bool(result.get("passed", False)))
+
+        return cls(
+            timestamp=np.frombuffer(timestamps, dtype=np.float64),
+            stage=np.frombuffer(stages, dtype=np.int8),
+            metric=np.frombuffer(metrics, dtype=np.int32),
+            prompt=np.frombuffer(prompts, dtype=np.int32),
+            score=np.frombuffer(scores, dtype=np.float64),
+            passed=np.frombuffer(passed, dtype=np.int8).astype(bool),
+            metric_names=metric_names.values,
+            prompt_names=prompt_names.values,
+        )
+
+    def filter(self, stage=None) -> "ResultTable":
+        """Rows of a single stage ("prompt_evaluation" or "response_evaluation")"""
+        if stage is None:
+            return self
+        mask = self.stage == STAGES.index(stage)
+        return ResultTable(
+            self.timestamp[mask],
+            self.stage[mask],
+            self.metric[mask],
+            self.prompt[mask],
+            self.score[mask],
+            self.passed[mask],
+            self.metric_names,
+            self.prompt_names,
+        )
+
+    def pass_rate_by_metric(self) -> dict:
+        n = len(self.metric_names)
+        totals = np.bincount(self.metric, minlength=n)
+        passes = np.bincount(self.metric, weights=self.passed, minlength=n)
+        return {
+            self.metric_names[i]: {"count": int(totals[i]), "pass_rate": passes[i] / totals[i]}
+            for i in np.flatnonzero(totals)
+        }
+
+    def score_percentiles(self, percentiles=(50, 90, 95, 99)) -> dict:
+        valid = ~np.isnan(self.score)
+        metric, score = self.metric[valid], self.score[valid]
+        order = np.lexsort((score, metric))
+        metric, score = metric[order], score[order]
+        bounds = np.searchsorted(metric, np.arange(len(self.metric_names) + 1))
+        result = {}
+        for i, name in enumerate(self.metric_names):
+            group = score[bounds[i] : bounds[i + 1]]
+            if len(group):
+                values = np.percentile(group, percentiles)
+                result[name] = {f"p{p}": float(v) for p, v in zip(percentiles, values)}
+        return result
+
+    def drift(self, bucket="day") -> dict:
+        """Pass rate and mean score per metric for every time bucket"""
+        valid = ~np.isnan(self.timestamp)
+        if not valid.any():
+            return {}
+        size = BUCKET_SECONDS[bucket]
+        buckets = (self.timestamp[valid] // size).astype(np.int64)
+        first = buckets.min()
+        n_metrics = len(self.metric_names)
+        keys = (buckets - first) * n_metrics + self.metric[valid]
+        length = (buckets.max() - first + 1) * n_metrics
+
+        scores = self.score[valid]
+        scored = ~np.isnan(scores)
+        totals = np.bincount(keys, minlength=length)
+        passes = np.bincount(keys, weights=self.passed[valid], minlength=length)
+        score_sums = np.bincount(keys[scored], weights=scores[scored], minlength=length)
+        score_counts = np.bincount(keys[scored], minlength=length)
+
+        result = {}
+        for key in np.flatnonzero(totals):
+            start = datetime.fromtimestamp((first + key // n_metrics) * size, timezone.utc)
+            metric = self.metric_names[key % n_metrics]
+            result.setdefault(start.isoformat(), {})[metric] = {
+                "count": int(totals[key]),
+                "pass_rate": passes[key] / totals[key],
+                "mean_score": (
+                    score_sums[key] / score_counts[key] if score_counts[key] else None
+                ),
+            }
+        return result
+
+    def top_failing_prompts(self, n=10) -> list:
+        known = self.prompt >= 0
+        failures = np.bincount(
+            self.prompt[known], weights=~self.passed[known], minlength=len(self.prompt_names)
+        )
+        totals = np.bincount(self.prompt[known], minlength=len(self.prompt_names))
+        top = np.argsort(failures, kind="stable")[::-1][:n]
+        return [
+            {
+                "prompt": self.prompt_names[i],
+                "failures": int(failures[i]),
+                "evaluations": int(totals[i]),
+            }
+            for i in top
+            if failures[i] > 0
+        ]
+
+
+def _parse_timestamp(value) -> float:
+    if not value:
+        return float("nan")
+    for fmt in ("%Y%m%d_%H%M%S", "%Y-%m-%dT%H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S"):
+        try:
+            return (
+                datetime.strptime(str(value), fmt).replace(tzinfo=timezone.utc).timestamp()
+            )
+        except ValueError:
+            continue
+    return float("nan")
+
+
+def _prompt_label(prompt) -> str:
+    """Short, stable label for a prompt: its first words plus a content hash"""
+    prompt = str(prompt)
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+    preview = " ".join(prompt.split())[:60]
+    return f"{digest} {preview}"
+
+
+def report(table, top=10, bucket="day") -> str:
+    lines = [f"📊 {len(table)} metric results"]
+
+    lines.append("\nPass rate per metric:")
+    for name, stats in sorted(table.pass_rate_by_metric().items()):
+        lines.append(f"  {name}: {stats['pass_rate']:.1%} of {stats['count']}")
+
+    lines.append("\nScore percentiles per metric:")
+    for name, values in sorted(table.score_percentiles().items()):
+        formatted = ", ".join(f"{k}={v:.2f}" for k, v in values.items())
+        lines.append(f"  {name}: {formatted}")
+
+    lines.append(f"\nPass rate per {bucket}:")
+    for start, metrics in sorted(table.drift(bucket).items()):
+        formatted = ", ".join(
+            f"{name}={stats['pass_rate']:.1%}" for name, stats in sorted(metrics.items())
+        )
+        lines.append(f"  {start}: {formatted}")
+
+    lines.append(f"\nTop {top} failing prompts:")
+    for entry in table.top_failing_prompts(top):
+        lines.append(
+            f"  {entry['failures']}/{entry['evaluations']} failed - {entry['prompt']}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fleet-wide report over saved evaluation results")
+    parser.add_argument("paths", nargs="+", help="Result files or directories")
+    parser.add_argument("--stage", choices=STAGES, help="Only one evaluation stage")
+    parser.add_argument("--bucket", choices=sorted(BUCKET_SECONDS), default="day")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="Print the aggregations as JSON")
+    args = parser.parse_args(argv)
+
+    table = ResultTable.load(args.paths).filter(args.stage)
+    if args.json:
+        print(
+            json.dumps(
+                {
+                    "pass_rate_by_metric": table.pass_rate_by_metric(),
+                    "score_percentiles": table.score_percentiles(),
+                    "drift": table.drift(args.bucket),
+                    "top_failing_prompts": table.top_failing_prompts(args.top),
+                },
+                indent=2,
+            )
+        )
+    else:
+        print(report(table, top=args.top, bucket=args.bucket))
+
+
+if __name__ == "__main__":
+    main()
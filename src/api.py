@@ -1,12 +1,15 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
+from pydantic import BaseModel, Field
+from typing import Literal
 import uvicorn
-import boto3
-import json
-from ai_client import AIClient
+import asyncio, json, os, threading, time
+from async_ai_client import AsyncAIClient
+from jobs import JobManager
+from telemetry import get_telemetry, stats_gauges
 
 app = FastAPI(title="Blog Generator API")
-ai_client = AIClient()
 
 
 class InvokeRequest(BaseModel):
@@ -14,11 +17,158 @@ class InvokeRequest(BaseModel):
     context: str | None = None
 
 
-client = boto3.client("stepfunctions")
+class EvaluateRequest(InvokeRequest):
+    stream: bool = False
+    cancel_on_failed_prompt: bool = False
+
+
+class BatchInvokeRequest(BaseModel):
+    requests: list[InvokeRequest] = Field(min_length=1)
+    mode: Literal["step_functions", "evaluate"] = "step_functions"
+    concurrency: int = Field(default=16, ge=1, le=256)
+
+
+client = None
 step_function_arn = (
     "arn:aws:states:us-east-1:<account-id>:stateMachine:state_machine_name"
 )
 
+prompt_metrics = ["DATA_LEAKAGE"]
+response_metrics = ["ANSWER_RELEVANCE", "FACTUAL_CONSISTENCY"]
+
+# Upper bound on in-process flows running at once; further requests wait
+EVALUATE_CONCURRENCY = int(os.getenv("EVALUATE_CONCURRENCY", "64"))
+
+_ai_client = None
+_clients_lock = threading.Lock()
+_evaluate_slots = None
+job_manager = JobManager(ttl=int(os.getenv("JOB_TTL", "3600")))
+telemetry = get_telemetry()
+
+
+def get_stepfunctions_client():
+    """Step Functions client, built on first use so boto3 stays out of the API's boot"""
+    global client
+    with _clients_lock:
+        if client is None:
+            import boto3
+            from transport import get_transport
+
+            client = boto3.client("stepfunctions", config=get_transport().botocore_config())
+        return client
+
+
+def get_ai_client():
+    """Shared AsyncAIClient, built on first use so the API starts without credentials"""
+    global _ai_client
+    with _clients_lock:
+        if _ai_client is None:
+            _ai_client = AsyncAIClient(max_workers=EVALUATE_CONCURRENCY)
+        return _ai_client
+
+
+def _slots():
+    global _evaluate_slots
+    if _evaluate_slots is None:
+        _evaluate_slots = asyncio.Semaphore(EVALUATE_CONCURRENCY)
+    return _evaluate_slots
+
+
+@app.middleware("http")
+async def record_request(request: Request, call_next):
+    """Time every request by route template and status code (TELEMETRY=true)"""
+    if not telemetry.enabled:
+        return await call_next(request)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        telemetry.observe(
+            "http_request_seconds",
+            time.perf_counter() - started,
+            method=request.method,
+            route=path,
+            status=str(status),
+        )
+
+
+def _sse(events):
+    for event in events:
+        yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+async def _start_execution(prompt, context):
+    # The state machine evaluates each metric in its own Map iteration
+    execution_input = {
+        "prompt": prompt,
+        "context": context,
+        "prompt_metrics": prompt_metrics,
+        "response_metrics": response_metrics,
+    }
+
+    def start():
+        from claim_check import get_claim_check
+
+        payload = execution_input
+        claim_check = get_claim_check()
+        if claim_check is not None:
+            # Large texts travel between states as content-hash references
+            payload = claim_check.offload_fields(payload)
+        return get_stepfunctions_client().start_execution(
+            stateMachineArn=step_function_arn, input=json.dumps(payload)
+        )
+
+    # boto3 is blocking; keep the event loop free while the calls are in flight
+    response = await asyncio.to_thread(start)
+    return response["executionArn"]
+
+
+async def _evaluate(prompt, context, cancel_on_failed_prompt=False):
+    ai_client = get_ai_client()
+    async with _slots():
+        return await ai_client.acomplete_evaluation_flow(
+            prompt=prompt,
+            context=context,
+            prompt_metrics=prompt_metrics,
+            response_metrics=response_metrics,
+            cancel_on_failed_prompt=cancel_on_failed_prompt,
+        )
+
+
+async def _run_job_request(mode, request):
+    if mode == "evaluate":
+        return await _evaluate(request["prompt"], request["context"])
+    return {"execution_arn": await _start_execution(request["prompt"], request["context"])}
+
+
+async def _stream_flow(request):
+    """
+    The streaming flow's server-sent events. It holds an evaluate slot from
+    the first event until the stream ends or the client disconnects.
+    """
+    events = get_ai_client().stream_evaluation_flow(
+        prompt=request.prompt,
+        context=request.context if request.context is not None else "",
+        prompt_metrics=prompt_metrics,
+        response_metrics=response_metrics,
+        cancel_on_failed_prompt=getattr(request, "cancel_on_failed_prompt", False),
+    )
+    slots = _slots()
+    await slots.acquire()
+    try:
+        # The flow blocks on Claude's stream, so it is stepped in worker threads
+        async for event in iterate_in_threadpool(_sse(events)):
+            yield event
+    finally:
+        # Closes Claude's stream when the client went away mid-response
+        events.close()
+        slots.release()
+
 
 # Invoke this endpoint with:
 # curl -X POST "http://localhost:8000/invoke" -H "Content-Type: application/json" -d '{"prompt": "Your prompt here", "context": "Optional context here"}'
@@ -54,17 +204,180 @@ async def invoke(request: InvokeRequest):
         HTTPException: If there's an error during the execution.
     """
     try:
-        payload = {
-            "prompt": request.prompt,
-            "context": request.context if request.context is not None else "",
-        }
-        response = client.start_execution(
-            stateMachineArn=step_function_arn, input=json.dumps(payload)
+        execution_arn = await _start_execution(
+            request.prompt, request.context if request.context is not None else ""
         )
-        return {"status": "success", "execution_arn": response["executionArn"]}
+        return {"status": "success", "execution_arn": execution_arn}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/stream")
+def stream(request: InvokeRequest):
+    """
+    Run the evaluation flow in-process and stream Claude's response as server-sent events.
+
+    Every text delta is sent as a `token` event as soon as it arrives, followed
+    by a final `result`, `aborted` or `error` event with the evaluations.
+
+    Example:
+    curl -N -X POST "http://localhost:8000/stream" \
+     -H "Content-Type: application/json" \
+     -d '{"prompt": "Your prompt here", "context": "Optional context here"}'
+    """
+
+    return StreamingResponse(_stream_flow(request), media_type="text/event-stream")
+
+
+@app.post("/evaluate")
+async def evaluate(request: EvaluateRequest):
+    """
+    Run the complete evaluation flow in-process, without going through Step Functions.
+
+    The prompt evaluation and Claude's generation run concurrently on the
+    shared AsyncAIClient, and the result is returned once the response is
+    evaluated. With `"stream": true` the response is streamed as server-sent
+    events instead, like /stream.
+
+    Example:
+    curl -X POST "http://localhost:8000/evaluate" \
+     -H "Content-Type: application/json" \
+     -d '{"prompt": "Your prompt here", "context": "Optional context here"}'
+
+    Args:
+        request (EvaluateRequest): The prompt, optional context and flow options.
+
+    Returns:
+        dict: The prompt evaluation, response and response evaluation.
+
+    Raises:
+        HTTPException: If the flow fails after all retries.
+    """
+    if request.stream:
+        return StreamingResponse(_stream_flow(request), media_type="text/event-stream")
+
+    try:
+        result = await _evaluate(
+            request.prompt,
+            request.context if request.context is not None else "",
+            cancel_on_failed_prompt=request.cancel_on_failed_prompt,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if "error" in result:
+        raise HTTPException(status_code=502, detail=result)
+    return result
+
+
+@app.post("/invoke/batch", status_code=202)
+async def invoke_batch(request: BatchInvokeRequest):
+    """
+    Submit many prompts at once and get a single job handle back.
+
+    Identical prompt/context pairs are sent once, and requests identical to
+    one already in flight (from this or another job) wait for that one
+    instead of running again. At most `concurrency` unique requests of the
+    job run at a time. With mode "step_functions" each request starts an
+    execution; with "evaluate" it runs the flow in-process like /evaluate.
+
+    Example:
+    curl -X POST "http://localhost:8000/invoke/batch" \
+     -H "Content-Type: application/json" \
+     -d '{"mode": "evaluate", "requests": [{"prompt": "First prompt"}, {"prompt": "Second prompt", "context": "Some context"}]}'
+
+    Returns:
+        dict: The job handle with request counts and the polling and streaming URLs.
+    """
+    job = job_manager.submit(
+        request.mode,
+        [
+            {"prompt": item.prompt, "context": item.context if item.context is not None else ""}
+            for item in request.requests
+        ],
+        _run_job_request,
+        concurrency=request.concurrency,
+    )
+    return {
+        **job.summary(),
+        "status_url": f"/jobs/{job.id}",
+        "stream_url": f"/jobs/{job.id}/stream",
+    }
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    """Progress of a batch job, with the result of every submitted request finished so far"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    return job.snapshot()
+
+
+@app.get("/jobs/{job_id}/stream")
+async def job_stream(job_id: str):
+    """
+    Stream a batch job's results as server-sent events.
+
+    Each unique request produces one `result` event, carrying the positions
+    in the submitted list it answers; a final `done` event closes the stream.
+    Results finished before the stream was opened are sent first.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+
+    async def events():
+        async for event in job.stream():
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/metrics")
+async def metrics(request: Request):
+    """
+    Prometheus exposition of the stage latencies, attempts, token counts and
+    Inspeq credits recorded with TELEMETRY=true, plus the live resilience,
+    speculation, prompt cache, token budget and model router counters. OpenMetrics is returned when the
+    scraper asks for it in its Accept header.
+
+    Example:
+    curl "http://localhost:8000/metrics"
+    """
+    from model_router import get_model_router
+    from prompt_cache import get_prompt_cache
+    from resilience import get_resilience
+    from speculation import get_speculation
+    from token_budget import get_token_budget
+
+    extra = stats_gauges("speculation", get_speculation().stats())
+    extra += stats_gauges("prompt_cache", get_prompt_cache().stats())
+    extra += stats_gauges("token_budget", get_token_budget().stats())
+    extra += stats_gauges("model_router", get_model_router().stats())
+    for name, stats in get_model_router().backend_stats().items():
+        extra += stats_gauges("model_backend", stats, backend=name)
+    for name, stats in get_resilience().stats().items():
+        extra += stats_gauges("upstream", stats, upstream=name)
+    openmetrics = "application/openmetrics-text" in request.headers.get("accept", "")
+    media_type = (
+        "application/openmetrics-text; version=1.0.0; charset=utf-8"
+        if openmetrics
+        else "text/plain; version=0.0.4; charset=utf-8"
+    )
+    return PlainTextResponse(
+        telemetry.render(openmetrics=openmetrics, extra_gauges=extra), media_type=media_type
+    )
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    if _ai_client is not None:
+        from transport import get_transport
+
+        await _ai_client.aclose()
+        # The async Anthropic client belongs to the shared transport
+        await get_transport().aclose()
+
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,357 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import asyncio, logging, os, time
+
+from ai_client import AIClient
+from prompt_cache import add_usage
+from token_budget import merge_parts
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncAIClient(AIClient):
+    """
+    An asyncio-native variant of AIClient.
+
+    The prompt evaluation does not depend on Claude's output, so when the
+    speculation policy allows it (should_speculate()),
+    acomplete_evaluation_flow starts the pre-evaluation and the generation
+    together and only evaluates the response once both are done; otherwise
+    the generation waits for the prompt gate. Claude is
+    called through AsyncAnthropic; the Inspeq SDK is blocking (requests), so
+    its calls are dispatched to a dedicated thread pool instead of the
+    event loop's default executor, which is too small to keep hundreds of
+    flows in flight.
+
+    Attributes:
+        async_claude_client (AsyncAnthropic): Async Anthropic API client.
+        inspeq_executor (ThreadPoolExecutor): Pool running the blocking Inspeq calls.
+
+    Raises:
+        Exception: If initialization fails or required environment variables are missing.
+    """
+
+    def __init__(
+        self,
+        max_workers=64,
+        result_sink=None,
+        transport=None,
+        response_cache=None,
+        resilience=None,
+        speculation=None,
+        telemetry=None,
+        prompt_cache=None,
+        token_budget=None,
+        model_router=None,
+    ):
+        super().__init__(
+            result_sink=result_sink,
+            transport=transport,
+            response_cache=response_cache,
+            resilience=resilience,
+            speculation=speculation,
+            telemetry=telemetry,
+            prompt_cache=prompt_cache,
+            token_budget=token_budget,
+            model_router=model_router,
+        )
+        try:
+            self._async_claude_client = None
+            self.inspeq_executor = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="inspeq"
+            )
+        except Exception as e:
+            logger.error(f"Failed to initialize AsyncAIClient: {str(e)}")
+            raise Exception(f"Initialization failed: {str(e)}")
+
+    @property
+    def async_claude_client(self):
+        if self._async_claude_client is None:
+            with self._init_lock:
+                if self._async_claude_client is None:
+                    from anthropic import AsyncAnthropic
+
+                    self._async_claude_client = AsyncAnthropic(
+                        api_key=os.getenv("CLAUDE_API_KEY"),
+                        http_client=self.transport.async_anthropic_http_client(),
+                        max_retries=0,
+                    )
+        return self._async_claude_client
+
+    @async_claude_client.setter
+    def async_claude_client(self, client):
+        self._async_claude_client = client
+
+    async def _run_blocking(self, operation, *args, **kwargs):
+        """Run a blocking call on the Inspeq thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.inspeq_executor, partial(operation, *args, **kwargs)
+        )
+
+    async def _acall_backend(self, backend, request):
+        if backend == "bedrock":
+            # boto3 is blocking; keep the event loop free while Bedrock generates
+            return await self.resilience.upstream("bedrock").acall(
+                asyncio.to_thread, self._invoke_bedrock, request
+            )
+        return await self.resilience.upstream("anthropic").acall(
+            self.async_claude_client.messages.create, **request
+        )
+
+    async def _agenerate(self, plan, usage=None, metrics=None) -> str:
+        """Generate on the routed backends in order, moving on when one fails"""
+        route = self._route(plan, metrics)
+        for index, (backend, model) in enumerate(route.candidates):
+            started = time.monotonic()
+            try:
+                with self.telemetry.span("generate", backend=backend, tier=route.tier) as span:
+                    message = await self._acall_backend(
+                        backend, self._claude_request(plan, model, backend)
+                    )
+                    self._record_tokens(message, span)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.model_router.record(backend, time.monotonic() - started, ok=False)
+                if index + 1 == len(route.candidates):
+                    e.upstream = backend
+                    raise
+                self.model_router.fell_back(backend, e)
+                continue
+            self._record_route(route, backend, message, time.monotonic() - started)
+            self._record_usage(message, usage)
+            return message.content[0].text
+
+    async def aask_claude(
+        self, prompt, context, use_cache=True, usage=None, metrics=None, failed_backends=None
+    ):
+        """
+        Send request to Claude API without blocking the event loop (usage,
+        metrics and failed_backends as in ask_claude)
+        """
+        if use_cache:
+            hit = self._cached_response(prompt, context)
+            if hit is not None:
+                return hit.response
+
+        try:
+            logger.info("Sending request to Claude API")
+            plan = self._plan(prompt, context)
+            if plan.parts:
+                usages = [{} for _ in plan.parts]
+                response = merge_parts(
+                    await asyncio.gather(
+                        *(
+                            self._agenerate(part, part_usage, metrics)
+                            for part, part_usage in zip(plan.parts, usages)
+                        )
+                    )
+                )
+                if usage is not None:
+                    for part_usage in usages:
+                        add_usage(usage, part_usage)
+            else:
+                response = await self._agenerate(plan, usage, metrics)
+            logger.info("Successfully received response from Claude")
+            if use_cache:
+                self._cache_response(prompt, context, response)
+            return response
+
+        except asyncio.CancelledError:
+            logger.info("Claude request cancelled")
+            raise
+        except Exception as e:
+            logger.error(f"Claude API error: {str(e)}")
+            if failed_backends is not None:
+                failed_backends.append(getattr(e, "upstream", "anthropic"))
+            return None
+
+    async def aevaluate_prompt(self, prompt, context=None, metrics=None):
+        """Evaluate prompt with InspeqAI on the Inspeq thread pool"""
+        return await self._run_blocking(
+            self.evaluate_prompt, prompt=prompt, context=context, metrics=metrics
+        )
+
+    async def aevaluate_response(self, prompt, response, context=None, metrics=None):
+        """Evaluate response with InspeqAI on the Inspeq thread pool"""
+        return await self._run_blocking(
+            self.evaluate_response,
+            prompt=prompt,
+            response=response,
+            context=context,
+            metrics=metrics,
+        )
+
+    async def acomplete_evaluation_flow(
+        self,
+        prompt,
+        context=None,
+        prompt_metrics=None,
+        response_metrics=None,
+        max_retries=3,
+        retry_delay=1,
+        cancel_on_failed_prompt=False,
+    ):
+        """
+        Complete flow with the prompt evaluation and Claude's generation running concurrently.
+
+        Generation starts alongside the prompt evaluation when the speculation
+        policy allows it, and after it otherwise. If cancel_on_failed_prompt
+        is set and any prompt metric fails, the in-flight generation is
+        cancelled and the result is returned without a response. Stages that
+        already succeeded are not repeated on retry. With a response cache, a
+        hit replaces the generation and, when one is stored for
+        response_metrics, the response evaluation; the prompt is always
+        evaluated.
+        """
+        result = {}
+        tasks = []
+        hit = cache_key = None
+        run = None
+        failed_backends = []  # backend of each failed generation, latest last
+
+        try:
+            for attempt in range(max_retries):
+                try:
+                    logger.info(f"Starting async evaluation flow - Attempt {attempt + 1}")
+                    tasks = []
+
+                    prompt_task = None
+                    if "prompt_evaluation" not in result:
+                        prompt_task = asyncio.create_task(
+                            self.aevaluate_prompt(
+                                prompt=prompt, context=context, metrics=prompt_metrics
+                            )
+                        )
+                        tasks.append(prompt_task)
+
+                    # A cached response (and its evaluation) replaces the generation
+                    if hit is None and "response" not in result:
+                        hit = self._cached_response(prompt, context, metrics=response_metrics)
+                        if hit is not None:
+                            cache_key = hit.key
+                            result["response"] = hit.response
+                            result["cache"] = hit.info()
+
+                    generation_task = None
+                    if (
+                        "response" not in result
+                        and prompt_task is not None
+                        and self.speculation.should_speculate(prompt, context)
+                    ):
+                        run = self.speculation.start()
+                        generation_task = asyncio.create_task(
+                            self.aask_claude(
+                                prompt,
+                                context,
+                                use_cache=False,
+                                usage=run.usage,
+                                metrics=response_metrics,
+                                failed_backends=failed_backends,
+                            )
+                        )
+                        run.future = generation_task
+                        tasks.append(generation_task)
+
+                    # Step 1: Gate on the prompt evaluation while Claude generates
+                    if prompt_task is not None:
+                        prompt_evaluation = await prompt_task
+                        if prompt_evaluation is None:
+                            raise self._step_failed("Failed to evaluate prompt", "inspeq")
+                        result["prompt_evaluation"] = prompt_evaluation
+                        failed = self._has_failed_metrics(prompt_evaluation)
+                        self.speculation.record_gate(not failed, run)
+                        if failed:
+                            result["failed_metrics"] = True
+                            if cancel_on_failed_prompt:
+                                logger.warning(
+                                    "Prompt evaluation failed, cancelling generation"
+                                )
+                                if run is not None:
+                                    self._discard_speculation(run)
+                                    run = None
+                                await self._cancel(tasks)
+                                await self._run_blocking(
+                                    self._save_response, result, prompt=prompt
+                                )
+                                return result
+
+                    # Step 2: Collect Claude's response, started now if it was
+                    # not speculated
+                    if "response" not in result:
+                        if generation_task is not None:
+                            claude_response = await generation_task
+                            self.speculation.commit(run)
+                        else:
+                            claude_response = await self.aask_claude(
+                                prompt,
+                                context,
+                                use_cache=False,
+                                metrics=response_metrics,
+                                failed_backends=failed_backends,
+                            )
+                        run = None
+                        if not claude_response:
+                            raise self._generation_failed(failed_backends)
+                        result["response"] = claude_response
+                        cache_key = self._cache_response(prompt, context, claude_response)
+
+                    # Step 3: Evaluate the response
+                    response_evaluation = hit.evaluation(response_metrics) if hit else None
+                    if response_evaluation is None:
+                        response_evaluation = await self.aevaluate_response(
+                            prompt=prompt,
+                            context=context,
+                            response=result["response"],
+                            metrics=response_metrics,
+                        )
+                        if response_evaluation is None:
+                            raise self._step_failed("Failed to evaluate response", "inspeq")
+                        self._cache_evaluation(cache_key, response_metrics, response_evaluation)
+                    result["response_evaluation"] = response_evaluation
+                    if self._has_failed_metrics(response_evaluation):
+                        result["failed_metrics"] = True
+
+                    # For bookkeeping, save the complete response locally
+                    await self._run_blocking(
+                        self._save_response, result, prompt=prompt
+                    )
+                    self._record_attempt(attempt, "ok")
+                    logger.info("Async evaluation flow completed successfully")
+                    return result
+
+                except Exception as e:
+                    self._record_attempt(attempt, "error")
+                    if run is not None:
+                        self._discard_speculation(run)
+                        run = None
+                    await self._cancel(tasks)
+                    logger.warning(f"Attempt {attempt + 1} failed: {str(e)}")
+                    if attempt < max_retries - 1 and not self._circuit_open(e):
+                        await asyncio.sleep(retry_delay)
+                    else:
+                        logger.error("All retry attempts failed")
+                        return {
+                            "error": str(e),
+                            "prompt_evaluation": result.get("prompt_evaluation"),
+                            "response": result.get("response"),
+                            "response_evaluation": result.get("response_evaluation"),
+                        }
+        finally:
+            # The flow itself may be cancelled by the caller
+            if run is not None:
+                self._discard_speculation(run)
+            await self._cancel(tasks)
+
+    @staticmethod
+    async def _cancel(tasks) -> None:
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def aclose(self) -> None:
+        """Release the Inspeq thread pool; the HTTP clients belong to the shared transport"""
+        self.inspeq_executor.shutdown(wait=False)
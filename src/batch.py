@@ -0,0 +1,229 @@
+from async_ai_client import AsyncAIClient
+from batch_evaluator import BatchEvaluator
+from evaluation_cache import EvaluationCache
+from jobs import record_id
+from result_sink import NullSink
+import argparse, asyncio, json, logging, os, time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROMPT_METRICS = ["DATA_LEAKAGE"]
+DEFAULT_RESPONSE_METRICS = ["ANSWER_RELEVANCE", "FACTUAL_CONSISTENCY"]
+
+
+class AsyncRateLimiter:
+    """Token bucket limiting how many flows start per second"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def read_records(path):
+    """Stream JSONL records without loading the whole file"""
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                logger.warning(f"Skipping invalid JSON on line {line_number} of {path}")
+
+
+def completed_ids(path) -> set:
+    """IDs already evaluated successfully in a previous run"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    for record in read_records(path):
+        if record.get("status") == "ok":
+            done.add(record.get("id"))
+    return done
+
+
+class BatchRunner:
+    """
+    Runs JSONL records through AsyncAIClient.acomplete_evaluation_flow.
+
+    At most `concurrency` flows are in flight and at most `rate` start per
+    second. Results are appended to the output as soon as each flow finishes,
+    so a crashed run resumes by skipping the IDs already marked "ok".
+    """
+
+    def __init__(
+        self,
+        client,
+        concurrency=32,
+        rate=5.0,
+        prompt_metrics=None,
+        response_metrics=None,
+        progress_interval=10.0,
+    ):
+        self.client = client
+        self.concurrency = concurrency
+        self.limiter = AsyncRateLimiter(rate)
+        self.prompt_metrics = prompt_metrics or DEFAULT_PROMPT_METRICS
+        self.response_metrics = response_metrics or DEFAULT_RESPONSE_METRICS
+        self.progress_interval = progress_interval
+
+        self.processed = 0
+        self.failed = 0
+        self.skipped = 0
+
+    async def run(self, input_path, output_path) -> None:
+        done = completed_ids(output_path)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        started = time.monotonic()
+        reporter = asyncio.create_task(self._report_progress(started))
+        tasks = set()
+
+        with open(output_path, "a+") as output:
+            # A crash may have left a partial last line behind
+            if output.tell() > 0:
+                output.seek(output.tell() - 1)
+                if output.read(1) != "\n":
+                    output.write("\n")
+
+            try:
+                for record in read_records(input_path):
+                    rid = record_id(record)
+                    if rid in done:
+                        self.skipped += 1
+                        continue
+                    done.add(rid)
+
+                    await semaphore.acquire()
+                    task = asyncio.create_task(
+                        self._evaluate(rid, record, output, semaphore)
+                    )
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+
+                if tasks:
+                    await asyncio.gather(*tasks)
+            finally:
+                reporter.cancel()
+
+        elapsed = time.monotonic() - started
+        logger.info(
+            f"Batch finished: {self.processed} processed ({self.failed} failed), "
+            f"{self.skipped} skipped in {elapsed:.1f}s "
+            f"({self.processed / elapsed if elapsed else 0:.2f} records/s)"
+        )
+
+    async def _evaluate(self, rid, record, output, semaphore) -> None:
+        try:
+            await self.limiter.acquire()
+            result = await self.client.acomplete_evaluation_flow(
+                prompt=record.get("prompt") or record.get("body", ""),
+                context=record.get("context"),
+                prompt_metrics=record.get("prompt_metrics") or self.prompt_metrics,
+                response_metrics=record.get("response_metrics")
+                or self.response_metrics,
+            )
+            status = "error" if result.get("error") else "ok"
+        except Exception as e:
+            result, status = {"error": str(e)}, "error"
+        finally:
+            semaphore.release()
+
+        self.processed += 1
+        self.failed += status == "error"
+        output.write(json.dumps({"id": rid, "status": status, **result}) + "\n")
+        output.flush()
+
+    async def _report_progress(self, started) -> None:
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            elapsed = time.monotonic() - started
+            logger.info(
+                f"Progress: {self.processed} processed ({self.failed} failed), "
+                f"{self.skipped} skipped, {self.processed / elapsed:.2f} records/s"
+            )
+
+
+def _metric_list(value):
+    return [metric.strip() for metric in value.split(",") if metric.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run the evaluation flow over a JSONL file of prompt/context records"
+    )
+    parser.add_argument("input", help="JSONL file with prompt, context and optional id/metrics")
+    parser.add_argument("output", help="JSONL file results are appended to")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--rate", type=float, default=5.0, help="Flows started per second")
+    parser.add_argument("--prompt-metrics", type=_metric_list)
+    parser.add_argument("--response-metrics", type=_metric_list)
+    parser.add_argument("--progress-interval", type=float, default=10.0)
+    parser.add_argument(
+        "--batch-evaluations",
+        action="store_true",
+        help="Pack concurrent Inspeq evaluations into multi-item calls",
+    )
+    parser.add_argument("--cache", help="SQLite file for the evaluation cache")
+    parser.add_argument(
+        "--local-metrics",
+        action="store_true",
+        help="Score lexical metrics (BLEU, ROUGE, ...) in-process instead of through Inspeq",
+    )
+    args = parser.parse_args(argv)
+
+    async def run():
+        # The per-flow response files are replaced by the batch output
+        client = AsyncAIClient(
+            max_workers=max(args.concurrency * 2, 8), result_sink=NullSink()
+        )
+        evaluators = []
+        if args.batch_evaluations:
+            client.inspeq_eval = BatchEvaluator(client.inspeq_eval)
+            evaluators.append(client.inspeq_eval)
+        if args.cache:
+            client.inspeq_eval = EvaluationCache(client.inspeq_eval, path=args.cache)
+            evaluators.append(client.inspeq_eval)
+        if args.local_metrics:
+            # NumPy is only loaded when the lexical metrics are scored locally
+            from local_metrics import LocalMetrics
+
+            client.inspeq_eval = LocalMetrics(client.inspeq_eval)
+            evaluators.append(client.inspeq_eval)
+
+        runner = BatchRunner(
+            client,
+            concurrency=args.concurrency,
+            rate=args.rate,
+            prompt_metrics=args.prompt_metrics,
+            response_metrics=args.response_metrics,
+            progress_interval=args.progress_interval,
+        )
+        try:
+            await runner.run(args.input, args.output)
+        finally:
+            for evaluator in reversed(evaluators):
+                evaluator.close()
+            await client.aclose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
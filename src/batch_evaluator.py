@@ -0,0 +1,268 @@
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import json, logging, threading, time
+
+logger = logging.getLogger(__name__)
+
+# Fields of an input item that its results echo back
+MATCH_FIELDS = ("prompt", "response", "context")
+
+
+class BatchEvaluator:
+    """
+    Micro-batching front for InspeqEval.evaluate_llm_task.
+
+    Concurrent callers submit single evaluations; pending items that share the
+    same metrics, task name and metrics config are packed into one multi-item
+    input_data request once max_batch_size items are waiting or the oldest
+    one has waited max_wait seconds. Each caller gets back a response shaped
+    like the SDK's, holding only the results for its own items.
+
+    BatchEvaluator exposes the same evaluate_llm_task signature as InspeqEval,
+    so it can replace the client's evaluator in place:
+
+        client.inspeq_eval = BatchEvaluator(client.inspeq_eval)
+
+    Attributes:
+        inspeq_eval (InspeqEval): The wrapped evaluator doing the network calls.
+        max_batch_size (int): Items that trigger an immediate flush.
+        max_wait (float): Seconds the oldest pending item may wait before a flush.
+    """
+
+    def __init__(
+        self, inspeq_eval, max_batch_size=16, max_wait=0.05, max_in_flight=8
+    ):
+        self.inspeq_eval = inspeq_eval
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        self._pending = OrderedDict()  # batch key -> [(deadline, item, future)]
+        self._condition = threading.Condition()
+        self._closed = False
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_in_flight, thread_name_prefix="inspeq-batch"
+        )
+        self._stats = BatchStats()
+        self._flusher = threading.Thread(
+            target=self._run, name="inspeq-batch-flusher", daemon=True
+        )
+        self._flusher.start()
+
+    def submit(self, metrics_list, input_item, task_name=None, metrics_config=None):
+        """Queue one input item for evaluation and return a Future of its response"""
+        future = Future()
+        key = (
+            tuple(metrics_list or []),
+            task_name,
+            json.dumps(metrics_config or {}, sort_keys=True),
+        )
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("BatchEvaluator is closed")
+            deadline = time.monotonic() + self.max_wait
+            self._pending.setdefault(key, []).append((deadline, input_item, future))
+            self._condition.notify()
+        return future
+
+    def evaluate_llm_task(
+        self, metrics_list, input_data, task_name=None, metrics_config=None
+    ):
+        """Drop-in replacement for InspeqEval.evaluate_llm_task"""
+        futures = [
+            self.submit(metrics_list, item, task_name, metrics_config)
+            for item in input_data
+        ]
+        responses = [future.result() for future in futures]
+        if len(responses) == 1:
+            return responses[0]
+
+        merged = dict(responses[-1])
+        merged["results"] = [r for response in responses for r in response["results"]]
+        return merged
+
+    def stats(self) -> dict:
+        """Batch-size and per-batch latency figures for tuning the window"""
+        return self._stats.snapshot()
+
+    def close(self) -> None:
+        """Flush everything still pending and stop the background flusher"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._flusher.join()
+        self._executor.shutdown(wait=True)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                ready = self._take_ready_batches()
+                while not ready and not (self._closed and not self._pending):
+                    self._condition.wait(timeout=self._next_wakeup())
+                    ready = self._take_ready_batches()
+                if not ready and self._closed:
+                    return
+
+            for key, batch in ready:
+                self._executor.submit(self._dispatch, key, batch)
+
+    def _next_wakeup(self):
+        if not self._pending:
+            return None
+        oldest = min(batch[0][0] for batch in self._pending.values())
+        return max(oldest - time.monotonic(), 0)
+
+    def _take_ready_batches(self):
+        now = time.monotonic()
+        ready = []
+        for key in list(self._pending):
+            batch = self._pending[key]
+            while len(batch) >= self.max_batch_size:
+                ready.append((key, batch[: self.max_batch_size]))
+                batch = batch[self.max_batch_size :]
+            if batch and (self._closed or batch[0][0] <= now):
+                ready.append((key, batch))
+                batch = []
+            if batch:
+                self._pending[key] = batch
+            else:
+                del self._pending[key]
+        return ready
+
+    def _dispatch(self, key, batch) -> None:
+        metrics_list, task_name, metrics_config = key
+        metrics_config = json.loads(metrics_config) or None
+
+        # Identical items in the same batch are only evaluated once
+        unique_items = OrderedDict()
+        for _, item, _ in batch:
+            unique_items.setdefault(json.dumps(item, sort_keys=True), item)
+        input_data = list(unique_items.values())
+        slots = {item_key: index for index, item_key in enumerate(unique_items)}
+
+        start = time.perf_counter()
+        try:
+            response = self.inspeq_eval.evaluate_llm_task(
+                metrics_list=list(metrics_list),
+                input_data=input_data,
+                task_name=task_name,
+                metrics_config=metrics_config,
+            )
+            groups = self._split_results(response.get("results", []), input_data)
+        except Exception as e:
+            self._stats.record(len(batch), time.perf_counter() - start, failed=True)
+            logger.error(f"Batch evaluation of {len(batch)} items failed: {str(e)}")
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        self._stats.record(len(batch), time.perf_counter() - start)
+        logger.debug(
+            f"Evaluated batch of {len(input_data)} items in "
+            f"{(time.perf_counter() - start) * 1000:.1f} ms"
+        )
+
+        if groups is None:
+            # Results could not be attributed to items, evaluate them one by one
+            logger.warning("Could not split batch results, falling back to single calls")
+            for _, item, future in batch:
+                self._executor.submit(
+                    self._dispatch_single, metrics_list, item, task_name, metrics_config, future
+                )
+            return
+
+        for _, item, future in batch:
+            item_response = {k: v for k, v in response.items() if k != "results"}
+            item_response["results"] = groups[slots[json.dumps(item, sort_keys=True)]]
+            future.set_result(item_response)
+
+    def _dispatch_single(self, metrics_list, item, task_name, metrics_config, future):
+        try:
+            future.set_result(
+                self.inspeq_eval.evaluate_llm_task(
+                    metrics_list=list(metrics_list),
+                    input_data=[item],
+                    task_name=task_name,
+                    metrics_config=metrics_config,
+                )
+            )
+        except Exception as e:
+            future.set_exception(e)
+
+    @staticmethod
+    def _split_results(results, input_data):
+        """
+        Attribute a multi-item response's results to their input items by
+        the prompt, response and context each result echoes back, or None
+        when that cannot be done unambiguously. The order of the results
+        is never relied on.
+        """
+        if len(input_data) == 1:
+            return [list(results)]
+
+        slots = {}  # echoed field names -> {field values -> item indexes}
+        groups = [[] for _ in input_data]
+        for result in results:
+            echoed = result.get("data_input")
+            if not isinstance(echoed, dict):
+                echoed = result
+            names = tuple(name for name in MATCH_FIELDS if name in echoed)
+            if not names:
+                return None
+            if names not in slots:
+                slots[names] = {}
+                for index, item in enumerate(input_data):
+                    slots[names].setdefault(_fields(item, names), []).append(index)
+            indexes = slots[names].get(_fields(echoed, names), ())
+            if len(indexes) != 1:
+                return None
+            groups[indexes[0]].append(result)
+
+        if not all(groups):
+            return None
+        return groups
+
+
+class BatchStats:
+    """Thread-safe batch size and latency samples over a sliding window"""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=window)
+        self._sizes = Counter()
+        self.batches = 0
+        self.items = 0
+        self.failures = 0
+
+    def record(self, size, latency, failed=False) -> None:
+        with self._lock:
+            self._samples.append((size, latency))
+            self._sizes[size] += 1
+            self.batches += 1
+            self.items += size
+            self.failures += int(failed)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            latencies = sorted(latency for _, latency in self._samples)
+            sizes = [size for size, _ in self._samples]
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "failures": self.failures,
+                "mean_batch_size": sum(sizes) / len(sizes) if sizes else 0.0,
+                "batch_size_histogram": dict(sorted(self._sizes.items())),
+                "latency_p50_ms": _percentile(latencies, 50) * 1000,
+                "latency_p95_ms": _percentile(latencies, 95) * 1000,
+                "latency_max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+            }
+
+
+def _fields(item, names):
+    return tuple(item.get(name) or "" for name in names)
+
+
+def _percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * percent / 100))
+    return sorted_values[index]
@@ -0,0 +1,186 @@
+from collections import OrderedDict
+from env_policy import Shared
+import hashlib, logging, os, threading
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_PREFIX = "claim-check://sha256/"
+# Fields large enough to be worth offloading between states
+DEFAULT_FIELDS = ("prompt", "context", "llm_response")
+
+
+class ClaimCheckError(Exception):
+    """Raised when a referenced blob is missing or does not match its hash"""
+
+
+def is_reference(value) -> bool:
+    return isinstance(value, str) and value.startswith(REFERENCE_PREFIX)
+
+
+class FileBlobStore:
+    """Content-addressed blobs in a local directory, the stand-in for S3"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, digest):
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def put(self, digest, data) -> None:
+        path = self._path(digest)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(data)
+        os.replace(temporary, path)
+
+    def get(self, digest) -> bytes:
+        try:
+            with open(self._path(digest), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise ClaimCheckError(f"Blob {digest} not found in {self.directory}")
+
+
+class S3BlobStore:
+    """Content-addressed blobs in an S3 bucket under `prefix`"""
+
+    def __init__(self, bucket, prefix="claim-check/", s3_client=None):
+        self.bucket = bucket
+        self.prefix = prefix
+        if s3_client is None:
+            import boto3
+
+            s3_client = boto3.client("s3")
+        self.s3 = s3_client
+
+    def put(self, digest, data) -> None:
+        self.s3.put_object(Bucket=self.bucket, Key=f"{self.prefix}{digest}", Body=data)
+
+    def get(self, digest) -> bytes:
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=f"{self.prefix}{digest}")
+        except Exception as e:
+            raise ClaimCheckError(f"Blob {digest} not found in s3://{self.bucket}: {str(e)}")
+        return response["Body"].read()
+
+
+class ClaimCheck:
+    """
+    Swaps large text fields for content-hash references and back.
+
+    Strings longer than `threshold` bytes are stored once under their
+    SHA-256 and replaced by "claim-check://sha256/<digest>"; references are
+    only fetched when a handler resolves them, and resolved texts are kept
+    in a small LRU so warm invocations skip the store.
+
+    Attributes:
+        store: Blob store with put(digest, data) and get(digest).
+        threshold (int): Minimum UTF-8 size in bytes for a field to be offloaded.
+    """
+
+    def __init__(self, store, threshold=8192, cache_entries=64):
+        self.store = store
+        self.threshold = threshold
+        self.cache_entries = cache_entries
+        self._cache = OrderedDict()
+        self._stored = set()
+        self._lock = threading.Lock()
+
+    def offload(self, value):
+        """Return a reference for large strings, anything else unchanged"""
+        if not isinstance(value, str) or is_reference(value):
+            return value
+        data = value.encode("utf-8")
+        if len(data) < self.threshold:
+            return value
+        digest = hashlib.sha256(data).hexdigest()
+        if digest not in self._stored:
+            self.store.put(digest, data)
+            with self._lock:
+                self._stored.add(digest)
+        self._remember(digest, value)
+        return f"{REFERENCE_PREFIX}{digest}"
+
+    def resolve(self, value):
+        """Return the text behind a reference, anything else unchanged"""
+        if not is_reference(value):
+            return value
+        digest = value[len(REFERENCE_PREFIX) :]
+        with self._lock:
+            if digest in self._cache:
+                self._cache.move_to_end(digest)
+                return self._cache[digest]
+        data = self.store.get(digest)
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ClaimCheckError(f"Blob {digest} does not match its hash")
+        text = data.decode("utf-8")
+        self._remember(digest, text)
+        return text
+
+    def offload_fields(self, payload, fields=DEFAULT_FIELDS) -> dict:
+        return {
+            key: self.offload(value) if key in fields else value
+            for key, value in payload.items()
+        }
+
+    def resolve_fields(self, payload, fields=DEFAULT_FIELDS) -> dict:
+        return {
+            key: self.resolve(value) if key in fields else value
+            for key, value in payload.items()
+        }
+
+    def _remember(self, digest, text) -> None:
+        with self._lock:
+            self._cache[digest] = text
+            self._cache.move_to_end(digest)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+
+
+def default_claim_check():
+    """
+    ClaimCheck configured from the environment, or None when disabled.
+
+    CLAIM_CHECK_BUCKET (and optional CLAIM_CHECK_PREFIX) selects S3,
+    CLAIM_CHECK_DIR a local directory; CLAIM_CHECK_THRESHOLD sets the size
+    in bytes above which fields are offloaded (default 8192).
+    """
+    threshold = int(os.getenv("CLAIM_CHECK_THRESHOLD", "8192"))
+    if os.getenv("CLAIM_CHECK_BUCKET"):
+        store = S3BlobStore(
+            os.environ["CLAIM_CHECK_BUCKET"], os.getenv("CLAIM_CHECK_PREFIX", "claim-check/")
+        )
+    elif os.getenv("CLAIM_CHECK_DIR"):
+        store = FileBlobStore(os.environ["CLAIM_CHECK_DIR"])
+    else:
+        return None
+    return ClaimCheck(store, threshold=threshold)
+
+
+_shared = Shared(default_claim_check)
+
+
+def get_claim_check():
+    """Process-wide default_claim_check(), built on first use; None when disabled"""
+    return _shared.get()
+
+
+def resolve(value):
+    """Text behind a claim-check reference from the default store, anything else unchanged"""
+    if not is_reference(value):
+        return value
+    if get_claim_check() is None:
+        raise ClaimCheckError(
+            "Received a claim-check reference but no claim-check store is configured"
+        )
+    return get_claim_check().resolve(value)
+
+
+def offload(value):
+    """Reference for a large string when a default store is configured, anything else unchanged"""
+    claim_check = get_claim_check()
+    return claim_check.offload(value) if claim_check is not None else value
@@ -0,0 +1,59 @@
+from dataclasses import replace
+import os, threading
+
+TRUE_VALUES = ("1", "true", "yes", "on")
+FALSE_VALUES = ("0", "false", "no", "off")
+
+
+def parse_env_value(name, value, default):
+    """`value` as the type of `default`; booleans must be one of TRUE_VALUES or FALSE_VALUES"""
+    if isinstance(default, bool):
+        # bool("false") is True, so booleans are matched by name
+        lowered = value.strip().lower()
+        if lowered in TRUE_VALUES:
+            return True
+        if lowered in FALSE_VALUES:
+            return False
+        raise ValueError(f"{name} must be true or false, got {value!r}")
+    return type(default)(value)
+
+
+def env_flag(name, default=False) -> bool:
+    """Boolean environment variable, `default` when it is not set"""
+    value = os.getenv(name)
+    return default if value is None else parse_env_value(name, value, default)
+
+
+def policy_from_env(cls, prefix, defaults=None):
+    """
+    A copy of `defaults` (or cls()) with each field overridden by the
+    <prefix>_<FIELD> environment variable, when it is set
+    """
+    policy = replace(defaults) if defaults is not None else cls()
+    for field_name, default in vars(policy).items():
+        name = f"{prefix}_{field_name.upper()}"
+        value = os.getenv(name)
+        if value is not None:
+            setattr(policy, field_name, parse_env_value(name, value, default))
+    return policy
+
+
+class Shared:
+    """
+    One instance per process, built by `factory` on the first get(). The
+    factory may return None, for a feature that is turned off.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._instance = None
+        self._built = False
+        self._lock = threading.Lock()
+
+    def get(self):
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    self._instance = self._factory()
+                    self._built = True
+        return self._instance
@@ -0,0 +1,197 @@
+from collections import OrderedDict
+import hashlib, json, logging, sqlite3, threading, time
+
+logger = logging.getLogger(__name__)
+
+
+class EvaluationCache:
+    """
+    Content-addressed cache in front of InspeqEval.evaluate_llm_task.
+
+    Every metric result is stored under a hash of (prompt, context, response,
+    metric, task_name, metrics_config). Lookups go through an in-memory LRU
+    tier with a TTL and then an optional SQLite tier that survives restarts.
+    Metrics that hit the cache are served without a network call; only the
+    missing metrics are requested from the wrapped evaluator.
+
+    EvaluationCache exposes the same evaluate_llm_task signature as InspeqEval,
+    so it can wrap the client's evaluator (or a BatchEvaluator) in place:
+
+        client.inspeq_eval = EvaluationCache(client.inspeq_eval, path="evaluations.sqlite3")
+
+    Attributes:
+        inspeq_eval (InspeqEval): The wrapped evaluator doing the network calls.
+        ttl (float): Seconds a cached metric result stays valid.
+        hits (int): Metric results served from the cache.
+        misses (int): Metric results requested from the wrapped evaluator.
+    """
+
+    def __init__(self, inspeq_eval, max_entries=10000, ttl=7 * 24 * 3600, path=None):
+        self.inspeq_eval = inspeq_eval
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+        self._memory = OrderedDict()  # key -> (expires_at, result)
+        self._lock = threading.Lock()
+        self._remaining_credits = "N/A"
+
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS evaluations "
+                "(key TEXT PRIMARY KEY, result TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM evaluations WHERE expires_at < ?", (time.time(),))
+            self._db.commit()
+
+    @staticmethod
+    def cache_key(item, metric, task_name, metrics_config=None) -> str:
+        """Hash of the inputs that determine a metric's result"""
+        material = json.dumps(
+            [
+                item.get("prompt") or "",
+                item.get("context") or "",
+                item.get("response") or "",
+                metric,
+                task_name,
+                metrics_config or {},
+            ],
+            sort_keys=True,
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def evaluate_llm_task(
+        self, metrics_list, input_data, task_name=None, metrics_config=None
+    ):
+        """Drop-in replacement for InspeqEval.evaluate_llm_task"""
+        metrics_list = list(metrics_list or [])
+        results = []
+        response = None
+        hits = misses = 0
+
+        for item in input_data:
+            keys = {
+                metric: self.cache_key(item, metric, task_name, metrics_config)
+                for metric in metrics_list
+            }
+            cached = {}
+            for metric, key in keys.items():
+                result = self.get(key)
+                if result is not None:
+                    cached[metric] = result
+            missing = [metric for metric in metrics_list if metric not in cached]
+            hits += len(cached)
+            misses += len(missing)
+
+            fetched = {}
+            unmatched = []
+            if missing:
+                logger.info(
+                    f"Evaluation cache: {len(cached)} hit(s), requesting {len(missing)} metric(s)"
+                )
+                response = self.inspeq_eval.evaluate_llm_task(
+                    metrics_list=missing,
+                    input_data=[item],
+                    task_name=task_name,
+                    metrics_config=metrics_config,
+                )
+                self._remaining_credits = response.get(
+                    "remaining_credits", self._remaining_credits
+                )
+                for result in response.get("results", []):
+                    metric = self._requested_metric(result, missing)
+                    if metric is None or metric in fetched:
+                        unmatched.append(result)
+                        continue
+                    fetched[metric] = result
+                    if not result.get("error_message"):
+                        self.put(keys[metric], result)
+
+            for metric in metrics_list:
+                if metric in cached:
+                    results.append(cached[metric])
+                elif metric in fetched:
+                    results.append(fetched[metric])
+            results.extend(unmatched)
+
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+        merged = dict(response) if response is not None else {
+            "status": 200,
+            "message": "Served from evaluation cache",
+            "remaining_credits": self._remaining_credits,
+        }
+        merged["results"] = results
+        merged["cache"] = {"hits": hits, "misses": misses}
+        return merged
+
+    @staticmethod
+    def _requested_metric(result, requested):
+        name = str(result.get("metric_name", ""))
+        for candidate in (name, name.removesuffix("_EVALUATION")):
+            if candidate in requested:
+                return candidate
+        return None
+
+    def get(self, key):
+        """Look a metric result up in memory, then on disk"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, result = entry
+                if expires_at >= now:
+                    self._memory.move_to_end(key)
+                    return result
+                del self._memory[key]
+
+            if self._db is None:
+                return None
+            row = self._db.execute(
+                "SELECT result, expires_at FROM evaluations WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] < now:
+                return None
+            result = json.loads(row[0])
+            self.disk_hits += 1
+            self._remember(key, row[1], result)
+            return result
+
+    def put(self, key, result) -> None:
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, expires_at, result)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO evaluations (key, result, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(result), expires_at),
+                )
+                self._db.commit()
+
+    def _remember(self, key, expires_at, result) -> None:
+        self._memory[key] = (expires_at, result)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+            }
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -1,21 +1,40 @@
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 import logging
 
+from telemetry import get_telemetry
+
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 
 
-@dataclass
+# Label sets repeat across results (they come from the metric configs), so
+# equal tuples are shared instead of being allocated once per result
+_interned_labels: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+
+def _intern_labels(labels) -> Tuple[str, ...]:
+    """Labels as a shared tuple; a single label that is not a list becomes a 1-tuple"""
+    labels = tuple(labels) if isinstance(labels, (list, tuple)) else (str(labels),)
+    if len(_interned_labels) < 4096:
+        return _interned_labels.setdefault(labels, labels)
+    return _interned_labels.get(labels, labels)
+
+
+@dataclass(slots=True)
 class MetricResult:
+    # Slotted with tuple label fields: no per-instance __dict__ and no
+    # over-allocated lists when large evaluation archives are parsed. labels
+    # and custom_labels used to be lists; callers that mutate them need
+    # list(...) first
     metric_name: str
     score: float
     passed: bool
     actual_value: str
-    labels: List[str]
+    labels: Tuple[str, ...]
     threshold_score: str
-    custom_labels: List[str]
+    custom_labels: Tuple[str, ...]
     status: str
     error_message: Optional[str] = None
 
@@ -34,12 +53,10 @@ class MetricResult:
                 score = 0.0
 
             try:
-                labels = evaluation_details.get("metric_labels", []) or []
-                if not isinstance(labels, list):
-                    labels = [str(labels)]
+                labels = _intern_labels(evaluation_details.get("metric_labels", []) or ())
             except Exception as e:
                 logging.warning(f"Error processing labels: {str(e)}")
-                labels = ["Unknown"]
+                labels = ("Unknown",)
 
             return cls(
                 metric_name=data.get("metric_name", "UNKNOWN"),
@@ -48,23 +65,28 @@ class MetricResult:
                 actual_value=str(evaluation_details.get("actual_value", "N/A")),
                 labels=labels,
                 threshold_score=str(evaluation_details.get("threshold_score", "N/A")),
-                custom_labels=metrics_config.get("custom_labels", []),
+                custom_labels=_intern_labels(metrics_config.get("custom_labels", []) or ()),
                 status=data.get("metric_evaluation_status", "UNKNOWN"),
                 error_message=data.get("error_message"),
             )
         except Exception as e:
             logging.error(f"Error parsing metric result: {str(e)}")
-            return cls(
-                metric_name="ERROR",
-                score=0.0,
-                passed=False,
-                actual_value="N/A",
-                labels=["Error"],
-                threshold_score="N/A",
-                custom_labels=[],
-                status="ERROR",
-                error_message=f"Parser Error: {str(e)}",
-            )
+            get_telemetry().count("metric_parse_errors_total")
+            return cls.error(f"Parser Error: {str(e)}")
+
+    @classmethod
+    def error(cls, message: str) -> "MetricResult":
+        return cls(
+            metric_name="ERROR",
+            score=0.0,
+            passed=False,
+            actual_value="N/A",
+            labels=("Error",),
+            threshold_score="N/A",
+            custom_labels=(),
+            status="ERROR",
+            error_message=message,
+        )
 
     def __str__(self) -> str:
         try:
@@ -90,6 +112,17 @@ class MetricResult:
 
 
 class EvaluationParser:
+    """
+    Parses an Inspeq evaluation response.
+
+    Metric results are decoded lazily: the raw result dicts are kept as they
+    came and a MetricResult is only built the first time it is needed.
+    has_failures() answers "did anything fail?" straight from the raw
+    "passed" flags, and get_failed_metrics() only decodes the failed ones.
+    """
+
+    __slots__ = ("status", "message", "remaining_credits", "_raw_results", "_parsed")
+
     def __init__(self, evaluation_data: Dict):
         try:
             self.status = evaluation_data.get("status", "UNKNOWN")
@@ -101,39 +134,70 @@ class EvaluationParser:
             if not isinstance(results, list):
                 logging.error("Results data is not a list")
                 results = []
-
-            self.results = []
-            for result in results:
-                try:
-                    self.results.append(MetricResult.from_dict(result))
-                except Exception as e:
-                    logging.error(f"Error processing individual result: {str(e)}")
-                    # Add an error result instead of failing
-                    self.results.append(
-                        MetricResult(
-                            metric_name="ERROR",
-                            score=0.0,
-                            passed=False,
-                            actual_value="N/A",
-                            labels=["Error"],
-                            threshold_score="N/A",
-                            custom_labels=[],
-                            status="ERROR",
-                            error_message=f"Failed to process result: {str(e)}",
-                        )
-                    )
+            self._raw_results = results
         except Exception as e:
             logging.error(f"Error initializing EvaluationParser: {str(e)}")
             self.status = "ERROR"
             self.message = f"Parser initialization failed: {str(e)}"
             self.remaining_credits = "N/A"
-            self.results = []
+            self._raw_results = []
+        self._parsed = [None] * len(self._raw_results)
+
+        telemetry = get_telemetry()
+        if telemetry.enabled:
+            telemetry.count("evaluations_parsed_total", status=str(self.status))
+            telemetry.gauge("inspeq_remaining_credits", self.remaining_credits)
+            failed = sum(map(self._raw_failed, self._raw_results))
+            telemetry.count("metric_results_total", len(self._raw_results) - failed, outcome="passed")
+            telemetry.count("metric_results_total", failed, outcome="failed")
+
+    def __len__(self) -> int:
+        return len(self._raw_results)
+
+    def result(self, index: int) -> MetricResult:
+        """Decode (once) and return a single metric result"""
+        parsed = self._parsed[index]
+        if parsed is None:
+            try:
+                parsed = MetricResult.from_dict(self._raw_results[index])
+            except Exception as e:
+                logging.error(f"Error processing individual result: {str(e)}")
+                get_telemetry().count("metric_parse_errors_total")
+                # Add an error result instead of failing
+                parsed = MetricResult.error(f"Failed to process result: {str(e)}")
+            self._parsed[index] = parsed
+        return parsed
+
+    @property
+    def results(self) -> List[MetricResult]:
+        parsed = self._parsed
+        if None in parsed:
+            for i, value in enumerate(parsed):
+                if value is None:
+                    self.result(i)
+        return list(parsed)
+
+    @staticmethod
+    def _raw_failed(raw) -> bool:
+        return not isinstance(raw, dict) or not raw.get("passed", False)
+
+    def has_failures(self) -> bool:
+        """Fast path: check the raw "passed" flags without decoding any result"""
+        return any(self._raw_failed(raw) for raw in self._raw_results)
 
     def get_passed_metrics(self) -> List[MetricResult]:
-        return [r for r in self.results if r.passed]
+        return [
+            self.result(i)
+            for i, raw in enumerate(self._raw_results)
+            if not self._raw_failed(raw)
+        ]
 
     def get_failed_metrics(self) -> List[MetricResult]:
-        return [r for r in self.results if not r.passed]
+        return [
+            self.result(i)
+            for i, raw in enumerate(self._raw_results)
+            if self._raw_failed(raw)
+        ]
 
     def __str__(self) -> str:
         try:
@@ -145,7 +209,7 @@ class EvaluationParser:
                 "\n📊 Results:",
             ]
 
-            if self.results:
+            if self._raw_results:
                 for metric in self.results:
                     result.append(str(metric))
             else:
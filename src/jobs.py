@@ -0,0 +1,195 @@
+import asyncio, hashlib, json, logging, time, uuid
+
+logger = logging.getLogger(__name__)
+
+
+def record_id(record) -> str:
+    """Use the record's own id, or a content hash so resumed runs match it again"""
+    for key in ("id", "request_id"):
+        if record.get(key) is not None:
+            return str(record[key])
+    material = json.dumps([record.get("prompt"), record.get("context")])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()[:16]
+
+
+class RequestCoalescer:
+    """
+    Runs each unique request once, however many callers ask for it at the same time.
+
+    The first caller for a key starts the work; everyone arriving while it
+    is in flight awaits the same task. The key is dropped once the task
+    finishes, so later requests run again.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def run(self, key, operation):
+        task = self._inflight.get(key)
+        if task is None:
+            self.started += 1
+            task = asyncio.ensure_future(operation())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # A cancelled caller must not cancel the work other callers wait on
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "started": self.started,
+            "coalesced": self.coalesced,
+        }
+
+
+class BatchJob:
+    """
+    One submitted batch: the unique requests, their results and who is waiting on them.
+
+    Attributes:
+        id (str): Job handle returned to the caller.
+        mode (str): How each request is run ("step_functions" or "evaluate").
+        keys (list): Request key for every submitted position, duplicates included.
+        requests (dict): Unique requests by key.
+        results (dict): Finished results by key.
+        events (list): Completion events in the order they happened, replayed to streams.
+    """
+
+    def __init__(self, mode, requests):
+        self.id = uuid.uuid4().hex
+        self.mode = mode
+        self.created = time.time()
+        self.finished = None
+        self.keys = []
+        self.requests = {}
+        for request in requests:
+            key = record_id(request)
+            self.keys.append(key)
+            self.requests.setdefault(key, request)
+        self.results = {}
+        self.events = []
+        self._changed = asyncio.Condition()
+        self.task = None
+
+    @property
+    def done(self) -> bool:
+        return len(self.results) == len(self.requests)
+
+    async def record(self, key, result) -> None:
+        self.results[key] = result
+        event = {
+            "type": "result",
+            "key": key,
+            "indexes": [i for i, k in enumerate(self.keys) if k == key],
+            "prompt": self.requests[key]["prompt"],
+            "result": result,
+        }
+        if self.done:
+            self.finished = time.time()
+        async with self._changed:
+            self.events.append(event)
+            self._changed.notify_all()
+
+    async def stream(self):
+        """Yield every completion event, past and future, then a final summary"""
+        position = 0
+        while True:
+            async with self._changed:
+                while position == len(self.events) and not self.done:
+                    await self._changed.wait()
+                pending = self.events[position:]
+            for event in pending:
+                yield event
+            position += len(pending)
+            if self.done and position == len(self.events):
+                yield {"type": "done", **self.summary()}
+                return
+
+    def summary(self) -> dict:
+        return {
+            "job_id": self.id,
+            "mode": self.mode,
+            "status": "done" if self.done else "running",
+            "total": len(self.keys),
+            "unique": len(self.requests),
+            "completed": len(self.results),
+            "created": self.created,
+            "finished": self.finished,
+        }
+
+    def snapshot(self) -> dict:
+        """Summary plus one entry per submitted position (None while pending)"""
+        return {
+            **self.summary(),
+            "results": [
+                {
+                    "index": i,
+                    "key": key,
+                    "status": "done" if key in self.results else "pending",
+                    "result": self.results.get(key),
+                }
+                for i, key in enumerate(self.keys)
+            ],
+        }
+
+
+class JobManager:
+    """
+    Fans batches out with bounded concurrency and keeps their results for polling.
+
+    Every unique request of a job goes through the shared RequestCoalescer,
+    so identical requests in flight for other jobs or callers run only once.
+    Finished jobs are forgotten after `ttl` seconds, checked on every submit and get.
+    """
+
+    def __init__(self, coalescer=None, ttl=3600):
+        self.coalescer = coalescer or RequestCoalescer()
+        self.ttl = ttl
+        self.jobs = {}
+
+    def submit(self, mode, requests, run, concurrency=16) -> BatchJob:
+        """Start a job; `run(mode, request)` is awaited once per unique request"""
+        self._expire()
+        job = BatchJob(mode, requests)
+        self.jobs[job.id] = job
+        job.task = asyncio.ensure_future(self._run(job, run, concurrency))
+        logger.info(
+            f"Job {job.id}: {len(job.keys)} requests, {len(job.requests)} unique, mode {mode}"
+        )
+        return job
+
+    def get(self, job_id):
+        """The job, or None when it is unknown or finished more than `ttl` seconds ago"""
+        # Expire on read too, so an idle API does not keep old results forever
+        self._expire()
+        return self.jobs.get(job_id)
+
+    async def _run(self, job, run, concurrency) -> None:
+        slots = asyncio.Semaphore(concurrency)
+
+        async def one(key, request):
+            async with slots:
+                try:
+                    result = await self.coalescer.run(
+                        (job.mode, key), lambda: run(job.mode, request)
+                    )
+                except Exception as e:
+                    logger.error(f"Job {job.id} request {key} failed: {str(e)}")
+                    result = {"error": str(e)}
+            await job.record(key, result)
+
+        await asyncio.gather(*(one(key, request) for key, request in job.requests.items()))
+        logger.info(f"Job {job.id} finished in {job.finished - job.created:.2f}s")
+
+    def _expire(self) -> None:
+        cutoff = time.time() - self.ttl
+        for job_id in [
+            job_id
+            for job_id, job in self.jobs.items()
+            if job.finished is not None and job.finished < cutoff
+        ]:
+            del self.jobs[job_id]
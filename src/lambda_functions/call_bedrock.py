@@ -1,6 +1,168 @@
-import boto3, json, os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+import json, os
 
-client = boto3.client("bedrock-runtime")
+try:
+    from claim_check import offload, resolve
+except ImportError:  # claim_check.py is not bundled with this function
+
+    def resolve(value):
+        if isinstance(value, str) and value.startswith("claim-check://"):
+            raise RuntimeError("Claim-check reference received without claim_check.py")
+        return value
+
+    def offload(value):
+        return value
+
+
+try:
+    from model_router import get_model_router
+except ImportError:  # model_router.py is not bundled with this function
+    get_model_router = None
+
+try:
+    from prompt_cache import get_prompt_cache
+except ImportError:  # prompt_cache.py is not bundled with this function
+    get_prompt_cache = None
+
+try:
+    from response_cache import default_response_cache
+except ImportError:  # response_cache.py is not bundled with this function
+    default_response_cache = None
+
+try:
+    from token_budget import get_token_budget, merge_parts
+except ImportError:  # token_budget.py is not bundled with this function
+    get_token_budget = None
+
+try:
+    from streaming import DEFAULT_CHECKS
+except ImportError:  # streaming.py is not bundled with this function
+    DEFAULT_CHECKS = None
+
+try:
+    from transport_config import botocore_config
+except ImportError:  # transport_config.py is not bundled with this function
+    botocore_config = None
+
+try:
+    from telemetry import instrument_handler
+except ImportError:  # telemetry.py is not bundled with this function
+    instrument_handler = None
+
+client = None
+response_cache = None
+
+
+def _get_client():
+    """Build the Bedrock client on the first invocation and keep it for warm ones"""
+    global client
+    if client is None:
+        import boto3
+
+        # Keep connections alive across warm invocations; generations can outlast
+        # botocore's default 60 second read timeout
+        if botocore_config is not None:
+            config = botocore_config()
+        else:
+            from botocore.config import Config
+
+            config = Config(
+                max_pool_connections=int(os.environ.get("MAX_POOL_CONNECTIONS", "10")),
+                connect_timeout=5,
+                read_timeout=int(os.environ.get("BEDROCK_READ_TIMEOUT", "120")),
+                tcp_keepalive=True,
+                # Client-side rate limiting that backs off when Bedrock throttles
+                retries={
+                    "mode": "adaptive",
+                    "max_attempts": int(os.environ.get("AWS_MAX_ATTEMPTS", "5")),
+                },
+            )
+        client = boto3.client("bedrock-runtime", config=config)
+    return client
+
+
+def _response_cache():
+    """Response cache of this container (RESPONSE_CACHE=true), kept across warm invocations"""
+    global response_cache
+    if response_cache is None and default_response_cache is not None:
+        response_cache = default_response_cache() or False
+    return response_cache or None
+
+
+# Model of every generation when model_router.py is not bundled
+MODEL_ID = "us.anthropic.claude-3-5-sonnet-20241022-v2:0"
+# max_tokens when the request does not ask for a length, or token_budget.py is not bundled
+DEFAULT_MAX_TOKENS = 4096
+
+
+def messages_request(prompt, user_context, model_id):
+    """
+    System and messages of the request. The context goes in its own system
+    block, marked for prompt caching when prompt_cache.py is bundled and
+    the model supports it, so invocations sharing it only pay for it once
+    per cache lifetime.
+    """
+    if get_prompt_cache is not None:
+        return get_prompt_cache().request(prompt, user_context, bedrock_model=model_id)
+    request = {"messages": [{"role": "user", "content": prompt}]}
+    if user_context:
+        request["system"] = f"Use the following context to help frame your response: {user_context}"
+    return request
+
+
+def check_chunk(chunk):
+    """Return (metric, reason) when a finished chunk fails one of streaming.py's checks"""
+    for check in DEFAULT_CHECKS:
+        failure = check(chunk)
+        if failure:
+            return failure
+    return None
+
+
+def stream_response(invoke_args):
+    """Yield text deltas from invoke_model_with_response_stream as they arrive"""
+    body = _get_client().invoke_model_with_response_stream(**invoke_args)["body"]
+    try:
+        for event in body:
+            chunk = event.get("chunk")
+            if not chunk:
+                continue
+            payload = json.loads(chunk["bytes"])
+            if payload.get("type") == "content_block_delta":
+                yield payload["delta"].get("text", "")
+    finally:
+        # Stopping early must not leave the event stream's connection open
+        body.close()
+
+
+def generate_streaming(invoke_args):
+    """Consume the stream, checking finished paragraphs and stopping early on failure"""
+    text = ""
+    buffer = ""
+    with closing(stream_response(invoke_args)) as deltas:
+        for delta in deltas:
+            text += delta
+            buffer += delta
+            while "\n\n" in buffer:
+                chunk, buffer = buffer.split("\n\n", 1)
+                failure = check_chunk(chunk)
+                if failure:
+                    return text, failure
+    return text, check_chunk(buffer) if buffer.strip() else None
+
+
+def generate(invoke_args):
+    """One invoke_model call; returns the text and its usage"""
+    response = _get_client().invoke_model(**invoke_args)
+    response_body = json.loads(response["body"].read())
+    usage = response_body.get("usage")
+    if usage and get_prompt_cache is not None:
+        # Cache reads and writes of the context block, next to input and output tokens
+        usage = get_prompt_cache().record(usage)
+    # Only the token counts are logged; the response itself stays out of CloudWatch
+    print(json.dumps({"usage": usage}))
+    return response_body["content"][0]["text"], usage
 
 
 def lambda_handler(event, context):
@@ -10,52 +172,123 @@ def lambda_handler(event, context):
 
     guardrail_identifier = event.get("guardrailIdentifier", "")
     guardrail_version = event.get("guardrailVersion", "")
-
-    formatted_prompt = f"""
-    System: Use the following context to help frame your response: {user_context}
-
-    Human: {prompt}
-
-    Assistant:
-    """
+    # Without streaming.py there is nothing to check the chunks with, so the
+    # generation is not streamed
+    stream = event.get("stream", False) and DEFAULT_CHECKS is not None
 
     try:
+        # Prompt and context may be claim-check references; the returned body
+        # keeps the references, only the model call needs the text
+        prompt_text, context_text = resolve(prompt), resolve(user_context)
+        max_tokens = DEFAULT_MAX_TOKENS
+        requests = [(prompt_text, context_text, max_tokens)]
+        if get_token_budget is not None:
+            # max_tokens from the requested length; a streamed generation is never split
+            plan = get_token_budget().plan(
+                prompt_text,
+                context_text,
+                default_max_tokens=DEFAULT_MAX_TOKENS,
+                split=not stream,
+            )
+            max_tokens = plan.max_tokens
+            requests = [
+                (part.prompt, part.context, part.max_tokens) for part in plan.parts or [plan]
+            ]
 
-        response = None
-        if guardrailIdentifier and guardrailVersion:
-            response = client.invoke_model(
-                modelId="us.anthropic.claude-3-5-sonnet-20241022-v2:0",
-                guardrailIdentifier=guardrail_identifier,
-                guardrailVersion=guardrail_version,
-                body=json.dumps(
-                    {
-                        "anthropic_version": "bedrock-2023-05-31",
-                        "max_tokens": 4096,
-                        "messages": [{"role": "user", "content": formatted_prompt}],
-                    }
-                ),
+        model_id = MODEL_ID
+        if get_model_router is not None:
+            # Short generations not evaluated on a standard_metrics metric go to
+            # the fast tier (MODEL_ROUTER_*); input tokens at four characters each
+            router = get_model_router()
+            route = router.route(
+                (len(prompt_text) + len(context_text)) // 4,
+                max_tokens,
+                event.get("response_metrics"),
+                default="bedrock",
             )
-        else:
-            response = client.invoke_model(
-                modelId="us.anthropic.claude-3-5-sonnet-20241022-v2:0",
-                body=json.dumps(
+            model_id = router.model("bedrock", route.tier)
+
+        all_invoke_args = []
+        for request_prompt, request_context, max_tokens in requests:
+            invoke_args = {
+                "modelId": model_id,
+                "body": json.dumps(
                     {
                         "anthropic_version": "bedrock-2023-05-31",
-                        "max_tokens": 4096,
-                        "messages": [{"role": "user", "content": formatted_prompt}],
+                        "max_tokens": max_tokens,
+                        **messages_request(request_prompt, request_context, model_id),
                     }
                 ),
+            }
+            if guardrail_identifier and guardrail_version:
+                invoke_args["guardrailIdentifier"] = guardrail_identifier
+                invoke_args["guardrailVersion"] = guardrail_version
+            all_invoke_args.append(invoke_args)
+        invoke_args = all_invoke_args[0]
+
+        cache = _response_cache()
+        hit = None
+        if cache is not None:
+            # Namespaced by model and guardrail so a cached text never skips a
+            # guardrail it was not generated under
+            namespace = "|".join(
+                [
+                    model_id,
+                    guardrail_identifier,
+                    guardrail_version,
+                    cache.namespace_for(context_text),
+                ]
             )
-        response_body = json.loads(response["body"].read())
-        print(response_body)
+            hit = cache.get(prompt_text, namespace=namespace)
+
+        usage = None
+        if hit is not None:
+            print(f"Response served from the {hit.tier} cache tier ({hit.similarity:.2f})")
+            llm_response = hit.response
+        elif stream:
+            llm_response, failure = generate_streaming(invoke_args)
+            if failure:
+                metric, reason = failure
+                print(f"Stream aborted by {metric}: {reason}")
+                return {
+                    "statusCode": 422,
+                    "body": {
+                        "error": f"Generation aborted: {reason}",
+                        "failed_metric": metric,
+                        "prompt": prompt,
+                        "context": user_context,
+                    },
+                }
+        elif len(all_invoke_args) > 1:
+            # One request per context section, in parallel, merged in order
+            with ThreadPoolExecutor(max_workers=len(all_invoke_args)) as pool:
+                generated = list(pool.map(generate, all_invoke_args))
+            llm_response = merge_parts(text for text, _ in generated)
+            usage = {}
+            for _, part_usage in generated:
+                for name, tokens in (part_usage or {}).items():
+                    usage[name] = usage.get(name, 0) + tokens
+        else:
+            llm_response, usage = generate(invoke_args)
+
+        if event.get("speculative", False):
+            # Started before the prompt gate passed; the state machine may
+            # discard it, so log the tokens it cost for the speculation metrics
+            print(json.dumps({"speculative_generation": True, "usage": usage}))
+
+        if cache is not None and hit is None:
+            cache.put(prompt_text, None, llm_response, namespace=namespace)
 
         return {
             "statusCode": 200,
             "body": {
                 "prompt": prompt,
                 "context": user_context,
-                "llm_response": response_body["content"][0]["text"],
+                "llm_response": offload(llm_response),
                 "results": results,
+                "response_metrics": event.get("response_metrics"),
+                "cache": hit.info() if hit is not None else None,
+                "usage": usage,
             },
         }
 
@@ -68,3 +301,8 @@ def lambda_handler(event, context):
                 "context": user_context,
             },
         }
+
+
+if instrument_handler is not None:
+    # Span, invocation count and (TELEMETRY_EMF=true) a CloudWatch metric record per call
+    lambda_handler = instrument_handler("call_bedrock", lambda_handler)
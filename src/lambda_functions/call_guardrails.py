@@ -1,37 +1,243 @@
-import boto3, json, os
+import hashlib, json, os
 
-client = boto3.client("bedrock")
+try:
+    from transport_config import botocore_config
+except ImportError:  # transport_config.py is not bundled with this function
+    botocore_config = None
 
+try:
+    from telemetry import instrument_handler
+except ImportError:  # telemetry.py is not bundled with this function
+    instrument_handler = None
 
-def lambda_handler(event, context):
-    try:
-        create_response = client.create_guardrail(
-            name="remove-pii-workflow",
-            description="Prevents the our model from output of any possible PII thats being passed.",
-            sensitiveInformationPolicyConfig={
-                "piiEntitiesConfig": [
-                    {"type": "EMAIL", "action": "ANONYMIZE"},
-                    {"type": "PHONE", "action": "ANONYMIZE"},
-                    {"type": "NAME", "action": "ANONYMIZE"},
-                ]
-            },
-            blockedInputMessaging="""I can provide general info about Acme Financial's products and services, but can't fully address your request here. For personalized help or detailed questions, please contact our customer service team directly. For security reasons, avoid sharing sensitive information through this channel. If you have a general product question, feel free to ask without including personal details. """,
-            blockedOutputsMessaging="""I can provide general info about Acme Financial's products and services, but can't fully address your request here. For personalized help or detailed questions, please contact our customer service team directly. For security reasons, avoid sharing sensitive information through this channel. If you have a general product question, feel free to ask without including personal details. """,
-            tags=[
-                {"key": "purpose", "value": "anonymize-pii"},
-            ],
+GUARDRAIL_NAME = "remove-pii-workflow"
+GUARDRAIL_MESSAGING = """I can provide general info about Acme Financial's products and services, but can't fully address your request here. For personalized help or detailed questions, please contact our customer service team directly. For security reasons, avoid sharing sensitive information through this channel. If you have a general product question, feel free to ask without including personal details. """
+GUARDRAIL_CONFIG = {
+    "description": "Prevents the our model from output of any possible PII thats being passed.",
+    "sensitiveInformationPolicyConfig": {
+        "piiEntitiesConfig": [
+            {"type": "EMAIL", "action": "ANONYMIZE"},
+            {"type": "PHONE", "action": "ANONYMIZE"},
+            {"type": "NAME", "action": "ANONYMIZE"},
+        ]
+    },
+    "blockedInputMessaging": GUARDRAIL_MESSAGING,
+    "blockedOutputsMessaging": GUARDRAIL_MESSAGING,
+}
+CONFIG_HASH_TAG = "config-hash"
+
+
+def config_hash(config):
+    """Stable hash of a guardrail policy, stored as a tag on the guardrail"""
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()[:32]
+
+
+class FileGuardrailStore:
+    """Persists guardrail identifiers in a JSON file (survives warm invocations)"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self, name):
+        try:
+            with open(self.path) as f:
+                return json.load(f).get(name)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, name, record):
+        try:
+            with open(self.path) as f:
+                records = json.load(f)
+        except (OSError, ValueError):
+            records = {}
+        records[name] = record
+        with open(self.path, "w") as f:
+            json.dump(records, f)
+
+
+class ParameterStoreGuardrailStore:
+    """Persists guardrail identifiers in SSM Parameter Store, shared by every container"""
+
+    def __init__(self, prefix, ssm_client=None):
+        self.prefix = prefix.rstrip("/")
+        if ssm_client is None:
+            import boto3
+
+            ssm_client = boto3.client("ssm")
+        self.ssm = ssm_client
+
+    def load(self, name):
+        try:
+            response = self.ssm.get_parameter(Name=f"{self.prefix}/{name}")
+            return json.loads(response["Parameter"]["Value"])
+        except Exception:
+            return None
+
+    def save(self, name, record):
+        self.ssm.put_parameter(
+            Name=f"{self.prefix}/{name}",
+            Value=json.dumps(record),
+            Type="String",
+            Overwrite=True,
         )
 
-        version_response = client.create_guardrail_version(
-            guardrailIdentifier=create_response["guardrailId"],
-            description="Version of Guardrail",
+
+class GuardrailRegistry:
+    """
+    Looks up the workflow guardrail instead of creating one per execution.
+
+    The guardrail is found by name and the config hash tagged on it; it is
+    only created when missing, and updated with a new version when the policy
+    in GUARDRAIL_CONFIG changed. Identifiers are cached for the lifetime of
+    the container and in the persisted store, so warm and cold starts alike
+    skip the control-plane calls once the guardrail exists.
+    """
+
+    def __init__(self, bedrock_client, store=None, name=GUARDRAIL_NAME, config=None):
+        self.client = bedrock_client
+        self.store = store
+        self.name = name
+        self.config = config or GUARDRAIL_CONFIG
+        self.config_hash = config_hash(self.config)
+        self._cached = None
+
+    def ensure(self):
+        """Return the guardrail identifier and version, creating or updating it only if needed"""
+        if self._cached is not None:
+            return self._cached
+
+        record = self.store.load(self.name) if self.store else None
+        if record and record.get("configHash") == self.config_hash:
+            self._cached = record
+            return record
+
+        existing = self._find_by_name()
+        if existing is None:
+            created = self.client.create_guardrail(
+                name=self.name,
+                tags=[
+                    {"key": "purpose", "value": "anonymize-pii"},
+                    {"key": CONFIG_HASH_TAG, "value": self.config_hash},
+                ],
+                **self.config,
+            )
+            guardrail_id = created["guardrailId"]
+            version = self._create_version(guardrail_id)
+        elif self._tagged_hash(existing["arn"]) != self.config_hash:
+            guardrail_id = existing["id"]
+            self.client.update_guardrail(
+                guardrailIdentifier=guardrail_id, name=self.name, **self.config
+            )
+            self.client.tag_resource(
+                resourceARN=existing["arn"],
+                tags=[{"key": CONFIG_HASH_TAG, "value": self.config_hash}],
+            )
+            version = self._create_version(guardrail_id)
+        else:
+            guardrail_id = existing["id"]
+            version = self._latest_version(guardrail_id) or self._create_version(
+                guardrail_id
+            )
+
+        record = {
+            "guardrailIdentifier": guardrail_id,
+            "guardrailVersion": version,
+            "configHash": self.config_hash,
+        }
+        if self.store:
+            self.store.save(self.name, record)
+        self._cached = record
+        return record
+
+    def _find_by_name(self):
+        kwargs = {}
+        while True:
+            response = self.client.list_guardrails(**kwargs)
+            for guardrail in response.get("guardrails", []):
+                if guardrail.get("name") == self.name:
+                    return guardrail
+            if not response.get("nextToken"):
+                return None
+            kwargs["nextToken"] = response["nextToken"]
+
+    def _tagged_hash(self, arn):
+        tags = self.client.list_tags_for_resource(resourceARN=arn).get("tags", [])
+        return next((t["value"] for t in tags if t["key"] == CONFIG_HASH_TAG), None)
+
+    def _latest_version(self, guardrail_id):
+        versions = []
+        kwargs = {"guardrailIdentifier": guardrail_id}
+        while True:
+            response = self.client.list_guardrails(**kwargs)
+            versions += [
+                int(g["version"])
+                for g in response.get("guardrails", [])
+                if str(g.get("version", "")).isdigit()
+            ]
+            if not response.get("nextToken"):
+                break
+            kwargs["nextToken"] = response["nextToken"]
+        return str(max(versions)) if versions else None
+
+    def _create_version(self, guardrail_id):
+        response = self.client.create_guardrail_version(
+            guardrailIdentifier=guardrail_id,
+            description=f"Version of Guardrail ({self.config_hash[:8]})",
         )
+        return response["version"]
+
+
+def default_store():
+    if os.environ.get("GUARDRAIL_PARAMETER_PREFIX"):
+        return ParameterStoreGuardrailStore(os.environ["GUARDRAIL_PARAMETER_PREFIX"])
+    return FileGuardrailStore(
+        os.environ.get("GUARDRAIL_STATE_PATH", "/tmp/guardrail_registry.json")
+    )
+
+
+registry = None
 
+
+def _get_registry():
+    """Build the Bedrock client and registry on the first invocation and keep them for warm ones"""
+    global registry
+    if registry is None:
+        import boto3
+
+        # Control-plane calls are short, so a shorter read timeout than generations
+        if botocore_config is not None:
+            config = botocore_config(read_timeout=30)
+        else:
+            from botocore.config import Config
+
+            config = Config(
+                max_pool_connections=int(os.environ.get("MAX_POOL_CONNECTIONS", "10")),
+                connect_timeout=5,
+                read_timeout=30,
+                tcp_keepalive=True,
+                # Client-side rate limiting that backs off when Bedrock throttles
+                retries={
+                    "mode": "adaptive",
+                    "max_attempts": int(os.environ.get("AWS_MAX_ATTEMPTS", "5")),
+                },
+            )
+        client = boto3.client("bedrock", config=config)
+        registry = GuardrailRegistry(client, store=default_store())
+    return registry
+
+
+def lambda_handler(event, context):
+    try:
+        guardrail = _get_registry().ensure()
+
+        # The rest of the event (prompt, context, ...) continues to call_bedrock
         return {
             "statusCode": 200,
             "body": {
-                "guardrailIdentifier": create_response["guardrailId"],
-                "guardrailVersion": version_response["version"],
+                **event,
+                "guardrailIdentifier": guardrail["guardrailIdentifier"],
+                "guardrailVersion": guardrail["guardrailVersion"],
             },
         }
 
@@ -42,3 +248,8 @@ def lambda_handler(event, context):
                 "error": f"Error calling Bedrock: {str(e)}",
             },
         }
+
+
+if instrument_handler is not None:
+    # Span, invocation count and (TELEMETRY_EMF=true) a CloudWatch metric record per call
+    lambda_handler = instrument_handler("call_guardrails", lambda_handler)
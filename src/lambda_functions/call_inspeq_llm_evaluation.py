@@ -1,35 +1,75 @@
-import json, os
-from inspeq.client import InspeqEval
+import os
+
+from inspeq_groups import evaluate_groups, metric_groups, verdict
+
+try:
+    from claim_check import resolve
+except ImportError:  # claim_check.py is not bundled with this function
+
+    def resolve(value):
+        if isinstance(value, str) and value.startswith("claim-check://"):
+            raise RuntimeError("Claim-check reference received without claim_check.py")
+        return value
+
+
+try:
+    from telemetry import instrument_handler
+except ImportError:  # telemetry.py is not bundled with this function
+    instrument_handler = None
 
-# Initialize the client
 INSPEQ_API_KEY = os.environ.get("INSPEQAPI")
 INSPEQ_PROJECT_ID = os.environ.get("INSPEQPROJECT")
 
-inspeq_eval = InspeqEval(
-    inspeq_api_key=INSPEQ_API_KEY, inspeq_project_id=INSPEQ_PROJECT_ID
-)
+DEFAULT_METRICS = ["RESPONSE_TONE"]
 
+inspeq_eval = None
 
-def lambda_handler(event, context):
-    input_data = [
-        {
-            "prompt": event.get("prompt"),
-            "context": event.get("context"),
-            "response": event.get("llm_response"),
-        }
-    ]
 
-    metrics_list = ["RESPONSE_TONE"]
+def _get_client():
+    """Import the SDK and build the client on the first invocation, then reuse it"""
+    global inspeq_eval
+    if inspeq_eval is None:
+        from inspeq.client import InspeqEval
 
+        inspeq_eval = InspeqEval(
+            inspeq_api_key=INSPEQ_API_KEY, inspeq_project_id=INSPEQ_PROJECT_ID
+        )
+    return inspeq_eval
+
+
+def lambda_handler(event, context):
     results = None
     try:
-        results = inspeq_eval.evaluate_llm_task(
-            metrics_list=metrics_list,
-            input_data=input_data,
-            task_name="eval_question_from_lambda_v2",
+        # Fields may be claim-check references; only the text goes to Inspeq
+        input_data = [
+            {
+                "prompt": resolve(event.get("prompt")),
+                "context": resolve(event.get("context")),
+                "response": resolve(event.get("llm_response")),
+            }
+        ]
+        results = evaluate_groups(
+            _get_client(),
+            metric_groups(event, DEFAULT_METRICS),
+            input_data,
+            "eval_question_from_lambda_v2",
         )
         print(results)
     except Exception as e:
         print(f"An error occurred: {str(e)}")
+        return {"statusCode": 500, "body": {"error": f"Error calling Inspeq: {str(e)}"}}
+
+    return {
+        "statusCode": results.get("status"),
+        "body": {
+            "prompt": event.get("prompt"),
+            "context": event.get("context"),
+            "llm_response": event.get("llm_response"),
+            **verdict(results),
+        },
+    }
+
 
-    return {"statusCode": 200, "body": json.dumps("Hello from Lambda!")}
+if instrument_handler is not None:
+    # Span, invocation count and (TELEMETRY_EMF=true) a CloudWatch metric record per call
+    lambda_handler = instrument_handler("call_inspeq_llm_evaluation", lambda_handler)
@@ -1,37 +1,64 @@
 import os
-from inspeq.client import InspeqEval
 
-# Initialize the client
+from inspeq_groups import evaluate_groups, metric_groups, verdict
+
+try:
+    from claim_check import resolve
+except ImportError:  # claim_check.py is not bundled with this function
+
+    def resolve(value):
+        if isinstance(value, str) and value.startswith("claim-check://"):
+            raise RuntimeError("Claim-check reference received without claim_check.py")
+        return value
+
+
+try:
+    from telemetry import instrument_handler
+except ImportError:  # telemetry.py is not bundled with this function
+    instrument_handler = None
+
 INSPEQ_API_KEY = os.environ.get("INSPEQAPI")
 INSPEQ_PROJECT_ID = os.environ.get("INSPEQPROJECT")
 
-inspeq_eval = InspeqEval(
-    inspeq_api_key=INSPEQ_API_KEY, inspeq_project_id=INSPEQ_PROJECT_ID
-)
+DEFAULT_METRICS = ["DATA_LEAKAGE"]
 
+inspeq_eval = None
 
-def lambda_handler(event, context):
-    input_data = [{"prompt": event.get("prompt"), "context": event.get("context")}]
 
-    metrics_list = ["DATA_LEAKAGE"]
+def _get_client():
+    """Import the SDK and build the client on the first invocation, then reuse it"""
+    global inspeq_eval
+    if inspeq_eval is None:
+        from inspeq.client import InspeqEval
 
+        inspeq_eval = InspeqEval(
+            inspeq_api_key=INSPEQ_API_KEY, inspeq_project_id=INSPEQ_PROJECT_ID
+        )
+    return inspeq_eval
+
+
+def lambda_handler(event, context):
     results = None
     try:
-        results = inspeq_eval.evaluate_llm_task(
-            metrics_list=metrics_list,
-            input_data=input_data,
-            task_name="question_from_lambda_v2",
+        # Prompt and context may be claim-check references; only the text goes to Inspeq
+        input_data = [
+            {"prompt": resolve(event.get("prompt")), "context": resolve(event.get("context"))}
+        ]
+        results = evaluate_groups(
+            _get_client(),
+            metric_groups(event, DEFAULT_METRICS),
+            input_data,
+            "question_from_lambda_v2",
         )
         print(results)
 
-        if results is not None:
+        if results.get("results"):
             return {
                 "statusCode": results.get("status"),
                 "body": {
                     "prompt": event.get("prompt"),
                     "context": event.get("context"),
-                    "passed": results.get("results")[0].get("passed"),
-                    "results": results.get("results")[0].get("evaluation_details"),
+                    **verdict(results),
                 },
             }
         else:
@@ -41,3 +68,16 @@ def lambda_handler(event, context):
             }
     except Exception as e:
         print(f"An error occurred: {str(e)}")
+        return {
+            "statusCode": 500,
+            "body": {
+                "error": f"Error calling Inspeq: {str(e)}",
+                "prompt": event.get("prompt"),
+                "context": event.get("context"),
+            },
+        }
+
+
+if instrument_handler is not None:
+    # Span, invocation count and (TELEMETRY_EMF=true) a CloudWatch metric record per call
+    lambda_handler = instrument_handler("call_inspeq_preeval", lambda_handler)
@@ -0,0 +1,77 @@
+"""
+Metric grouping and concurrent evaluation shared by the Inspeq Lambdas.
+Deploy this file with call_inspeq_preeval and call_inspeq_llm_evaluation.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import os
+
+try:
+    from resilience import get_resilience
+except ImportError:  # resilience.py is not bundled with this function
+    get_resilience = None
+
+try:
+    from telemetry import get_telemetry
+except ImportError:  # telemetry.py is not bundled with this function
+    get_telemetry = None
+
+# Metrics sent per Inspeq call; groups are evaluated concurrently
+METRIC_GROUP_SIZE = int(os.environ.get("METRIC_GROUP_SIZE", "1"))
+
+
+def metric_groups(event, default_metrics):
+    """Metrics from the event ("metrics", a name or a list) in groups of METRIC_GROUP_SIZE"""
+    metrics = event.get("metrics") or default_metrics
+    if isinstance(metrics, str):
+        metrics = [metrics]
+    size = max(1, int(event.get("group_size") or METRIC_GROUP_SIZE))
+    return [metrics[i : i + size] for i in range(0, len(metrics), size)]
+
+
+def evaluate_groups(client, groups, input_data, task_name):
+    """One Inspeq call per group, all in flight at once, merged into a single response"""
+
+    def evaluate(metrics_list):
+        call = client.evaluate_llm_task
+        if get_resilience is not None:
+            # Groups share the container's rate limiter, circuit breaker and retry budget
+            call = partial(get_resilience().upstream("inspeq").call, call)
+        response = call(metrics_list=metrics_list, input_data=input_data, task_name=task_name)
+        if get_telemetry is not None:
+            get_telemetry().gauge(
+                "inspeq_remaining_credits", (response or {}).get("remaining_credits")
+            )
+        return response
+
+    if len(groups) == 1:
+        responses = [evaluate(groups[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=len(groups)) as pool:
+            responses = list(pool.map(evaluate, groups))
+
+    statuses = [(r or {}).get("status", 500) for r in responses]
+    return {
+        "status": next((status for status in statuses if status != 200), 200),
+        "results": [result for r in responses if r for result in r.get("results") or []],
+    }
+
+
+def verdict(results) -> dict:
+    """passed, failed_metrics and the per-metric results of a merged response"""
+    return {
+        "passed": all(r.get("passed") for r in results["results"]),
+        "failed_metrics": [
+            r.get("metric_name") for r in results["results"] if not r.get("passed")
+        ],
+        "results": [
+            {
+                "metric_name": r.get("metric_name"),
+                "passed": r.get("passed"),
+                "score": r.get("score"),
+                "evaluation_details": r.get("evaluation_details"),
+            }
+            for r in results["results"]
+        ],
+    }
@@ -0,0 +1,50 @@
+try:
+    from telemetry import instrument_handler
+except ImportError:  # telemetry.py is not bundled with this function
+    instrument_handler = None
+
+
+def lambda_handler(event, context):
+    """
+    Merge the per-metric-group evaluations of a Map state into one verdict.
+
+    `evaluations` holds one {"statusCode", "body"} per group; every other
+    key of the event (prompt, context, metrics still to run, ...) is passed
+    through in the body. The merged statusCode is 200 only if every group
+    succeeded, and `passed` is true only if every metric passed.
+    """
+    evaluations = event.get("evaluations") or []
+    body = {key: value for key, value in event.items() if key != "evaluations"}
+
+    status_code = 200
+    results, errors = [], []
+    for evaluation in evaluations:
+        evaluation = evaluation or {}
+        group_body = evaluation.get("body")
+        if evaluation.get("statusCode") != 200 and status_code == 200:
+            status_code = evaluation.get("statusCode") or 500
+        if isinstance(group_body, dict):
+            results += group_body.get("results") or []
+            if "error" in group_body:
+                errors.append(group_body["error"])
+        elif group_body:
+            errors.append(group_body)
+
+    if not results and status_code == 200:
+        status_code = 400
+
+    body.update(
+        {
+            "passed": status_code == 200 and all(r.get("passed") for r in results),
+            "failed_metrics": [r.get("metric_name") for r in results if not r.get("passed")],
+            "results": results,
+        }
+    )
+    if errors:
+        body["errors"] = errors
+    return {"statusCode": status_code, "body": body}
+
+
+if instrument_handler is not None:
+    # Span, invocation count and (TELEMETRY_EMF=true) a CloudWatch metric record per call
+    lambda_handler = instrument_handler("merge_evaluations", lambda_handler)
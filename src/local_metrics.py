@@ -0,0 +1,410 @@
+from concurrent.futures import ProcessPoolExecutor
+import logging, os, re, threading, uuid
+
+import numpy as np
+
+from env_policy import env_flag
+from streaming import invisible_text_check
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+")
+# Whitespace the invisible text check allows, mapped to a plain space
+_LAYOUT = str.maketrans("\n\r\t", "   ")
+
+# Lexical Inspeq metrics computed in-process. Threshold and labels follow the
+# SDK's default metrics_config; "higher" says which side of the threshold passes.
+LOCAL_METRICS = {
+    "BLEU_SCORE": (0.8, ("Highly Conforming", "Poorly Conforming"), "higher"),
+    "ROUGE_SCORE": (0.8, ("High Overlap", "Low Overlap"), "higher"),
+    "METEOR_SCORE": (0.8, ("Semantically Accurate", "Semantically Drifting"), "higher"),
+    "FUZZY_SCORE": (0.8, ("Well Aligned Summarization", "Misaligned Summarization"), "higher"),
+    "COMPRESSION_SCORE": (0.8, ("Compact Summary", "Loose Summary"), "lower"),
+    "COSINE_SIMILARITY_SCORE": (0.2, ("Contextual Synchrony", "Contextual Divergence"), "higher"),
+    "INVISIBLE_TEXT": (0.5, ("Not Detected", "Detected"), "lower"),
+}
+
+
+def _encode(sequences):
+    """Concatenated integer ids of every sequence and the item index of each id"""
+    lengths = np.fromiter((len(s) for s in sequences), dtype=np.int64, count=len(sequences))
+    items = np.repeat(np.arange(len(sequences)), lengths)
+    if all(isinstance(s, str) for s in sequences):
+        # Characters: their code points are already ids
+        ids = np.frombuffer("".join(sequences).encode("utf-32-le"), dtype=np.uint32)
+        return ids.astype(np.int64), items
+    vocabulary = {}
+    ids = np.fromiter(
+        (vocabulary.setdefault(token, len(vocabulary)) for s in sequences for token in s),
+        dtype=np.int64,
+        count=int(lengths.sum()),
+    )
+    return ids, items
+
+
+class NgramOverlap:
+    """
+    Per-item n-gram statistics between candidate and reference sequences.
+
+    Sequences are token lists or strings (character n-grams). Both sides are
+    encoded once, and the n-grams of every order are counted for the whole
+    batch with 1-D np.unique calls: the ids of order n are built from the
+    dense ids of order n - 1 and the next token, so they always fit in int64.
+
+    Calling the instance with n returns (clipped matches, candidate n-grams,
+    reference n-grams, dot product of the count vectors, squared norms of the
+    candidate and reference count vectors), each an array with one value per
+    item.
+
+    Attributes:
+        candidate_length (np.ndarray): Tokens (or characters) per candidate.
+        reference_length (np.ndarray): Tokens (or characters) per reference.
+    """
+
+    def __init__(self, candidates, references):
+        self.size = len(candidates)
+        # References are numbered after the candidates, so no n-gram spans the two
+        self._ids, self._items = _encode(list(candidates) + list(references))
+        lengths = np.bincount(self._items, minlength=2 * self.size).astype(float)
+        self.candidate_length = lengths[: self.size]
+        self.reference_length = lengths[self.size :]
+        self._grams = self._ids
+        self._order = 1
+        self._stats = {}
+
+    def _extend(self) -> None:
+        """Dense ids of the n-grams one order up, starting at every position"""
+        base = int(self._ids.max()) + 1
+        keys = self._grams[:-1] * base + self._ids[self._order :]
+        _, self._grams = np.unique(keys, return_inverse=True)
+        self._order += 1
+
+    def __call__(self, n):
+        if n not in self._stats:
+            self._stats[n] = self._count(n)
+        return self._stats[n]
+
+    def _count(self, n):
+        size = self.size
+        if len(self._ids) < n:
+            zeros = np.zeros(size)
+            return zeros, zeros, zeros, zeros, zeros, zeros
+        while self._order < n:
+            self._extend()
+        owners = self._items[: len(self._grams)]
+        valid = owners == self._items[n - 1 :]
+        grams, owners = self._grams[valid], owners[valid]
+        is_reference = owners >= size
+        owners = np.where(is_reference, owners - size, owners)
+        base = int(grams.max()) + 1
+        keys, inverse = np.unique(owners * base + grams, return_inverse=True)
+        owner = keys // base
+        candidate_counts = np.bincount(inverse[~is_reference], minlength=len(keys))
+        reference_counts = np.bincount(inverse[is_reference], minlength=len(keys))
+
+        def per_item(weights):
+            return np.bincount(owner, weights=weights, minlength=size)[:size]
+
+        return (
+            per_item(np.minimum(candidate_counts, reference_counts)),
+            per_item(candidate_counts),
+            per_item(reference_counts),
+            per_item(candidate_counts * reference_counts),
+            per_item(candidate_counts**2),
+            per_item(reference_counts**2),
+        )
+
+
+def _ratio(numerator, denominator):
+    return np.divide(
+        numerator, denominator, out=np.zeros(len(numerator)), where=denominator > 0
+    )
+
+
+def bleu(overlap, max_n=4):
+    """Sentence BLEU with add-one smoothing for n > 1 and the brevity penalty"""
+    log_precision = np.zeros(overlap.size)
+    for n in range(1, max_n + 1):
+        matches, total = overlap(n)[:2]
+        if n > 1:
+            matches, total = matches + 1, total + 1
+        log_precision += np.log(np.maximum(_ratio(matches, total), 1e-9)) / max_n
+    penalty = np.exp(
+        np.minimum(0.0, 1 - _ratio(overlap.reference_length, overlap.candidate_length))
+    )
+    return np.where(overlap.candidate_length > 0, penalty * np.exp(log_precision), 0.0)
+
+
+def rouge(overlap, n=1):
+    """ROUGE-N F1"""
+    matches, candidate_total, reference_total = overlap(n)[:3]
+    precision = _ratio(matches, candidate_total)
+    recall = _ratio(matches, reference_total)
+    return _ratio(2 * precision * recall, precision + recall)
+
+
+def meteor(overlap, alpha=0.9, beta=3.0, gamma=0.5):
+    """
+    METEOR on exact unigram matches (no stemming or synonyms). Chunks are
+    approximated as matched unigrams minus matched bigrams.
+    """
+    matches, candidate_total, reference_total = overlap(1)[:3]
+    bigram_matches = overlap(2)[0]
+    precision = _ratio(matches, candidate_total)
+    recall = _ratio(matches, reference_total)
+    fmean = _ratio(precision * recall, alpha * precision + (1 - alpha) * recall)
+    chunks = np.maximum(matches - bigram_matches, np.minimum(matches, 1))
+    penalty = gamma * _ratio(chunks, matches) ** beta
+    return fmean * (1 - penalty)
+
+
+def fuzzy(candidates, references, n=3):
+    """Dice coefficient over character n-grams of the case-folded texts"""
+    candidates = [text.casefold() for text in candidates]
+    references = [text.casefold() for text in references]
+    matches, candidate_total, reference_total = NgramOverlap(candidates, references)(n)[:3]
+    scores = _ratio(2 * matches, candidate_total + reference_total)
+    # Texts shorter than n have no n-grams to compare
+    equal = np.array([c == r for c, r in zip(candidates, references)], dtype=bool)
+    return np.where(equal, 1.0, scores)
+
+
+def cosine_similarity(overlap):
+    """Cosine of the term-frequency vectors"""
+    _, _, _, dot, candidate_norm, reference_norm = overlap(1)
+    return _ratio(dot, np.sqrt(candidate_norm * reference_norm))
+
+
+def compression(overlap):
+    """Candidate length over reference length, in tokens"""
+    return _ratio(overlap.candidate_length, overlap.reference_length)
+
+
+def invisible_text(texts):
+    """1.0 for texts holding an invisible (format, control, private use) character"""
+    # str.isprintable() is False for every invisible character, so the
+    # per-character check only runs on the few texts it flags
+    return np.array(
+        [
+            float(
+                not text.translate(_LAYOUT).isprintable()
+                and invisible_text_check(text) is not None
+            )
+            for text in texts
+        ]
+    )
+
+
+def score_batch(metrics_list, input_data):
+    """Scores of every local metric for every item, as {metric: array}"""
+    responses = [str(item.get("response") or "") for item in input_data]
+    # Response evaluations compare the response to the context (the source
+    # text); a prompt evaluation has no response and is scored on the prompt
+    references = [
+        str(item.get("context") or item.get("prompt") or "") for item in input_data
+    ]
+    candidates = [
+        response or str(item.get("prompt") or "")
+        for response, item in zip(responses, input_data)
+    ]
+    words = NgramOverlap(
+        [_WORD.findall(text.casefold()) for text in candidates],
+        [_WORD.findall(text.casefold()) for text in references],
+    )
+
+    scorers = {
+        "BLEU_SCORE": lambda: bleu(words),
+        "ROUGE_SCORE": lambda: rouge(words),
+        "METEOR_SCORE": lambda: meteor(words),
+        "FUZZY_SCORE": lambda: fuzzy(candidates, references),
+        "COMPRESSION_SCORE": lambda: compression(words),
+        "COSINE_SIMILARITY_SCORE": lambda: cosine_similarity(words),
+        "INVISIBLE_TEXT": lambda: invisible_text(
+            [str(item.get("prompt") or "") + r for item, r in zip(input_data, responses)]
+        ),
+    }
+    return {metric: scorers[metric]() for metric in metrics_list}
+
+
+def evaluate_batch(metrics_list, input_data, task_name=None, metrics_config=None):
+    """
+    Result dicts shaped like the Inspeq SDK's (one per item and metric, in
+    that order) for local metrics. Module-level so process pool workers can
+    run it.
+    """
+    scores = score_batch(metrics_list, input_data)
+    results = []
+    for index, item in enumerate(input_data):
+        data_input_id = str(uuid.uuid4())
+        for metric in metrics_list:
+            threshold, labels, direction = LOCAL_METRICS[metric]
+            config = (metrics_config or {}).get(f"{metric.lower()}_config", {})
+            threshold = float(config.get("threshold", threshold))
+            labels = tuple(config.get("custom_labels") or labels)
+            score = round(float(scores[metric][index]), 4)
+            passed = score >= threshold if direction == "higher" else score <= threshold
+            label = labels[0] if passed else labels[-1]
+            results.append(
+                {
+                    "id": str(uuid.uuid4()),
+                    "data_input_id": data_input_id,
+                    "task_name": task_name,
+                    "metric_name": f"{metric}_EVALUATION",
+                    "score": score,
+                    "passed": passed,
+                    "evaluation_details": {
+                        "actual_value": score,
+                        "actual_value_type": "FLOAT",
+                        "metric_labels": [label],
+                        "threshold": [label],
+                        "threshold_score": threshold,
+                    },
+                    "metrics_config": dict(config, custom_labels=list(labels)),
+                    "metric_evaluation_status": "EVAL_COMPLETE",
+                    "data_input": item,
+                }
+            )
+    return results
+
+
+class LocalMetrics:
+    """
+    Computes the lexical Inspeq metrics in-process and sends the rest to Inspeq.
+
+    BLEU, ROUGE, METEOR, fuzzy, compression and cosine similarity scores
+    compare the response with the context, and INVISIBLE_TEXT looks at the
+    prompt and response; none of them needs a model, so they cost neither a
+    round trip nor credits. Model-based metrics in the same call go to the
+    wrapped evaluator, and the two sets of results are merged in the
+    requested metric order. Batches of at least process_threshold items are
+    split into chunks and scored across a process pool.
+
+    LocalMetrics exposes the same evaluate_llm_task signature as InspeqEval,
+    so it can wrap the client's evaluator (or a BatchEvaluator) in place:
+
+        client.inspeq_eval = LocalMetrics(client.inspeq_eval)
+
+    Attributes:
+        inspeq_eval (InspeqEval): The wrapped evaluator for model-based metrics (may be None).
+        process_threshold (int): Items from which a batch is spread over the process pool.
+        chunk_size (int): Items per process pool task.
+    """
+
+    def __init__(self, inspeq_eval=None, max_workers=None, process_threshold=256, chunk_size=128):
+        self.inspeq_eval = inspeq_eval
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.process_threshold = process_threshold
+        self.chunk_size = chunk_size
+        self.local_results = 0
+        self.remote_calls = 0
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def evaluate_llm_task(
+        self, metrics_list, input_data, task_name=None, metrics_config=None
+    ):
+        """Drop-in replacement for InspeqEval.evaluate_llm_task"""
+        input_data = list(input_data)
+        local = [metric for metric in metrics_list or [] if metric in LOCAL_METRICS]
+        remote = [metric for metric in metrics_list or [] if metric not in LOCAL_METRICS]
+        if not local:
+            return self._remote(metrics_list, input_data, task_name, metrics_config)
+
+        response = None
+        if remote:
+            response = self._remote(remote, input_data, task_name, metrics_config)
+
+        computed = self.evaluate(local, input_data, task_name, metrics_config)
+        with self._lock:
+            self.local_results += len(computed)
+        merged = dict(response) if response is not None else {
+            "status": 200,
+            "message": "All LLM evaluations successful",
+            "remaining_credits": "N/A",
+        }
+        merged["results"] = self._merge(
+            metrics_list, local, computed, (response or {}).get("results", []), len(input_data)
+        )
+        return merged
+
+    def _remote(self, metrics_list, input_data, task_name, metrics_config):
+        if self.inspeq_eval is None:
+            raise ValueError(f"No Inspeq evaluator for model-based metrics: {metrics_list}")
+        with self._lock:
+            self.remote_calls += 1
+        return self.inspeq_eval.evaluate_llm_task(
+            metrics_list=metrics_list,
+            input_data=input_data,
+            task_name=task_name,
+            metrics_config=metrics_config,
+        )
+
+    def evaluate(self, metrics_list, input_data, task_name=None, metrics_config=None):
+        """Local metric results for input_data, across the process pool for large batches"""
+        if len(input_data) < self.process_threshold or self.max_workers < 2:
+            return evaluate_batch(metrics_list, input_data, task_name, metrics_config)
+        chunks = [
+            input_data[i : i + self.chunk_size]
+            for i in range(0, len(input_data), self.chunk_size)
+        ]
+        logger.info(f"Scoring {len(input_data)} items in {len(chunks)} chunks across processes")
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        size = len(chunks)
+        results = self._pool.map(
+            evaluate_batch,
+            [metrics_list] * size,
+            chunks,
+            [task_name] * size,
+            [metrics_config] * size,
+        )
+        return [result for chunk in results for result in chunk]
+
+    @staticmethod
+    def _merge(metrics_list, local, computed, fetched, items):
+        """Interleave local and remote results per item, in the requested metric order"""
+        per_item = len(fetched) // items if items and len(fetched) % items == 0 else None
+        if per_item is None:
+            # Unexpected remote shape: keep it as it came, local results after
+            return fetched + computed
+        merged = []
+        for index in range(items):
+            own = {
+                result["metric_name"].removesuffix("_EVALUATION"): result
+                for result in computed[index * len(local) : (index + 1) * len(local)]
+            }
+            remote = fetched[index * per_item : (index + 1) * per_item]
+            for metric in metrics_list:
+                if metric in own:
+                    merged.append(own[metric])
+                elif remote:
+                    merged.append(remote.pop(0))
+            merged.extend(remote)
+        return merged
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"local_results": self.local_results, "remote_calls": self.remote_calls}
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+def default_local_metrics(inspeq_eval):
+    """
+    inspeq_eval wrapped in LocalMetrics when LOCAL_METRICS=true, otherwise
+    unchanged. LOCAL_METRICS_WORKERS sets the process pool size (default:
+    CPU count) and LOCAL_METRICS_PROCESS_THRESHOLD the batch size from which
+    it is used (default 256).
+    """
+    if not env_flag("LOCAL_METRICS"):
+        return inspeq_eval
+    workers = os.getenv("LOCAL_METRICS_WORKERS")
+    return LocalMetrics(
+        inspeq_eval,
+        max_workers=int(workers) if workers else None,
+        process_threshold=int(os.getenv("LOCAL_METRICS_PROCESS_THRESHOLD", "256")),
+    )
@@ -0,0 +1,575 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+import argparse, contextlib, importlib.util, io, json, logging, os, re, statistics, sys, time, uuid
+
+logger = logging.getLogger(__name__)
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lambda_functions")
+MAX_TRANSITIONS = 1000
+
+_PATH_TOKEN = re.compile(r"\.([^.\[\]]+)|\[(\d+)\]|\['([^']*)'\]")
+
+
+class StatesError(Exception):
+    """A failed execution, carrying the Amazon States Language error name and cause"""
+
+    def __init__(self, error, cause=""):
+        super().__init__(f"{error}: {cause}")
+        self.error = error
+        self.cause = cause
+
+
+def read_path(path, data, context=None):
+    """Resolve a reference path such as `$.Payload.body.results[0]` (or `$$.` for the context object)"""
+    if path.startswith("$$"):
+        if context is None:
+            raise StatesError("States.Runtime", f"No context object for path {path}")
+        data, path = context, path[1:]
+    if not path.startswith("$"):
+        raise StatesError("States.Runtime", f"Invalid path {path}")
+
+    value, position = data, 1
+    while position < len(path):
+        match = _PATH_TOKEN.match(path, position)
+        if match is None:
+            raise StatesError("States.Runtime", f"Unsupported path syntax {path}")
+        key, index, quoted = match.groups()
+        try:
+            value = value[int(index)] if index is not None else value[key or quoted]
+        except (KeyError, IndexError, TypeError):
+            raise StatesError(
+                "States.Runtime", f"The JSONPath {path} could not be found in the input"
+            )
+        position = match.end()
+    return value
+
+
+def path_exists(path, data, context=None) -> bool:
+    try:
+        read_path(path, data, context)
+        return True
+    except StatesError:
+        return False
+
+
+def resolve_parameters(template, data, context=None):
+    """Build a Parameters/ResultSelector payload, resolving every `key.$` path"""
+    if isinstance(template, dict):
+        resolved = {}
+        for key, value in template.items():
+            if key.endswith(".$"):
+                if not isinstance(value, str) or value.startswith("States."):
+                    raise StatesError("States.Runtime", f"Unsupported value for {key}: {value}")
+                resolved[key[:-2]] = read_path(value, data, context)
+            else:
+                resolved[key] = resolve_parameters(value, data, context)
+        return resolved
+    if isinstance(template, list):
+        return [resolve_parameters(item, data, context) for item in template]
+    return template
+
+
+def write_path(path, data, value):
+    """Apply a ResultPath: `$` replaces the input, `$.a.b` sets a field on a copy of it"""
+    if path is None:
+        return data
+    if path == "$":
+        return value
+    keys = [match.group(1) or match.group(3) for match in _PATH_TOKEN.finditer(path)]
+    result = dict(data) if isinstance(data, dict) else {}
+    target = result
+    for key in keys[:-1]:
+        child = target.get(key)
+        target[key] = dict(child) if isinstance(child, dict) else {}
+        target = target[key]
+    target[keys[-1]] = value
+    return result
+
+
+_COMPARISONS = {
+    "StringEquals": lambda a, b: isinstance(a, str) and a == b,
+    "StringLessThan": lambda a, b: isinstance(a, str) and a < b,
+    "StringGreaterThan": lambda a, b: isinstance(a, str) and a > b,
+    "StringLessThanEquals": lambda a, b: isinstance(a, str) and a <= b,
+    "StringGreaterThanEquals": lambda a, b: isinstance(a, str) and a >= b,
+    "NumericEquals": lambda a, b: _is_number(a) and a == b,
+    "NumericLessThan": lambda a, b: _is_number(a) and a < b,
+    "NumericGreaterThan": lambda a, b: _is_number(a) and a > b,
+    "NumericLessThanEquals": lambda a, b: _is_number(a) and a <= b,
+    "NumericGreaterThanEquals": lambda a, b: _is_number(a) and a >= b,
+    "BooleanEquals": lambda a, b: isinstance(a, bool) and a == b,
+    "IsNull": lambda a, b: (a is None) == b,
+    "IsString": lambda a, b: isinstance(a, str) == b,
+    "IsNumeric": lambda a, b: _is_number(a) == b,
+    "IsBoolean": lambda a, b: isinstance(a, bool) == b,
+}
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def evaluate_rule(rule, data, context=None) -> bool:
+    """Evaluate one Choice rule, including And/Or/Not and the `...Path` comparison variants"""
+    if "And" in rule:
+        return all(evaluate_rule(r, data, context) for r in rule["And"])
+    if "Or" in rule:
+        return any(evaluate_rule(r, data, context) for r in rule["Or"])
+    if "Not" in rule:
+        return not evaluate_rule(rule["Not"], data, context)
+
+    variable = rule["Variable"]
+    if "IsPresent" in rule:
+        return path_exists(variable, data, context) == rule["IsPresent"]
+    value = read_path(variable, data, context)
+    for operator, expected in rule.items():
+        if operator in ("Variable", "Next"):
+            continue
+        if operator.endswith("Path") and operator[:-4] in _COMPARISONS:
+            return _COMPARISONS[operator[:-4]](value, read_path(expected, data, context))
+        if operator in _COMPARISONS:
+            return _COMPARISONS[operator](value, expected)
+        raise StatesError("States.Runtime", f"Unsupported Choice operator {operator}")
+    raise StatesError("States.Runtime", f"Choice rule without a comparison: {rule}")
+
+
+class LambdaContext:
+    """The subset of the Lambda context object the handlers may use"""
+
+    def __init__(self, function_name, timeout=900):
+        self.function_name = function_name
+        self.function_version = "$LATEST"
+        self.aws_request_id = str(uuid.uuid4())
+        self.memory_limit_in_mb = 128
+        self._deadline = time.monotonic() + timeout
+
+    def get_remaining_time_in_millis(self) -> int:
+        return max(0, int((self._deadline - time.monotonic()) * 1000))
+
+
+def load_handlers(directory=LAMBDA_DIR):
+    """Import every Lambda in `directory` by path; returns ({name: lambda_handler}, {name: module})"""
+    handlers, modules = {}, {}
+    # Shared helpers sit next to the handlers, as they do in a deployment package
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".py") or filename.startswith("_"):
+            continue
+        name = filename[:-3]
+        spec = importlib.util.spec_from_file_location(
+            f"local_lambda_{name}", os.path.join(directory, filename)
+        )
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        if hasattr(module, "lambda_handler"):
+            handlers[name] = module.lambda_handler
+            modules[name] = module
+    return handlers, modules
+
+
+def install_stand_ins(modules, inspeq=None, bedrock_runtime=None, bedrock_control=None):
+    """
+    Point the Lambdas' lazily built clients at stand-ins.
+
+    The handlers only build their SDK clients when the module global is
+    still None, so setting it skips boto3 and the Inspeq SDK entirely.
+    """
+    for name, module in modules.items():
+        if inspeq is not None and hasattr(module, "inspeq_eval"):
+            module.inspeq_eval = inspeq
+        if bedrock_runtime is not None and name == "call_bedrock":
+            module.client = bedrock_runtime
+        if bedrock_control is not None and hasattr(module, "GuardrailRegistry"):
+            module.registry = module.GuardrailRegistry(bedrock_control, store=None)
+
+
+def function_name(arn) -> str:
+    """`arn:aws:lambda:region:account:function:name[:qualifier]` (or a bare name) to `name`"""
+    if ":function:" in arn:
+        return arn.split(":function:", 1)[1].split(":", 1)[0]
+    return arn
+
+
+@dataclass
+class StateRun:
+    name: str
+    type: str
+    started: float
+    duration: float
+    error: str = None
+    payload_bytes: int = None
+
+
+@dataclass
+class Execution:
+    """
+    One local execution of the state machine.
+
+    Attributes:
+        id (str): Execution name.
+        input (dict): Execution input.
+        status (str): "SUCCEEDED" or "FAILED".
+        output: Output of the final state.
+        error (str): States error name when failed.
+        cause (str): Error cause when failed.
+        states (list): A StateRun per state entered, in order.
+        duration (float): Wall-clock seconds for the whole execution.
+    """
+
+    id: str
+    input: dict
+    status: str = "RUNNING"
+    output: object = None
+    error: str = None
+    cause: str = None
+    states: list = field(default_factory=list)
+    duration: float = 0.0
+
+    @property
+    def path(self) -> list:
+        return [state.name for state in self.states]
+
+
+class LocalStateMachine:
+    """
+    Runs an Amazon States Language definition in-process.
+
+    Supports the subset used by state_machine.json: Task (lambda:invoke,
+    direct Lambda ARNs and pluggable service integrations such as
+    sns:publish), Choice, Map, Parallel, Pass, Succeed and Fail states, `.$`
+    JSONPath parameters, InputPath, ResultSelector, ResultPath and
+    OutputPath. Lambda tasks call the handler functions directly; `services`
+    maps other Task resources (e.g. "arn:aws:states:::sns:publish") to
+    callables taking the resolved parameters. Map iterations and Parallel
+    branches run on their own threads, up to MaxConcurrency. Every state
+    entered is timed; states inside a Map or Parallel are recorded as
+    "<outer state>/<inner state>".
+    """
+
+    def __init__(self, definition, handlers=None, services=None, track_payloads=False):
+        if isinstance(definition, str):
+            with open(definition) as f:
+                definition = json.load(f)
+        self.definition = definition
+        self.handlers = handlers or {}
+        self.services = services or {}
+        # Record the serialized size of every state's output (Step Functions caps it at 256 KB)
+        self.track_payloads = track_payloads
+
+    def execute(self, execution_input, name=None) -> Execution:
+        execution = Execution(id=name or str(uuid.uuid4()), input=execution_input)
+        started = time.perf_counter()
+        try:
+            execution.output = self._run(self.definition, execution_input, execution)
+            execution.status = "SUCCEEDED"
+        except StatesError as e:
+            execution.status, execution.error, execution.cause = "FAILED", e.error, e.cause
+        execution.duration = time.perf_counter() - started
+        return execution
+
+    def execute_many(self, inputs, concurrency=16) -> list:
+        """Run one execution per input, `concurrency` at a time, preserving input order"""
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="execution") as pool:
+            return list(pool.map(self.execute, inputs))
+
+    def _run(self, machine, data, execution, prefix=""):
+        states = machine["States"]
+        name = machine["StartAt"]
+        for _ in range(MAX_TRANSITIONS):
+            state = states[name]
+            context = {
+                "Execution": {"Id": execution.id, "Input": execution.input},
+                "State": {
+                    "Name": name,
+                    "EnteredTime": datetime.now(timezone.utc).isoformat(),
+                },
+            }
+            run = StateRun(
+                name=prefix + name, type=state["Type"], started=time.time(), duration=0.0
+            )
+            execution.states.append(run)
+            began = time.perf_counter()
+            try:
+                data, next_state = self._step(name, state, data, context, execution, prefix)
+            except StatesError as e:
+                run.error = e.error
+                raise
+            except Exception as e:
+                run.error = "States.Runtime"
+                raise StatesError("States.Runtime", f"{type(e).__name__}: {str(e)}")
+            finally:
+                run.duration = time.perf_counter() - began
+            if self.track_payloads:
+                run.payload_bytes = len(json.dumps(data).encode("utf-8"))
+            if next_state is None:
+                return data
+            name = next_state
+        raise StatesError("States.Runtime", f"More than {MAX_TRANSITIONS} state transitions")
+
+    def _step(self, name, state, data, context, execution, prefix=""):
+        kind = state["Type"]
+        if kind == "Choice":
+            effective = self._input(state, data, context)
+            for rule in state.get("Choices", []):
+                if evaluate_rule(rule, effective, context):
+                    return self._output(state, data), rule["Next"]
+            if "Default" in state:
+                return self._output(state, data), state["Default"]
+            raise StatesError("States.NoChoiceMatched", f"No Choice rule matched in {name}")
+        if kind == "Succeed":
+            return self._output(state, self._input(state, data, context)), None
+        if kind == "Fail":
+            raise StatesError(state.get("Error", "States.Fail"), state.get("Cause", ""))
+
+        effective = self._input(state, data, context)
+        if kind == "Pass":
+            result = state["Result"] if "Result" in state else effective
+        elif kind == "Task":
+            result = self._task(state, effective, context)
+        elif kind == "Map":
+            result = self._map(f"{prefix}{name}/", state, effective, context, execution)
+        elif kind == "Parallel":
+            result = self._parallel(f"{prefix}{name}/", state, effective, execution)
+        else:
+            raise StatesError("States.Runtime", f"Unsupported state type {kind} in {name}")
+
+        if "ResultSelector" in state:
+            result = resolve_parameters(state["ResultSelector"], result, context)
+        data = write_path(state.get("ResultPath", "$"), data, result)
+        return self._output(state, data), (None if state.get("End") else state["Next"])
+
+    def _input(self, state, data, context):
+        if "InputPath" in state:
+            data = read_path(state["InputPath"], data, context) if state["InputPath"] else {}
+        # A Map's Parameters is the legacy name of its per-item ItemSelector
+        if "Parameters" in state and state["Type"] != "Map":
+            data = resolve_parameters(state["Parameters"], data, context)
+        return data
+
+    def _map(self, prefix, state, data, context, execution):
+        items = read_path(state.get("ItemsPath", "$"), data, context)
+        if not isinstance(items, list):
+            raise StatesError("States.Runtime", f"ItemsPath of {prefix[:-1]} is not an array")
+        processor = state.get("ItemProcessor") or state["Iterator"]
+        selector = state.get("ItemSelector", state.get("Parameters"))
+
+        def iteration(indexed):
+            index, item = indexed
+            if selector is not None:
+                item_context = {**context, "Map": {"Item": {"Index": index, "Value": item}}}
+                item = resolve_parameters(selector, data, item_context)
+            return self._run(processor, item, execution, prefix)
+
+        return self._fan_out(iteration, list(enumerate(items)), state.get("MaxConcurrency", 0))
+
+    def _parallel(self, prefix, state, data, execution):
+        branches = state["Branches"]
+        return self._fan_out(
+            lambda branch: self._run(branch, data, execution, prefix), branches, 0
+        )
+
+    @staticmethod
+    def _fan_out(operation, items, max_concurrency):
+        """Run `operation` over items concurrently, returning results in item order"""
+        if not items:
+            return []
+        workers = len(items) if not max_concurrency else min(max_concurrency, len(items))
+        if workers == 1:
+            return [operation(item) for item in items]
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="branch") as pool:
+            return list(pool.map(operation, items))
+
+    def _output(self, state, data):
+        if "OutputPath" in state:
+            return read_path(state["OutputPath"], data) if state["OutputPath"] else {}
+        return data
+
+    def _task(self, state, parameters, context):
+        resource = state["Resource"]
+        if resource == "arn:aws:states:::lambda:invoke":
+            payload = self._invoke(parameters["FunctionName"], parameters.get("Payload", {}))
+            return {"ExecutedVersion": "$LATEST", "Payload": payload, "StatusCode": 200}
+        if resource.startswith("arn:aws:lambda:"):
+            return self._invoke(resource, parameters)
+        service = self.services.get(resource)
+        if service is None:
+            raise StatesError("States.Runtime", f"No local integration for {resource}")
+        return service(**parameters)
+
+    def _invoke(self, arn, payload):
+        name = function_name(arn)
+        handler = self.handlers.get(name)
+        if handler is None:
+            raise StatesError("Lambda.ResourceNotFoundException", f"Function not found: {name}")
+        # Step Functions passes JSON, not Python objects
+        event = json.loads(json.dumps(payload))
+        try:
+            result = handler(event, LambdaContext(name))
+        except Exception as e:
+            raise StatesError(type(e).__name__, str(e))
+        return json.loads(json.dumps(result))
+
+
+def sns_publish(sns):
+    """sns:publish integration backed by a client with a boto3-style publish()"""
+
+    def publish(TopicArn, Message, **kwargs):
+        if not isinstance(Message, str):
+            Message = json.dumps(Message)
+        return sns.publish(TopicArn=TopicArn, Message=Message, **kwargs)
+
+    return publish
+
+
+def timing_summary(executions) -> dict:
+    """Per-state count, p50, p95 and max duration (milliseconds) plus execution totals"""
+    durations, payloads = {}, {}
+    for execution in executions:
+        for state in execution.states:
+            durations.setdefault(state.name, []).append(state.duration * 1000)
+            if state.payload_bytes is not None:
+                payloads[state.name] = max(payloads.get(state.name, 0), state.payload_bytes)
+        durations.setdefault("(execution)", []).append(execution.duration * 1000)
+
+    summary = {}
+    for name, values in durations.items():
+        values.sort()
+        summary[name] = {
+            "count": len(values),
+            "p50_ms": statistics.median(values),
+            "p95_ms": values[min(len(values) - 1, int(len(values) * 0.95))],
+            "max_ms": values[-1],
+        }
+        if name in payloads:
+            summary[name]["max_payload_bytes"] = payloads[name]
+    return summary
+
+
+def speculation_summary(executions) -> dict:
+    """
+    Outcomes of the speculative_generation branch: committed and discarded
+    executions, and the gate time the committed ones overlapped with generation
+    """
+    committed = discarded = 0
+    saved = 0.0
+    for execution in executions:
+        path = execution.path
+        if "commit_speculative_generation" in path:
+            committed += 1
+            durations = {state.name: state.duration for state in execution.states}
+            gate = durations.get("speculative_generation/speculative_evaluate_prompt_metrics", 0.0)
+            gate += durations.get("speculative_generation/speculative_merge_prompt_evaluations", 0.0)
+            generation = durations.get("speculative_generation/speculative_call_bedrock", 0.0)
+            saved += min(gate, generation)
+        elif "discard_speculative_generation" in path:
+            discarded += 1
+    return {"committed": committed, "discarded": discarded, "saved_ms": saved * 1000}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run state_machine.json locally")
+    parser.add_argument("definition", nargs="?", default="state_machine.json")
+    parser.add_argument("--input", help="Execution input as JSON, or @file.json")
+    parser.add_argument("--executions", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--real", action="store_true", help="Use the real AWS/Inspeq clients")
+    parser.add_argument("--inspeq-latency", type=float, default=0.3)
+    parser.add_argument(
+        "--inspeq-per-metric", type=float, default=0.0, help="Extra Inspeq latency per metric"
+    )
+    parser.add_argument("--bedrock-latency", type=float, default=1.0)
+    parser.add_argument("--pass-rate", type=float, default=1.0)
+    parser.add_argument("--verbose", action="store_true", help="Show the handlers' own output")
+    parser.add_argument("--payloads", action="store_true", help="Report state output sizes")
+    parser.add_argument(
+        "--claim-check", metavar="DIR", help="Pass large texts as references stored in DIR"
+    )
+    parser.add_argument(
+        "--speculative",
+        action="store_true",
+        help="Generate while the prompt is evaluated (sets speculative_generation in the input)",
+    )
+    args = parser.parse_args(argv)
+
+    if args.input and args.input.startswith("@"):
+        with open(args.input[1:]) as f:
+            execution_input = json.load(f)
+    else:
+        execution_input = json.loads(args.input or '{"prompt": "Hello", "context": ""}')
+    if args.speculative:
+        execution_input["speculative_generation"] = True
+
+    if args.claim_check:
+        from claim_check import ClaimCheck, FileBlobStore
+
+        # The handlers build their own ClaimCheck from the environment
+        os.environ["CLAIM_CHECK_DIR"] = args.claim_check
+        claim_check = ClaimCheck(
+            FileBlobStore(args.claim_check),
+            threshold=int(os.getenv("CLAIM_CHECK_THRESHOLD", "8192")),
+        )
+        execution_input = claim_check.offload_fields(execution_input)
+
+    handlers, modules = load_handlers()
+    if args.real:
+        import boto3
+
+        services = {"arn:aws:states:::sns:publish": sns_publish(boto3.client("sns"))}
+    else:
+        from stand_ins import FakeBedrockControl, FakeBedrockRuntime, FakeInspeqEval, RecordingSNS
+
+        install_stand_ins(
+            modules,
+            inspeq=FakeInspeqEval(
+                latency=args.inspeq_latency,
+                per_metric=args.inspeq_per_metric,
+                pass_rate=args.pass_rate,
+            ),
+            bedrock_runtime=FakeBedrockRuntime(latency=args.bedrock_latency),
+            bedrock_control=FakeBedrockControl(),
+        )
+        services = {"arn:aws:states:::sns:publish": sns_publish(RecordingSNS())}
+
+    machine = LocalStateMachine(
+        args.definition, handlers=handlers, services=services, track_payloads=args.payloads
+    )
+    # The handlers print their results for CloudWatch; keep the report readable
+    handler_output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    started = time.perf_counter()
+    with handler_output:
+        executions = machine.execute_many(
+            [execution_input] * args.executions, concurrency=args.concurrency
+        )
+    elapsed = time.perf_counter() - started
+
+    statuses = {}
+    for execution in executions:
+        key = execution.status
+        if execution.error is not None:
+            key = f"{execution.status} ({execution.error})"
+        statuses[key] = statuses.get(key, 0) + 1
+    print(f"{len(executions)} executions in {elapsed:.2f}s: {statuses}")
+    for name, stats in timing_summary(executions).items():
+        payload = stats.get("max_payload_bytes")
+        print(
+            f"  {name:<32} n={stats['count']:<5} p50 {stats['p50_ms']:>8.1f} ms "
+            f"p95 {stats['p95_ms']:>8.1f} ms max {stats['max_ms']:>8.1f} ms"
+            + (f" payload {payload / 1024:>7.1f} KB" if payload is not None else "")
+        )
+    if args.speculative:
+        speculation = speculation_summary(executions)
+        print(
+            f"speculation: {speculation['committed']} committed, "
+            f"{speculation['discarded']} discarded, {speculation['saved_ms']:.0f} ms of gate time overlapped"
+        )
+    if args.executions == 1:
+        execution = executions[0]
+        print(" -> ".join(execution.path))
+        result = execution.output if execution.error is None else execution.cause
+        print(json.dumps(result, indent=2)[:2000])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,6 @@
 from ai_client import AIClient
 from evaluation_parser import EvaluationParser
+import sys
 
 
 def print_evaluation_results(title: str, evaluation_data: dict):
@@ -80,4 +81,9 @@ Word Count Range: 1200~1800 words"""
 
 
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        from batch import main as batch_main
+
+        batch_main(sys.argv[2:])
+    else:
+        main()
@@ -0,0 +1,181 @@
+from collections import deque
+from dataclasses import dataclass
+from env_policy import Shared, policy_from_env
+import logging, threading
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("anthropic", "bedrock")
+MODES = ("ordered", "adaptive")
+
+
+@dataclass
+class ModelRouterPolicy:
+    """
+    Which backend and model tier serve a generation. MODEL_ROUTER_BACKENDS
+    lists the backends, e.g. "anthropic,bedrock", and each model ID has a
+    MODEL_ROUTER_<BACKEND>_<TIER>_MODEL variable.
+
+    "ordered" tries the backends in the listed order and "adaptive" tries the
+    fastest first. Either way a backend whose recent error rate is above
+    max_error_rate goes last, and a failed call moves on to the next backend.
+    """
+
+    backends: str = ""  # in order of preference, comma-separated; empty for the caller's own
+    mode: str = "ordered"
+    fast_max_input_tokens: int = 0  # prompt + context up to this may go fast; 0 disables the tier
+    fast_max_output_tokens: int = 0  # and max_tokens up to this; 0 for no limit
+    standard_metrics: str = "FACTUAL_CONSISTENCY"  # response metrics that need the standard tier
+    window: int = 50  # calls a backend's error rate and latency are computed over
+    warmup: int = 5  # calls before a backend's error rate and latency are relied on
+    max_error_rate: float = 0.5
+    anthropic_fast_model: str = "claude-3-5-haiku-latest"
+    anthropic_standard_model: str = "claude-3-5-sonnet-latest"
+    bedrock_fast_model: str = "us.anthropic.claude-3-5-haiku-20241022-v1:0"
+    bedrock_standard_model: str = "us.anthropic.claude-3-5-sonnet-20241022-v2:0"
+
+    @classmethod
+    def from_env(cls, defaults=None) -> "ModelRouterPolicy":
+        policy = policy_from_env(cls, "MODEL_ROUTER", defaults)
+        if policy.mode not in MODES:
+            raise ValueError(f"Unsupported model router mode: {policy.mode}")
+        for backend in _names(policy.backends):
+            if backend not in BACKENDS:
+                raise ValueError(f"Unsupported model router backend: {backend}")
+        return policy
+
+
+def _names(value) -> list:
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+@dataclass
+class Route:
+    """The tier of a generation and the (backend, model) pairs to try, in order"""
+
+    tier: str
+    candidates: list
+
+
+class _BackendHealth:
+    """Outcomes and seconds per output token of a backend's recent calls"""
+
+    def __init__(self, window):
+        self.outcomes = deque(maxlen=window)
+        self.latencies = deque(maxlen=window)
+        self.calls = 0
+        self.failures = 0
+
+
+class ModelRouter:
+    """
+    Routes each generation to a model tier and an ordered list of backends.
+
+    The standard tier is the large model every request used to go to. A
+    generation with a short prompt and context, a short planned output and
+    no response metric from standard_metrics goes to the fast tier instead.
+    Callers report every call with record(), so the router keeps a rolling
+    error rate and latency per backend to order the backends by, and try
+    the next one when a call fails.
+    """
+
+    def __init__(self, policy=None):
+        self.policy = policy or ModelRouterPolicy()
+        self._health = {backend: _BackendHealth(self.policy.window) for backend in BACKENDS}
+        self._counters = {"fast": 0, "standard": 0, "fallbacks": 0}
+        self._lock = threading.Lock()
+
+    def model(self, backend, tier) -> str:
+        return getattr(self.policy, f"{backend}_{tier}_model")
+
+    def tier(self, input_tokens, max_tokens, metrics=None) -> str:
+        policy = self.policy
+        if (
+            policy.fast_max_input_tokens
+            and input_tokens <= policy.fast_max_input_tokens
+            and (not policy.fast_max_output_tokens or max_tokens <= policy.fast_max_output_tokens)
+            and not set(metrics or ()) & set(_names(policy.standard_metrics))
+        ):
+            return "fast"
+        return "standard"
+
+    def _error_rate(self, health):
+        if len(health.outcomes) < self.policy.warmup:
+            return 0.0
+        return 1 - sum(health.outcomes) / len(health.outcomes)
+
+    def _latency(self, health):
+        if len(health.latencies) < self.policy.warmup:
+            return None
+        return sum(health.latencies) / len(health.latencies)
+
+    def backends(self, default) -> list:
+        """Backends to try in order; `default` is the caller's own backend"""
+        listed = _names(self.policy.backends) or [default]
+        with self._lock:
+            health = {backend: self._health[backend] for backend in listed}
+
+            def order(index):
+                backend = listed[index]
+                unhealthy = self._error_rate(health[backend]) > self.policy.max_error_rate
+                if self.policy.mode == "ordered":
+                    return (unhealthy, index)
+                # A backend without enough calls goes first, so its latency gets measured
+                return (unhealthy, self._latency(health[backend]) or 0.0, index)
+
+            return [listed[index] for index in sorted(range(len(listed)), key=order)]
+
+    def route(self, input_tokens, max_tokens, metrics=None, default="anthropic") -> Route:
+        tier = self.tier(input_tokens, max_tokens, metrics)
+        with self._lock:
+            self._counters[tier] += 1
+        return Route(
+            tier=tier,
+            candidates=[
+                (backend, self.model(backend, tier)) for backend in self.backends(default)
+            ],
+        )
+
+    def record(self, backend, seconds, ok, output_tokens=0) -> None:
+        """Outcome of a call to `backend`; latency is kept per output token"""
+        with self._lock:
+            health = self._health[backend]
+            health.calls += 1
+            health.failures += int(not ok)
+            health.outcomes.append(bool(ok))
+            if ok and output_tokens:
+                health.latencies.append(seconds / output_tokens)
+
+    def fell_back(self, backend, error) -> None:
+        with self._lock:
+            self._counters["fallbacks"] += 1
+        logger.warning(f"Generation on {backend} failed ({error}), trying the next backend")
+
+    def backend_stats(self) -> dict:
+        with self._lock:
+            stats = {}
+            for backend, health in self._health.items():
+                latency = self._latency(health)
+                stats[backend] = {
+                    "calls": health.calls,
+                    "failures": health.failures,
+                    "error_rate": round(self._error_rate(health), 3),
+                    "ms_per_output_token": (
+                        round(latency * 1000, 3) if latency is not None else None
+                    ),
+                }
+            return stats
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+        stats["mode"] = self.policy.mode
+        return stats
+
+
+_shared = Shared(lambda: ModelRouter(ModelRouterPolicy.from_env()))
+
+
+def get_model_router() -> ModelRouter:
+    """Process-wide ModelRouter, so every client shares the backends' health"""
+    return _shared.get()
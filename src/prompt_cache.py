@@ -0,0 +1,167 @@
+from dataclasses import dataclass
+from env_policy import Shared, policy_from_env
+import logging, threading
+
+logger = logging.getLogger(__name__)
+
+MODES = ("on", "off")
+TTLS = ("", "5m", "1h")
+# The Anthropic API only accepts a cache_control ttl with this beta enabled
+EXTENDED_TTL_BETA = "extended-cache-ttl-2025-04-11"
+
+# Fixed text ahead of the context, so every request sharing a context
+# shares the same cacheable prefix
+CONTEXT_INSTRUCTION = "Leverage the following context to execute the user's prompt.\n\nContext:\n"
+
+USAGE_FIELDS = (
+    "input_tokens",
+    "output_tokens",
+    "cache_creation_input_tokens",
+    "cache_read_input_tokens",
+)
+
+
+@dataclass
+class PromptCachePolicy:
+    """
+    How the shared context is marked for provider-side prompt caching.
+    PROMPT_CACHE_MODE=off sends it unmarked; PROMPT_CACHE_MIN_CHARS and
+    PROMPT_CACHE_TTL set the other two fields.
+
+    Anthropic and Bedrock silently skip caching prefixes shorter than the
+    model's minimum (1024 tokens for Claude 3.5 Sonnet), so short contexts
+    cost nothing extra when marked. Bedrock rejects the marker on models
+    without prompt caching, so it is only sent to the bedrock_models.
+    """
+
+    mode: str = "on"
+    min_chars: int = 0  # shorter contexts are sent without a cache marker
+    ttl: str = ""  # "5m" or "1h" on the Anthropic API; empty for the default (5 minutes)
+    # Bedrock model IDs containing one of these support prompt caching, comma-separated
+    bedrock_models: str = (
+        "claude-3-5-haiku,claude-3-7-sonnet,claude-sonnet-4,claude-opus-4,claude-haiku-4"
+    )
+
+    @classmethod
+    def from_env(cls, defaults=None) -> "PromptCachePolicy":
+        policy = policy_from_env(cls, "PROMPT_CACHE", defaults)
+        if policy.mode not in MODES:
+            raise ValueError(f"Unsupported prompt cache mode: {policy.mode}")
+        if policy.ttl not in TTLS:
+            raise ValueError(f"Unsupported prompt cache TTL: {policy.ttl}")
+        return policy
+
+
+def usage_dict(usage) -> dict:
+    """Token counts from an SDK usage object or a Bedrock usage dict; missing fields are 0"""
+    if usage is None:
+        return {}
+    if isinstance(usage, dict):
+        return {name: usage.get(name) or 0 for name in USAGE_FIELDS}
+    return {name: getattr(usage, name, None) or 0 for name in USAGE_FIELDS}
+
+
+def add_usage(total, usage) -> dict:
+    """Add the token counts of `usage` into the dict `total`"""
+    for name, tokens in usage.items():
+        total[name] = total.get(name, 0) + tokens
+    return total
+
+
+class PromptCache:
+    """
+    Builds Messages API requests with the context in its own system block,
+    marked for prompt caching, and adds up the cache usage reported back.
+
+    The context used to be concatenated into the user message, so every
+    request paid to tokenize and bill it again. As a system block ahead of
+    the prompt it is a prefix the provider caches: the first request writes
+    it, and requests sharing the context within the cache lifetime read it
+    back at a fraction of the input price and time to first token.
+    """
+
+    def __init__(self, policy=None):
+        self.policy = policy or PromptCachePolicy()
+        self._counters = {
+            "requests": 0,
+            "marked": 0,
+            "input_tokens": 0,
+            "cache_creation_input_tokens": 0,
+            "cache_read_input_tokens": 0,
+        }
+        self._lock = threading.Lock()
+
+    def bedrock_caches(self, model) -> bool:
+        """Whether the Bedrock model `model` supports prompt caching"""
+        names = [name.strip() for name in self.policy.bedrock_models.split(",")]
+        return any(name and name in model for name in names)
+
+    def cacheable(self, context, bedrock_model=None) -> bool:
+        return (
+            self.policy.mode == "on"
+            and len(context) >= self.policy.min_chars
+            and (bedrock_model is None or self.bedrock_caches(bedrock_model))
+        )
+
+    def system(self, context, bedrock_model=None):
+        """
+        System blocks carrying the context, or None without one. The TTL is
+        only sent to the Anthropic API (bedrock_model None); Bedrock keeps
+        its default lifetime.
+        """
+        if not context:
+            return None
+        block = {"type": "text", "text": CONTEXT_INSTRUCTION + context}
+        if self.cacheable(context, bedrock_model):
+            block["cache_control"] = {"type": "ephemeral"}
+            if self.policy.ttl and bedrock_model is None:
+                block["cache_control"]["ttl"] = self.policy.ttl
+        return [block]
+
+    def request(self, prompt, context, bedrock_model=None) -> dict:
+        """
+        The system and messages arguments of a Messages API request, for
+        the Anthropic API or, given its model ID, for Bedrock. A request
+        with a TTL also carries the beta header the Anthropic API needs.
+        """
+        request = {"messages": [{"role": "user", "content": prompt}]}
+        system = self.system(context, bedrock_model)
+        marked = bool(system) and "cache_control" in system[-1]
+        if system is not None:
+            request["system"] = system
+        if marked and "ttl" in system[-1]["cache_control"]:
+            request["extra_headers"] = {"anthropic-beta": EXTENDED_TTL_BETA}
+        with self._lock:
+            self._counters["requests"] += 1
+            self._counters["marked"] += int(marked)
+        return request
+
+    def record(self, usage) -> dict:
+        """Add a response's usage to the counters; returns it as a dict"""
+        usage = usage_dict(usage)
+        with self._lock:
+            for name in ("input_tokens", "cache_creation_input_tokens", "cache_read_input_tokens"):
+                self._counters[name] += usage.get(name, 0)
+        return usage
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+        prompt_tokens = (
+            stats["input_tokens"]
+            + stats["cache_creation_input_tokens"]
+            + stats["cache_read_input_tokens"]
+        )
+        stats["read_ratio"] = (
+            round(stats["cache_read_input_tokens"] / prompt_tokens, 3) if prompt_tokens else None
+        )
+        stats["mode"] = self.policy.mode
+        return stats
+
+
+_shared = Shared(lambda: PromptCache(PromptCachePolicy.from_env()))
+
+
+def get_prompt_cache() -> PromptCache:
+    """Process-wide PromptCache, so its counters cover every client"""
+    return _shared.get()
@@ -0,0 +1,389 @@
+from dataclasses import dataclass
+from env_policy import Shared, policy_from_env
+import asyncio, logging, random, re, threading, time
+
+logger = logging.getLogger(__name__)
+
+_STATUS_IN_MESSAGE = re.compile(r"status code (\d{3})")
+_THROTTLING_CODES = ("Throttling", "ThrottlingException", "TooManyRequestsException")
+
+
+class UpstreamUnavailable(Exception):
+    """Raised without calling the upstream: circuit open or rate limit queue too long"""
+
+
+@dataclass
+class UpstreamPolicy:
+    """
+    Rate limit, circuit breaker and retry settings for one upstream. Every
+    field can be overridden with RESILIENCE_<UPSTREAM>_<FIELD>, for example
+    RESILIENCE_INSPEQ_RATE=10 (see from_env).
+    """
+
+    rate: float = 20.0  # requests per second the limiter starts at
+    min_rate: float = 0.5
+    max_rate: float = 200.0
+    burst: int = 20
+    max_wait: float = 30.0  # longest a call queues for a token before failing fast
+    failure_threshold: int = 5  # consecutive failures that open the circuit
+    recovery_time: float = 10.0  # seconds the circuit stays open before a probe
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+    retry_ratio: float = 0.2  # retries allowed per first attempt
+    min_retries_per_second: float = 1.0
+
+    @classmethod
+    def from_env(cls, name, defaults=None) -> "UpstreamPolicy":
+        return policy_from_env(cls, f"RESILIENCE_{name.upper()}", defaults)
+
+
+DEFAULT_POLICIES = {
+    "anthropic": UpstreamPolicy(rate=20.0, burst=20, max_delay=20.0),
+    "inspeq": UpstreamPolicy(rate=20.0, burst=40),
+    "bedrock": UpstreamPolicy(rate=10.0, burst=10, max_delay=20.0),
+}
+
+
+def status_code(error):
+    """HTTP status of an SDK error (anthropic, requests, botocore, inspeq), or None"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        response = getattr(error, "response", None)
+        if isinstance(response, dict):  # botocore ClientError
+            status = response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+            if response.get("Error", {}).get("Code") in _THROTTLING_CODES:
+                status = 429
+        else:
+            status = getattr(response, "status_code", None)
+    if status is None:
+        # The Inspeq SDK only reports the status in its message
+        match = _STATUS_IN_MESSAGE.search(str(error))
+        status = int(match.group(1)) if match else None
+    return status
+
+
+def retry_after(error):
+    """Seconds from the error's retry-after header, or None"""
+    value = getattr(error, "retry_after", None)
+    if value is None:
+        response = getattr(error, "response", None)
+        if isinstance(response, dict):
+            headers = response.get("ResponseMetadata", {}).get("HTTPHeaders", {})
+        else:
+            headers = getattr(response, "headers", None) or {}
+        value = headers.get("retry-after")
+    try:
+        return max(float(value), 0.0) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def classify(error) -> str:
+    """"throttled" (429), "retryable" (5xx, 408, timeouts, connection errors) or "fatal" """
+    status = status_code(error)
+    if status == 429:
+        return "throttled"
+    if status is not None:
+        return "retryable" if status >= 500 or status in (408, 409) else "fatal"
+    name = type(error).__name__
+    if isinstance(error, (ConnectionError, TimeoutError)) or "Timeout" in name or "Connect" in name:
+        return "retryable"
+    return "fatal"
+
+
+class AdaptiveTokenBucket:
+    """
+    Token bucket whose rate adapts to the upstream.
+
+    Every success adds `increase` requests per second to the rate, up to
+    max_rate, so a saturated bucket grows by that fraction each second. A
+    429 halves the rate down to min_rate, at most once per `cooldown`
+    seconds since the requests already in flight are throttled together,
+    and pauses all callers until the upstream's retry-after. Callers reserve
+    a token and wait for it outside the lock, so the same bucket serves
+    threads and coroutines.
+    """
+
+    def __init__(self, rate, burst, min_rate, max_rate, increase=0.5, cooldown=1.0):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.cooldown = cooldown
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._decreased_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token and return how long the caller must wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, self._paused_until - now)
+
+    def refund(self) -> None:
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1)
+
+    def succeeded(self) -> None:
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def throttled(self, retry_after=None) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if now - self._decreased_at >= self.cooldown:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self._tokens = min(self._tokens, 0.0)
+                self._decreased_at = now
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+
+
+class CircuitBreaker:
+    """
+    Stops calling an upstream after `failure_threshold` consecutive failures.
+
+    While open, calls fail immediately; after `recovery_time` a single probe
+    is let through (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold, recovery_time):
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.state = "closed"
+        self.opened = 0
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.recovery_time:
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def release(self) -> None:
+        """Give up a half-open probe without an outcome (the call was cancelled)"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            self.state = "closed"
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == "open":
+                return
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                self.opened += 1
+                logger.warning(f"Circuit opened after {self._failures} consecutive failures")
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+
+class RetryBudget:
+    """
+    Caps retries at `ratio` of first attempts, plus `min_per_second` so a
+    quiet client can still retry. When an upstream fails broadly the budget
+    runs out and errors surface instead of multiplying the load.
+    """
+
+    def __init__(self, ratio, min_per_second):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self._cap = max(10.0, min_per_second * 10)
+        self._tokens = self._cap
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._tokens = min(self._cap, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self._cap, self._tokens + (now - self._updated) * self.min_per_second
+            )
+            self._updated = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class Upstream:
+    """
+    Calls to one upstream through its rate limiter, circuit breaker and retry budget.
+
+    call() runs a blocking function and acall() a coroutine function; both
+    retry throttled and retryable errors with full-jitter exponential
+    backoff (at least the upstream's retry-after) while attempts and the
+    retry budget last, and re-raise the last error otherwise. Fatal errors
+    (4xx other than 408, 409 and 429) are raised at once.
+
+    Attributes:
+        name (str): Upstream name, used in logs and stats.
+        policy (UpstreamPolicy): Settings the limiter, breaker and budget were built from.
+    """
+
+    def __init__(self, name, policy=None):
+        self.name = name
+        self.policy = policy or UpstreamPolicy()
+        self.limiter = AdaptiveTokenBucket(
+            self.policy.rate, self.policy.burst, self.policy.min_rate, self.policy.max_rate
+        )
+        self.breaker = CircuitBreaker(self.policy.failure_threshold, self.policy.recovery_time)
+        self.budget = RetryBudget(self.policy.retry_ratio, self.policy.min_retries_per_second)
+        self._counters = {
+            "calls": 0,
+            "attempts": 0,
+            "successes": 0,
+            "failures": 0,
+            "retries": 0,
+            "throttled": 0,
+            "rejected": 0,
+            "budget_exhausted": 0,
+        }
+        self._lock = threading.Lock()
+
+    def _count(self, name) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def _admit(self) -> float:
+        """Check the circuit and reserve a token; return the wait before calling"""
+        wait = self.limiter.reserve()
+        if wait > self.policy.max_wait:
+            self.limiter.refund()
+            self._count("rejected")
+            raise UpstreamUnavailable(f"{self.name}: rate limited for {wait:.1f}s")
+        if not self.breaker.allow():
+            self.limiter.refund()
+            self._count("rejected")
+            raise UpstreamUnavailable(f"{self.name}: circuit open")
+        self._count("attempts")
+        return wait
+
+    def _failed(self, error, attempt):
+        """Record a failure; return the delay before retrying, or None to re-raise"""
+        kind = classify(error)
+        if kind == "fatal":
+            # The upstream is up, the request itself is wrong
+            self.breaker.record_success()
+            return None
+        if kind == "throttled":
+            self._count("throttled")
+            self.breaker.record_success()
+            self.limiter.throttled(retry_after(error))
+        else:
+            self._count("failures")
+            self.breaker.record_failure()
+        if attempt + 1 >= self.policy.max_attempts:
+            return None
+        if not self.budget.withdraw():
+            self._count("budget_exhausted")
+            return None
+        self._count("retries")
+        delay = random.uniform(0, min(self.policy.max_delay, self.policy.base_delay * 2**attempt))
+        delay = max(delay, retry_after(error) or 0.0)
+        logger.warning(f"{self.name} call failed ({kind}), retrying in {delay:.2f} seconds")
+        return delay
+
+    def _succeeded(self) -> None:
+        self._count("successes")
+        self.limiter.succeeded()
+        self.breaker.record_success()
+
+    def call(self, operation, *args, **kwargs):
+        self._count("calls")
+        self.budget.deposit()
+        for attempt in range(self.policy.max_attempts):
+            time.sleep(self._admit())
+            try:
+                result = operation(*args, **kwargs)
+            except Exception as e:
+                delay = self._failed(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+            else:
+                self._succeeded()
+                return result
+
+    async def acall(self, operation, *args, **kwargs):
+        self._count("calls")
+        self.budget.deposit()
+        for attempt in range(self.policy.max_attempts):
+            await asyncio.sleep(self._admit())
+            try:
+                result = await operation(*args, **kwargs)
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception as e:
+                delay = self._failed(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+            else:
+                self._succeeded()
+                return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+        stats["rate"] = round(self.limiter.rate, 2)
+        stats["circuit"] = self.breaker.state
+        stats["circuit_opened"] = self.breaker.opened
+        return stats
+
+
+class Resilience:
+    """One Upstream per name, built from DEFAULT_POLICIES and the environment on first use"""
+
+    def __init__(self, policies=None):
+        self.policies = dict(DEFAULT_POLICIES, **(policies or {}))
+        self._upstreams = {}
+        self._lock = threading.Lock()
+
+    def upstream(self, name) -> Upstream:
+        with self._lock:
+            if name not in self._upstreams:
+                policy = UpstreamPolicy.from_env(name, self.policies.get(name))
+                self._upstreams[name] = Upstream(name, policy)
+            return self._upstreams[name]
+
+    def stats(self) -> dict:
+        with self._lock:
+            upstreams = dict(self._upstreams)
+        return {name: upstream.stats() for name, upstream in upstreams.items()}
+
+
+_shared = Shared(lambda: Resilience())
+
+
+def get_resilience() -> Resilience:
+    """Process-wide Resilience, so every client shares each upstream's limiter and breaker"""
+    return _shared.get()
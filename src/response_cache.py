@@ -0,0 +1,297 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from env_policy import env_flag
+import hashlib, logging, os, random, re, threading, time, zlib
+
+logger = logging.getLogger(__name__)
+
+# Mersenne prime used by the MinHash permutations
+_PRIME = (1 << 61) - 1
+_WHITESPACE = re.compile(r"\s+")
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+def normalize(text) -> str:
+    """Case-folded text with whitespace collapsed, the form both tiers key on"""
+    return _WHITESPACE.sub(" ", str(text or "")).strip().casefold()
+
+
+def shingles(text, size=5) -> set:
+    """Character shingles of the normalized text without punctuation, hashed to 32 bits"""
+    text = _WHITESPACE.sub(" ", _PUNCTUATION.sub(" ", normalize(text))).strip()
+    if len(text) <= size:
+        return {zlib.crc32(text.encode("utf-8"))}
+    return {
+        zlib.crc32(text[i : i + size].encode("utf-8"))
+        for i in range(len(text) - size + 1)
+    }
+
+
+def numbers(text) -> frozenset:
+    """Numbers in the text; near-duplicates must agree on them ("2025" vs "2026")"""
+    return frozenset(_NUMBER.findall(str(text or "")))
+
+
+def evaluation_key(metrics) -> str:
+    """Key a stored evaluation by the metrics it covers; None means the default metrics"""
+    return ",".join(sorted(metrics)) if metrics else "default"
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    namespace: str
+    prompt: str
+    response: str
+    signature: tuple
+    numbers: frozenset
+    expires_at: float
+    evaluations: dict = field(default_factory=dict)
+    hits: int = 0
+
+
+@dataclass
+class CacheHit:
+    """A cached response and how it was matched ("exact" or "near")"""
+
+    key: str
+    tier: str
+    similarity: float
+    response: str
+    evaluations: dict
+
+    def evaluation(self, metrics=None):
+        """The cached evaluation of the response for these metrics, if any"""
+        return self.evaluations.get(evaluation_key(metrics))
+
+    def info(self) -> dict:
+        return {"tier": self.tier, "similarity": round(self.similarity, 3), "key": self.key}
+
+
+class ResponseCache:
+    """
+    Two-tier cache of generated responses, and their evaluations, keyed by prompt.
+
+    The exact tier is a dict keyed by a hash of the normalized prompt, so a
+    repeated prompt costs one lookup. The near-duplicate tier holds a MinHash
+    signature of every prompt's character shingles in an LSH index: a
+    lookup only compares the signatures that share a band with the query,
+    and serves the closest one whose estimated Jaccard similarity reaches
+    `threshold` and that mentions the same numbers, since a changed year or
+    amount barely moves the similarity but changes the answer. Entries live
+    in a namespace, by default a hash of the context, so a response is never
+    served for a different context; a long shared context would otherwise
+    dominate the shingles and make unrelated prompts look alike.
+
+    Evaluations of a cached response are stored on its entry per metric
+    set, so a hit can skip the response evaluation as well as the generation.
+
+    Attributes:
+        threshold (float): Minimum estimated similarity for a near-duplicate hit.
+        ttl (float): Seconds an entry stays valid.
+        max_entries (int): Entries kept before the least recently used are evicted.
+    """
+
+    def __init__(
+        self,
+        threshold=0.9,
+        ttl=3600,
+        max_entries=10000,
+        num_perm=64,
+        bands=8,
+        shingle_size=5,
+        seed=1,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        generator = random.Random(seed)
+        self._permutations = [
+            (generator.randrange(1, _PRIME), generator.randrange(0, _PRIME))
+            for _ in range(num_perm)
+        ]
+        self._entries = OrderedDict()  # key -> CacheEntry, least recently used first
+        self._buckets = {}  # (namespace, band, band hash) -> set of keys
+        self._lock = threading.Lock()
+        self._counters = {
+            "lookups": 0,
+            "exact_hits": 0,
+            "near_hits": 0,
+            "misses": 0,
+            "evaluation_hits": 0,
+            "evictions": 0,
+            "expired": 0,
+        }
+
+    @staticmethod
+    def namespace_for(context=None, namespace=None) -> str:
+        if namespace is not None:
+            return str(namespace)
+        return hashlib.sha256(normalize(context).encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def _key(namespace, prompt) -> str:
+        material = f"{namespace}\x00{normalize(prompt)}"
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def signature(self, text) -> tuple:
+        """MinHash signature: the minimum of each permutation over the shingle hashes"""
+        hashes = shingles(text, self.shingle_size)
+        return tuple(
+            min((a * h + b) % _PRIME for h in hashes) for a, b in self._permutations
+        )
+
+    def _bands(self, namespace, signature):
+        for band in range(self.bands):
+            start = band * self.rows
+            yield (namespace, band, hash(signature[start : start + self.rows]))
+
+    @staticmethod
+    def similarity(first, second) -> float:
+        """Estimated Jaccard similarity: the share of matching signature positions"""
+        return sum(a == b for a, b in zip(first, second)) / len(first)
+
+    def get(self, prompt, context=None, namespace=None, metrics=None):
+        """
+        Return a CacheHit for the prompt, or None.
+
+        When `metrics` is given, a hit carrying an evaluation for them is
+        counted as an evaluation hit.
+        """
+        namespace = self.namespace_for(context, namespace)
+        key = self._key(namespace, prompt)
+        now = time.time()
+
+        with self._lock:
+            self._counters["lookups"] += 1
+            exact = self._live(key, now) is not None
+
+        # Signatures are computed outside the lock, and only on exact misses
+        signature = None if exact else self.signature(prompt)
+        mentioned = numbers(prompt)
+
+        with self._lock:
+            entry = self._live(key, now)
+            tier, similarity = "exact", 1.0
+
+            if entry is None and signature is not None:
+                best = None
+                candidates = set()
+                for bucket in self._bands(namespace, signature):
+                    candidates.update(self._buckets.get(bucket, ()))
+                for candidate in candidates:
+                    current = self._live(candidate, now)
+                    if current is None or current.numbers != mentioned:
+                        continue
+                    score = self.similarity(signature, current.signature)
+                    if score >= self.threshold and (best is None or score > best[1]):
+                        best = (current, score)
+                if best is not None:
+                    entry, similarity = best
+                    tier = "near"
+
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+
+            self._counters[f"{tier}_hits"] += 1
+            entry.hits += 1
+            self._entries.move_to_end(entry.key)
+            if metrics is not None and evaluation_key(metrics) in entry.evaluations:
+                self._counters["evaluation_hits"] += 1
+            return CacheHit(
+                key=entry.key,
+                tier=tier,
+                similarity=similarity,
+                response=entry.response,
+                evaluations=dict(entry.evaluations),
+            )
+
+    def put(self, prompt, context, response, namespace=None, evaluations=None) -> str:
+        """Cache a response and return its key, for attaching evaluations later"""
+        namespace = self.namespace_for(context, namespace)
+        key = self._key(namespace, prompt)
+        entry = CacheEntry(
+            key=key,
+            namespace=namespace,
+            prompt=prompt,
+            response=response,
+            signature=self.signature(prompt),
+            numbers=numbers(prompt),
+            expires_at=time.time() + self.ttl,
+            evaluations=dict(evaluations or {}),
+        )
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            for bucket in self._bands(namespace, entry.signature):
+                self._buckets.setdefault(bucket, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._counters["evictions"] += 1
+        return key
+
+    def attach_evaluation(self, key, metrics, evaluation) -> None:
+        """Store the evaluation of a cached response for the given metrics"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.evaluations[evaluation_key(metrics)] = evaluation
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            counters["entries"] = len(self._entries)
+        hits = counters["exact_hits"] + counters["near_hits"]
+        counters["hit_rate"] = hits / counters["lookups"] if counters["lookups"] else 0.0
+        return counters
+
+    def _live(self, key, now):
+        """The entry under `key` unless it has expired (which removes it); lock held"""
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at < now:
+            self._remove(key)
+            self._counters["expired"] += 1
+            return None
+        return entry
+
+    def _remove(self, key) -> None:
+        entry = self._entries.pop(key)
+        for bucket in self._bands(entry.namespace, entry.signature):
+            keys = self._buckets.get(bucket)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._buckets[bucket]
+
+
+def default_response_cache():
+    """
+    ResponseCache configured from the environment, or None when disabled.
+
+    RESPONSE_CACHE=true enables it; RESPONSE_CACHE_THRESHOLD (default 0.9),
+    RESPONSE_CACHE_TTL in seconds (default 3600) and RESPONSE_CACHE_MAX_ENTRIES
+    (default 10000) tune it.
+    """
+    if not env_flag("RESPONSE_CACHE"):
+        return None
+    return ResponseCache(
+        threshold=float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.9")),
+        ttl=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+        max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000")),
+    )
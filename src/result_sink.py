@@ -0,0 +1,347 @@
+from datetime import datetime
+from env_policy import Shared
+import atexit, gzip, json, logging, os, queue, sqlite3, threading, time
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class ResultSink:
+    """
+    Base class for buffered result sinks with a background writer thread.
+
+    write() only puts the record on a bounded queue; the writer thread drains
+    it in batches of up to batch_size records, or whatever arrived within
+    flush_interval seconds, and hands each batch to _write_batch. When the
+    queue is full, write() blocks for up to put_timeout seconds so a slow disk
+    pushes back on the producers instead of growing memory without bound.
+
+    Attributes:
+        dropped (int): Records dropped because the queue stayed full.
+        written (int): Records handed to the backend.
+    """
+
+    def __init__(self, max_queue=10000, batch_size=500, flush_interval=1.0, put_timeout=5.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.dropped = 0
+        self.written = 0
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name=f"{type(self).__name__}-writer", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, record) -> bool:
+        """Queue a record for writing; returns False if it had to be dropped"""
+        if self._closed:
+            raise RuntimeError("Result sink is closed")
+        try:
+            self._queue.put(record, timeout=self.put_timeout)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logger.error("Result sink queue is full, dropping record")
+            return False
+
+    def flush(self) -> None:
+        """Block until every queued record has been written"""
+        self._queue.join()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            batch = []
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                try:
+                    self._on_idle()
+                except Exception as e:
+                    # A failed rotation must not stop the writer, or write() and
+                    # close() would wait on a queue nobody drains
+                    logger.error(f"Result sink maintenance failed: {str(e)}")
+                continue
+            deadline = time.monotonic() + self.flush_interval
+            item = first
+            while True:
+                if item is _STOP:
+                    stop = True
+                    self._queue.task_done()
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+
+            if batch:
+                try:
+                    self._write_batch(batch)
+                    self.written += len(batch)
+                except Exception as e:
+                    logger.error(f"Failed to write {len(batch)} results: {str(e)}")
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+
+        # Backends are owned by the writer thread (SQLite requires it)
+        try:
+            self._close_backend()
+        except Exception as e:
+            logger.error(f"Failed to close the result sink: {str(e)}")
+
+    def _on_idle(self) -> None:
+        """Called when no record arrived within flush_interval"""
+
+    def _write_batch(self, records) -> None:
+        raise NotImplementedError
+
+    def _close_backend(self) -> None:
+        pass
+
+
+class NullSink:
+    """Sink that discards every record, for callers that keep the results themselves"""
+
+    dropped = 0
+    written = 0
+
+    def write(self, record) -> bool:
+        return True
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class RotatingFileSink(ResultSink):
+    """
+    File sink that starts a new file once the current one reaches max_bytes
+    or has been open for max_age seconds. Files are named
+    <prefix>_<YYYYMMDD_HHMMSS>_<sequence>.<extension> so rotations within the
+    same second never collide.
+    """
+
+    extension = ""
+
+    def __init__(
+        self,
+        directory=".",
+        prefix="response",
+        max_bytes=64 * 1024 * 1024,
+        max_age=3600,
+        compression=None,
+        **kwargs,
+    ):
+        if compression not in (None, "gzip", "zstd"):
+            raise ValueError(f"Unsupported compression: {compression}")
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.compression = compression
+        self.path = None
+        self._opened_at = 0.0
+        self._sequence = 0
+        os.makedirs(directory, exist_ok=True)
+        super().__init__(**kwargs)
+
+    def _next_path(self) -> str:
+        self._sequence += 1
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return os.path.join(
+            self.directory,
+            f"{self.prefix}_{timestamp}_{self._sequence:04d}{self.extension}",
+        )
+
+    def _should_rotate(self) -> bool:
+        if self.path is None:
+            return True
+        if time.monotonic() - self._opened_at >= self.max_age:
+            return True
+        return self._current_size() >= self.max_bytes
+
+    def _current_size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def _on_idle(self) -> None:
+        if self.path is not None and time.monotonic() - self._opened_at >= self.max_age:
+            self._rotate()
+
+    def _rotate(self) -> None:
+        self._close_backend()
+        self.path = self._next_path()
+        self._opened_at = time.monotonic()
+        self._open_backend(self.path)
+        logger.info(f"Writing results to {self.path}")
+
+    def _write_batch(self, records) -> None:
+        if self._should_rotate():
+            self._rotate()
+        self._write_records(records)
+
+    def _open_backend(self, path) -> None:
+        raise NotImplementedError
+
+    def _write_records(self, records) -> None:
+        raise NotImplementedError
+
+
+class JsonlSink(RotatingFileSink):
+    """Writes one JSON document per line, optionally gzip or zstd compressed"""
+
+    def __init__(self, *args, **kwargs):
+        if kwargs.get("compression") == "zstd":
+            import zstandard  # noqa: F401 - fail here rather than in the writer thread
+        self._file = None
+        super().__init__(*args, **kwargs)
+
+    @property
+    def extension(self):
+        return {None: ".jsonl", "gzip": ".jsonl.gz", "zstd": ".jsonl.zst"}[
+            self.compression
+        ]
+
+    def _open_backend(self, path) -> None:
+        if self.compression == "gzip":
+            self._file = gzip.open(path, "at", encoding="utf-8")
+        elif self.compression == "zstd":
+            import zstandard
+
+            raw = open(path, "ab")
+            self._file = zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+        else:
+            self._file = open(path, "a", encoding="utf-8")
+
+    def _write_records(self, records) -> None:
+        data = "".join(json.dumps(record) + "\n" for record in records)
+        self._file.write(data.encode("utf-8") if self.compression == "zstd" else data)
+        self._file.flush()
+
+    def _close_backend(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ParquetSink(RotatingFileSink):
+    """Writes batches as Parquet row groups (requires pyarrow)"""
+
+    extension = ".parquet"
+
+    def __init__(self, *args, **kwargs):
+        import pyarrow
+
+        self._pa = pyarrow
+        self._writer = None
+        self._schema = pyarrow.schema(
+            [
+                ("timestamp", pyarrow.string()),
+                ("prompt", pyarrow.string()),
+                ("data", pyarrow.string()),
+            ]
+        )
+        super().__init__(*args, **kwargs)
+
+    def _open_backend(self, path) -> None:
+        import pyarrow.parquet as pq
+
+        self._writer = pq.ParquetWriter(
+            path, self._schema, compression=self.compression or "snappy"
+        )
+
+    def _write_records(self, records) -> None:
+        table = self._pa.table(
+            {
+                "timestamp": [record.get("timestamp") for record in records],
+                "prompt": [record.get("prompt") for record in records],
+                "data": [json.dumps(record.get("data")) for record in records],
+            },
+            schema=self._schema,
+        )
+        self._writer.write_table(table)
+
+    def _close_backend(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class SqliteSink(ResultSink):
+    """Appends results to a single SQLite table, one transaction per batch"""
+
+    def __init__(self, path="responses.sqlite3", **kwargs):
+        self.db_path = path
+        self._db = None
+        super().__init__(**kwargs)
+
+    def _write_batch(self, records) -> None:
+        if self._db is None:
+            # SQLite connections belong to the thread that opened them
+            self._db = sqlite3.connect(self.db_path)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(id INTEGER PRIMARY KEY, timestamp TEXT, prompt TEXT, data TEXT NOT NULL)"
+            )
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(responses)")]
+            if "prompt" not in columns:
+                # Databases written before prompts were saved
+                self._db.execute("ALTER TABLE responses ADD COLUMN prompt TEXT")
+        with self._db:
+            self._db.executemany(
+                "INSERT INTO responses (timestamp, prompt, data) VALUES (?, ?, ?)",
+                [
+                    (record.get("timestamp"), record.get("prompt"), json.dumps(record.get("data")))
+                    for record in records
+                ],
+            )
+
+    def _close_backend(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+def create_sink(kind=None, directory=None, compression=None, **kwargs):
+    """Build the sink selected by RESULT_SINK (jsonl, sqlite, parquet or none)"""
+    kind = kind or os.getenv("RESULT_SINK", "jsonl")
+    if kind == "none":
+        return NullSink()
+    directory = directory or os.getenv("RESULTS_DIR", ".")
+    compression = compression or os.getenv("RESULT_COMPRESSION") or None
+    if kind == "jsonl":
+        return JsonlSink(directory=directory, compression=compression, **kwargs)
+    if kind == "parquet":
+        return ParquetSink(directory=directory, compression=compression, **kwargs)
+    if kind == "sqlite":
+        return SqliteSink(path=os.path.join(directory, "responses.sqlite3"), **kwargs)
+    raise ValueError(f"Unknown result sink: {kind}")
+
+
+_shared = Shared(create_sink)
+
+
+def get_result_sink():
+    """Process-wide create_sink(), so every client shares one writer thread and file"""
+    return _shared.get()
@@ -0,0 +1,142 @@
+from collections import deque
+from dataclasses import dataclass, field
+from env_policy import Shared, policy_from_env
+import logging, threading, time
+
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "always", "adaptive")
+
+
+@dataclass
+class SpeculationPolicy:
+    """
+    When to start generation before the prompt gate has passed, tuned per
+    deployment through SPECULATION_MODE, SPECULATION_MIN_PASS_RATE and the
+    other SPECULATION_* variables.
+
+    "off" waits for the gate, "always" generates alongside it, and
+    "adaptive" generates alongside it while the gate's recent pass rate is
+    at least min_pass_rate.
+    """
+
+    mode: str = "adaptive"
+    min_pass_rate: float = 0.9
+    window: int = 200  # gate outcomes the pass rate is computed over
+    warmup: int = 10  # outcomes before "adaptive" relies on the pass rate
+    max_input_chars: int = 0  # longer prompt + context is never speculated; 0 for no limit
+
+    @classmethod
+    def from_env(cls, defaults=None) -> "SpeculationPolicy":
+        policy = policy_from_env(cls, "SPECULATION", defaults)
+        if policy.mode not in MODES:
+            raise ValueError(f"Unsupported speculation mode: {policy.mode}")
+        return policy
+
+
+@dataclass
+class SpeculativeRun:
+    """A generation started before the gate; usage is filled in by the Claude call"""
+
+    started: float = field(default_factory=time.monotonic)
+    gate_passed_at: float = None
+    usage: dict = field(default_factory=dict)
+    future: object = None
+
+
+class Speculation:
+    """
+    Speculative generation policy and its counters.
+
+    The flows call should_speculate() before starting a generation alongside
+    the gate, record_gate() with every gate outcome, and then commit() the
+    run when its output is used or discard() it when the gate failed. A
+    discarded run that had already finished adds its tokens to the wasted
+    counters; one cancelled in time costs nothing. saved_seconds adds up how
+    long each committed generation had been running when its gate passed.
+    """
+
+    def __init__(self, policy=None):
+        self.policy = policy or SpeculationPolicy()
+        self._outcomes = deque(maxlen=self.policy.window)
+        self._counters = {
+            "started": 0,
+            "skipped": 0,
+            "committed": 0,
+            "discarded": 0,
+            "cancelled": 0,
+            "wasted_input_tokens": 0,
+            "wasted_output_tokens": 0,
+            "saved_seconds": 0.0,
+        }
+        self._lock = threading.Lock()
+
+    def pass_rate(self):
+        with self._lock:
+            if not self._outcomes:
+                return None
+            return sum(self._outcomes) / len(self._outcomes)
+
+    def should_speculate(self, prompt, context=None) -> bool:
+        policy = self.policy
+        speculate = policy.mode != "off"
+        if speculate and policy.max_input_chars:
+            speculate = len(prompt or "") + len(context or "") <= policy.max_input_chars
+        if speculate and policy.mode == "adaptive":
+            with self._lock:
+                outcomes = len(self._outcomes)
+                passed = sum(self._outcomes)
+            if outcomes >= policy.warmup:
+                speculate = passed / outcomes >= policy.min_pass_rate
+        self._count("started" if speculate else "skipped")
+        return speculate
+
+    def start(self) -> SpeculativeRun:
+        return SpeculativeRun()
+
+    def record_gate(self, passed, run=None) -> None:
+        with self._lock:
+            self._outcomes.append(bool(passed))
+        if passed and run is not None:
+            run.gate_passed_at = time.monotonic()
+
+    def commit(self, run) -> None:
+        saved = 0.0
+        if run.gate_passed_at is not None:
+            saved = min(run.gate_passed_at, time.monotonic()) - run.started
+        with self._lock:
+            self._counters["committed"] += 1
+            self._counters["saved_seconds"] += max(saved, 0.0)
+
+    def discard(self, run, cancelled=False) -> None:
+        """Record a speculative generation whose output is thrown away"""
+        if cancelled:
+            self._count("cancelled")
+            return
+        with self._lock:
+            self._counters["discarded"] += 1
+            self._counters["wasted_input_tokens"] += run.usage.get("input_tokens", 0)
+            self._counters["wasted_output_tokens"] += run.usage.get("output_tokens", 0)
+        logger.info(
+            f"Discarded a speculative generation of {run.usage.get('output_tokens', 0)} tokens"
+        )
+
+    def _count(self, name) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+        stats["saved_seconds"] = round(stats["saved_seconds"], 3)
+        stats["mode"] = self.policy.mode
+        stats["gate_pass_rate"] = self.pass_rate()
+        return stats
+
+
+_shared = Shared(lambda: Speculation(SpeculationPolicy.from_env()))
+
+
+def get_speculation() -> Speculation:
+    """Process-wide Speculation, so the gate's pass rate covers every client"""
+    return _shared.get()
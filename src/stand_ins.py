@@ -0,0 +1,180 @@
+from io import BytesIO
+import json, random, threading, time, uuid
+
+
+class FakeInspeqEval:
+    """
+    Stand-in for InspeqEval returning responses shaped like the SDK's.
+
+    Each call sleeps `latency` seconds, plus `per_metric` for every metric
+    and input item evaluated and up to `jitter`, and returns one result per
+    metric and input item; a metric passes with probability `pass_rate`.
+    """
+
+    def __init__(self, latency=0.3, jitter=0.0, pass_rate=1.0, seed=None, per_metric=0.0):
+        self.latency = latency
+        self.per_metric = per_metric
+        self.jitter = jitter
+        self.pass_rate = pass_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def evaluate_llm_task(self, metrics_list, input_data, task_name=None, metrics_config=None):
+        with self._lock:
+            self.calls += 1
+            delay = (
+                self.latency
+                + self.per_metric * len(metrics_list) * len(input_data)
+                + self._random.uniform(0, self.jitter)
+            )
+            draws = [self._random.random() for _ in range(len(metrics_list) * len(input_data))]
+        time.sleep(delay)
+
+        results = []
+        for index, item in enumerate(input_data):
+            data_input_id = str(uuid.uuid4())
+            for position, metric in enumerate(metrics_list):
+                passed = draws[index * len(metrics_list) + position] < self.pass_rate
+                score = 0.9 if passed else 0.1
+                results.append(
+                    {
+                        "id": str(uuid.uuid4()),
+                        "data_input_id": data_input_id,
+                        "task_name": task_name,
+                        "metric_name": f"{metric}_EVALUATION",
+                        "score": score,
+                        "passed": passed,
+                        "evaluation_details": {
+                            "actual_value": score,
+                            "actual_value_type": "FLOAT",
+                            "metric_labels": ["Pass"] if passed else ["Fail"],
+                            "threshold": ["Pass"] if passed else ["Fail"],
+                            "threshold_score": 0.5,
+                        },
+                        "metrics_config": (metrics_config or {}).get(
+                            f"{metric.lower()}_config", {}
+                        ),
+                        "metric_evaluation_status": "EVAL_COMPLETE",
+                        "data_input": item,
+                    }
+                )
+        return {
+            "status": 200,
+            "message": "All LLM evaluations successful",
+            "results": results,
+            "remaining_credits": 1000,
+        }
+
+
+class FakeBedrockRuntime:
+    """Stand-in for the bedrock-runtime client: invoke_model and its streaming variant"""
+
+    def __init__(self, latency=1.0, text=None, chunks=20):
+        self.latency = latency
+        self.text = text or (
+            "Regulatory outlook for 2025\n\n"
+            "Banks across Europe are preparing for new reporting standards. "
+            "This post explains what changes and why it matters."
+        )
+        self.chunks = chunks
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _count(self):
+        with self._lock:
+            self.calls += 1
+
+    def invoke_model(self, modelId, body, **kwargs):
+        self._count()
+        time.sleep(self.latency)
+        payload = {
+            "id": f"msg_{uuid.uuid4().hex[:12]}",
+            "type": "message",
+            "role": "assistant",
+            "model": modelId,
+            "content": [{"type": "text", "text": self.text}],
+            "stop_reason": "end_turn",
+            "usage": {"input_tokens": len(body) // 4, "output_tokens": len(self.text) // 4},
+        }
+        return {"body": BytesIO(json.dumps(payload).encode("utf-8"))}
+
+    def invoke_model_with_response_stream(self, modelId, body, **kwargs):
+        self._count()
+        size = max(1, len(self.text) // self.chunks)
+        pieces = [self.text[i : i + size] for i in range(0, len(self.text), size)]
+
+        def events():
+            for piece in pieces:
+                time.sleep(self.latency / len(pieces))
+                delta = {"type": "content_block_delta", "delta": {"text": piece}}
+                yield {"chunk": {"bytes": json.dumps(delta).encode("utf-8")}}
+
+        return {"body": events()}
+
+
+class FakeBedrockControl:
+    """Stand-in for the bedrock control-plane calls made by the guardrail registry"""
+
+    def __init__(self, latency=0.05):
+        self.latency = latency
+        self.guardrails = {}
+        self.tags = {}
+        self._lock = threading.Lock()
+
+    def list_guardrails(self, guardrailIdentifier=None, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            if guardrailIdentifier:
+                versions = self.guardrails[guardrailIdentifier]["versions"]
+                return {"guardrails": [{"id": guardrailIdentifier, "version": v} for v in versions]}
+            return {"guardrails": [dict(g["summary"]) for g in self.guardrails.values()]}
+
+    def create_guardrail(self, name, tags=None, **config):
+        time.sleep(self.latency)
+        with self._lock:
+            guardrail_id = uuid.uuid4().hex[:12]
+            arn = f"arn:aws:bedrock:us-east-1:000000000000:guardrail/{guardrail_id}"
+            self.guardrails[guardrail_id] = {
+                "summary": {"id": guardrail_id, "arn": arn, "name": name, "version": "DRAFT"},
+                "versions": ["DRAFT"],
+            }
+            self.tags[arn] = list(tags or [])
+            return {"guardrailId": guardrail_id, "guardrailArn": arn, "version": "DRAFT"}
+
+    def update_guardrail(self, guardrailIdentifier, **config):
+        time.sleep(self.latency)
+        return {"guardrailId": guardrailIdentifier}
+
+    def tag_resource(self, resourceARN, tags):
+        with self._lock:
+            keys = {tag["key"] for tag in tags}
+            self.tags[resourceARN] = [
+                t for t in self.tags.get(resourceARN, []) if t["key"] not in keys
+            ] + list(tags)
+        return {}
+
+    def list_tags_for_resource(self, resourceARN):
+        with self._lock:
+            return {"tags": list(self.tags.get(resourceARN, []))}
+
+    def create_guardrail_version(self, guardrailIdentifier, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            versions = self.guardrails[guardrailIdentifier]["versions"]
+            version = str(len(versions))
+            versions.append(version)
+            return {"guardrailId": guardrailIdentifier, "version": version}
+
+
+class RecordingSNS:
+    """Stand-in for SNS that keeps every published message"""
+
+    def __init__(self):
+        self.messages = []
+        self._lock = threading.Lock()
+
+    def publish(self, TopicArn, Message, **kwargs):
+        with self._lock:
+            self.messages.append({"TopicArn": TopicArn, "Message": Message, **kwargs})
+        return {"MessageId": str(uuid.uuid4())}
@@ -0,0 +1,148 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging, re, unicodedata
+
+logger = logging.getLogger(__name__)
+
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+PHONE_PATTERN = re.compile(r"\+?\d[\d\s().-]{8,}\d")
+
+
+class StreamAborted(Exception):
+    """Raised inside a response stream when a safety check fails on a finished chunk"""
+
+    def __init__(self, metric, reason, text=""):
+        super().__init__(f"{metric}: {reason}")
+        self.metric = metric
+        self.reason = reason
+        self.text = text
+
+
+def invisible_text_check(chunk):
+    """Flag format/control characters other than regular whitespace"""
+    for char in chunk:
+        if char in "\n\r\t":
+            continue
+        if unicodedata.category(char) in ("Cf", "Cc", "Co"):
+            return "INVISIBLE_TEXT", f"Invisible character U+{ord(char):04X} in output"
+    return None
+
+
+def pii_check(chunk):
+    """Flag e-mail addresses and phone numbers, mirroring the Bedrock guardrail policy"""
+    if EMAIL_PATTERN.search(chunk):
+        return "DATA_LEAKAGE", "E-mail address in output"
+    if PHONE_PATTERN.search(chunk):
+        return "DATA_LEAKAGE", "Phone number in output"
+    return None
+
+
+DEFAULT_CHECKS = (invisible_text_check, pii_check)
+
+
+class ResponseStreamMonitor:
+    """
+    Runs response checks on finished chunks while the text is still streaming.
+
+    Tokens are buffered until a paragraph ends (a blank line) or the buffer
+    reaches max_chunk_chars. Every finished chunk goes through the cheap local
+    checks inline; when an evaluator and safety_metrics are given, the chunk
+    is also sent to Inspeq on a background thread and a failed metric aborts
+    the stream at the next token, without waiting for the full completion.
+
+    A check is a callable taking the chunk text and returning None or a
+    (metric, reason) tuple.
+    """
+
+    def __init__(
+        self,
+        checks=DEFAULT_CHECKS,
+        evaluator=None,
+        safety_metrics=None,
+        prompt="",
+        context="",
+        max_chunk_chars=2000,
+    ):
+        self.checks = list(checks or [])
+        self.evaluator = evaluator
+        self.safety_metrics = list(safety_metrics or [])
+        self.prompt = prompt
+        self.context = context
+        self.max_chunk_chars = max_chunk_chars
+
+        self.text = ""
+        self._buffer = ""
+        self._pending = []
+        self._executor = None
+        if self.evaluator is not None and self.safety_metrics:
+            self._executor = ThreadPoolExecutor(
+                max_workers=2, thread_name_prefix="stream-eval"
+            )
+
+    def monitor(self, tokens):
+        """Yield tokens as they arrive, raising StreamAborted when a check fails"""
+        try:
+            for token in tokens:
+                self._raise_for_remote_failures(wait=False)
+                self.text += token
+                self._buffer += token
+                yield token
+                self._consume_finished_chunks()
+
+            if self._buffer.strip():
+                self._check_chunk(self._buffer)
+            self._buffer = ""
+            self._raise_for_remote_failures(wait=True)
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _consume_finished_chunks(self) -> None:
+        while True:
+            boundary = self._buffer.find("\n\n")
+            if boundary != -1:
+                chunk, self._buffer = self._buffer[:boundary], self._buffer[boundary + 2 :]
+            elif len(self._buffer) >= self.max_chunk_chars:
+                chunk, self._buffer = self._buffer, ""
+            else:
+                return
+            if chunk.strip():
+                self._check_chunk(chunk)
+
+    def _check_chunk(self, chunk) -> None:
+        for check in self.checks:
+            failure = check(chunk)
+            if failure:
+                metric, reason = failure
+                logger.warning(f"Aborting stream, {metric} check failed: {reason}")
+                raise StreamAborted(metric, reason, self.text)
+
+        if self._executor is not None:
+            self._pending.append(self._executor.submit(self._evaluate_chunk, chunk))
+
+    def _evaluate_chunk(self, chunk):
+        response = self.evaluator.evaluate_llm_task(
+            metrics_list=self.safety_metrics,
+            input_data=[{"prompt": self.prompt, "context": self.context, "response": chunk}],
+            task_name="stream_chunk_evaluation",
+        )
+        for metric in response.get("results", []):
+            if metric.get("passed") is False:
+                return metric.get("metric_name", "UNKNOWN"), "Safety metric failed on chunk"
+        return None
+
+    def _raise_for_remote_failures(self, wait) -> None:
+        still_pending = []
+        for future in self._pending:
+            if not wait and not future.done():
+                still_pending.append(future)
+                continue
+            try:
+                failure = future.result()
+            except Exception as e:
+                logger.error(f"Chunk evaluation failed: {str(e)}")
+                continue
+            if failure:
+                metric, reason = failure
+                logger.warning(f"Aborting stream, {metric} failed: {reason}")
+                raise StreamAborted(metric, reason, self.text)
+        self._pending = still_pending
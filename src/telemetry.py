@@ -0,0 +1,371 @@
+from bisect import bisect_left
+from env_policy import Shared, env_flag
+from functools import wraps
+import json, logging, os, threading, time
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers Inspeq calls (~0.3 s) up to long Claude generations
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# claude_tokens_total "kind" label -> usage field
+TOKEN_KINDS = {
+    "input": "input_tokens",
+    "output": "output_tokens",
+    "cache_write": "cache_creation_input_tokens",
+    "cache_read": "cache_read_input_tokens",
+}
+
+METRIC_HELP = {
+    "pipeline_stage_seconds": "Time spent in each pipeline stage",
+    "http_request_seconds": "API request latency by route and status code",
+    "evaluation_flow_attempts_total": "Evaluation flow attempts by attempt number and outcome",
+    "claude_tokens_total": "Tokens sent to and generated by Claude, including prompt cache reads and writes",
+    "claude_generations_total": "Generations by backend and model tier",
+    "inspeq_remaining_credits": "Inspeq credits left after the latest evaluation",
+    "evaluations_parsed_total": "Inspeq responses parsed by EvaluationParser, by status",
+    "metric_results_total": "Metric results in parsed evaluations, passed or failed",
+    "metric_parse_errors_total": "Metric results that could not be decoded",
+    "lambda_invocations_total": "Lambda invocations by function and status code",
+}
+
+
+class _NoopSpan:
+    """Returned by span() while telemetry is disabled: no clock reads, no locking"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, key, value) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """
+    Times one stage. On exit its duration goes to the pipeline_stage_seconds
+    histogram labelled by stage and outcome ("ok" or "error"), and to the
+    OpenTelemetry span opened alongside it when that hook is on.
+    """
+
+    __slots__ = ("telemetry", "name", "attributes", "_started", "_otel", "_otel_span")
+
+    def __init__(self, telemetry, name, attributes):
+        self.telemetry = telemetry
+        self.name = name
+        self.attributes = attributes
+        self._otel = None
+        self._otel_span = None
+
+    def set(self, key, value) -> None:
+        """Attach an attribute (token counts, attempt number, ...) to the span"""
+        self.attributes[key] = value
+        if self._otel_span is not None and value is not None:
+            self._otel_span.set_attribute(key, value)
+
+    def __enter__(self):
+        tracer = self.telemetry.tracer
+        if tracer is not None:
+            self._otel = tracer.start_as_current_span(self.name, attributes=self.attributes)
+            self._otel_span = self._otel.__enter__()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        duration = time.perf_counter() - self._started
+        outcome = "ok" if exc_type is None else "error"
+        self.telemetry.observe(
+            "pipeline_stage_seconds", duration, stage=self.name, outcome=outcome
+        )
+        for hook in self.telemetry.hooks:
+            try:
+                hook(self.name, duration, dict(self.attributes), exc)
+            except Exception as e:
+                logger.warning(f"Telemetry hook failed: {str(e)}")
+        if self._otel is not None:
+            self._otel.__exit__(exc_type, exc, traceback)
+        return False
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Telemetry:
+    """
+    In-process counters, gauges and latency histograms for the pipeline,
+    with a Prometheus / OpenMetrics text exporter.
+
+    When disabled, span() returns a shared no-op and count(), gauge() and
+    observe() return before touching a lock, so instrumented code pays one
+    attribute check. Hooks are called with (stage, seconds, attributes,
+    exception) after every span; with otel=True each span is also opened
+    as an OpenTelemetry span through the globally configured tracer
+    provider (requires the `opentelemetry-api` package).
+
+    Attributes:
+        enabled (bool): Whether anything is recorded.
+        hooks (list): Callables run after every span.
+        tracer: The OpenTelemetry tracer, or None.
+    """
+
+    def __init__(self, enabled=True, otel=False, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self.hooks = []
+        self.tracer = None
+        self._counters = {}  # (name, labels) -> value
+        self._gauges = {}
+        self._histograms = {}
+        self._help = dict(METRIC_HELP)
+        self._lock = threading.Lock()
+        if enabled and otel:
+            try:
+                from opentelemetry import trace
+
+                self.tracer = trace.get_tracer("inspeq-pipeline")
+            except ImportError:
+                logger.warning("opentelemetry-api is not installed; OpenTelemetry spans are off")
+
+    def span(self, name, **attributes):
+        """Context manager timing the stage `name`"""
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, name, attributes)
+
+    def count(self, name, value=1, **labels) -> None:
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def gauge(self, name, value, **labels) -> None:
+        if not self.enabled or value is None:
+            return
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return  # e.g. Inspeq's "N/A" credits
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name, value, **labels) -> None:
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(self.buckets)
+            histogram.observe(value)
+
+    def count_tokens(self, usage) -> None:
+        """Count the input, output and prompt cache tokens of a usage dict (see prompt_cache.usage_dict)"""
+        if not self.enabled:
+            return
+        for kind, field_name in TOKEN_KINDS.items():
+            if usage.get(field_name):
+                self.count("claude_tokens_total", usage[field_name], kind=kind)
+
+    def describe(self, name, help_text) -> None:
+        """HELP text for a metric family in the exposition"""
+        self._help[name] = help_text
+
+    def add_hook(self, hook) -> None:
+        self.hooks.append(hook)
+
+    def snapshot(self) -> dict:
+        """Counters, gauges and histogram count/sum, keyed by `name{label=value,...}`"""
+        with self._lock:
+            snapshot = {
+                _sample(name, labels): value
+                for (name, labels), value in {**self._counters, **self._gauges}.items()
+            }
+            for (name, labels), histogram in self._histograms.items():
+                snapshot[_sample(name + "_count", labels)] = histogram.count
+                snapshot[_sample(name + "_sum", labels)] = histogram.sum
+        return snapshot
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def render(self, openmetrics=False, extra_gauges=()) -> str:
+        """
+        Text exposition of every metric: Prometheus 0.0.4 format, or
+        OpenMetrics 1.0 with openmetrics=True. extra_gauges is an iterable
+        of (name, labels, value) read at scrape time (resilience,
+        speculation and pool stats).
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = {
+                key: (list(h.counts), h.sum, h.count) for key, h in self._histograms.items()
+            }
+        for name, labels, value in extra_gauges:
+            if isinstance(value, bool):
+                value = int(value)
+            if isinstance(value, (int, float)):
+                gauges[(name, tuple(sorted(labels.items())))] = value
+
+        lines = []
+
+        def family(name, kind, samples, help_name=None):
+            help_text = self._help.get(help_name or name)
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+
+        for name, entries in _by_name(counters).items():
+            # Samples always end in _total; OpenMetrics names the family without it
+            base = name.removesuffix("_total")
+            family(
+                base if openmetrics else base + "_total",
+                "counter",
+                [f"{_sample(base + '_total', labels)} {_number(value)}" for labels, value in entries],
+                help_name=name,
+            )
+        for name, entries in _by_name(gauges).items():
+            family(name, "gauge", [f"{_sample(name, labels)} {_number(value)}" for labels, value in entries])
+        for name, entries in _by_name(histograms).items():
+            samples = []
+            for labels, (counts, total, count) in entries:
+                cumulative = 0
+                for bound, bucket in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    samples.append(
+                        f"{_sample(name + '_bucket', labels + (('le', le),))} {cumulative}"
+                    )
+                samples.append(f"{_sample(name + '_count', labels)} {count}")
+                samples.append(f"{_sample(name + '_sum', labels)} {_number(total)}")
+            family(name, "histogram", samples)
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+def _by_name(metrics) -> dict:
+    grouped = {}
+    for (name, labels), value in sorted(metrics.items(), key=lambda item: item[0]):
+        grouped.setdefault(name, []).append((labels, value))
+    return grouped
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _sample(name, labels) -> str:
+    if not labels:
+        return name
+    return name + "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _number(value) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def stats_gauges(prefix, stats, **labels):
+    """(name, labels, value) for every numeric entry of a stats() dict, for render(extra_gauges=...)"""
+    return [
+        (f"{prefix}_{key}", labels, value)
+        for key, value in stats.items()
+        if isinstance(value, (int, float))
+    ]
+
+
+def instrument_handler(function_name, handler):
+    """
+    Wrap a Lambda handler in a span named after the function, counting
+    invocations by status code and the token usage its body reports. When
+    TELEMETRY_EMF=true it also prints one CloudWatch Embedded Metric Format
+    record per invocation, which CloudWatch turns into metrics without an
+    exporter running in the function.
+    """
+
+    @wraps(handler)
+    def lambda_handler(event, context):
+        telemetry = get_telemetry()
+        if not telemetry.enabled:
+            return handler(event, context)
+        started = time.perf_counter()
+        with telemetry.span(function_name) as span:
+            response = handler(event, context)
+            status = response.get("statusCode") if isinstance(response, dict) else None
+            span.set("status_code", status)
+        duration = time.perf_counter() - started
+        telemetry.count("lambda_invocations_total", function=function_name, status=str(status))
+        body = response.get("body") if isinstance(response, dict) else None
+        usage = (body.get("usage") if isinstance(body, dict) else None) or {}
+        telemetry.count_tokens(usage)
+        if env_flag("TELEMETRY_EMF"):
+            record = {
+                "_aws": {
+                    "Timestamp": int(time.time() * 1000),
+                    "CloudWatchMetrics": [
+                        {
+                            "Namespace": os.getenv("TELEMETRY_NAMESPACE", "InspeqPipeline"),
+                            "Dimensions": [["function"]],
+                            "Metrics": [
+                                {"Name": "duration_ms", "Unit": "Milliseconds"},
+                                {"Name": "errors", "Unit": "Count"},
+                                {"Name": "input_tokens", "Unit": "Count"},
+                                {"Name": "output_tokens", "Unit": "Count"},
+                                {"Name": "cache_read_input_tokens", "Unit": "Count"},
+                                {"Name": "cache_creation_input_tokens", "Unit": "Count"},
+                            ],
+                        }
+                    ],
+                },
+                "function": function_name,
+                "duration_ms": round(duration * 1000, 3),
+                "errors": int(status != 200),
+                "input_tokens": usage.get("input_tokens", 0),
+                "output_tokens": usage.get("output_tokens", 0),
+                "cache_read_input_tokens": usage.get("cache_read_input_tokens", 0),
+                "cache_creation_input_tokens": usage.get("cache_creation_input_tokens", 0),
+            }
+            print(json.dumps(record))
+        return response
+
+    return lambda_handler
+
+
+_shared = Shared(
+    lambda: Telemetry(
+        enabled=env_flag("TELEMETRY"),
+        otel=env_flag("TELEMETRY_OTEL"),
+    )
+)
+
+
+def get_telemetry() -> Telemetry:
+    """
+    Process-wide Telemetry. TELEMETRY=true turns recording on and
+    TELEMETRY_OTEL=true also opens OpenTelemetry spans; both are off by default.
+    """
+    return _shared.get()
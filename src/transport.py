@@ -0,0 +1,278 @@
+from env_policy import Shared
+from inspeq.client import InspeqEval, APIError
+from requests.adapters import HTTPAdapter
+from transport_config import TransportConfig, botocore_config
+import httpx, logging, requests, threading
+
+logger = logging.getLogger(__name__)
+
+
+class _PoolGauge:
+    """In-flight request accounting for one upstream"""
+
+    def __init__(self, name, capacity):
+        self.name = name
+        self.capacity = capacity
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.saturated = 0
+        self._lock = threading.Lock()
+
+    def enter(self) -> None:
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            if self.in_flight > self.capacity:
+                # The request has to wait for a pooled connection
+                self.saturated += 1
+
+    def exit(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "capacity": self.capacity,
+                "saturation": self.in_flight / self.capacity if self.capacity else 0.0,
+                "saturated_requests": self.saturated,
+            }
+
+
+class _GaugedHTTPTransport(httpx.HTTPTransport):
+    def __init__(self, gauge, **kwargs):
+        super().__init__(**kwargs)
+        self.gauge = gauge
+
+    def handle_request(self, request):
+        self.gauge.enter()
+        try:
+            return super().handle_request(request)
+        finally:
+            self.gauge.exit()
+
+    def open_connections(self) -> int:
+        return len(self._pool.connections)
+
+
+class _GaugedAsyncHTTPTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, gauge, **kwargs):
+        super().__init__(**kwargs)
+        self.gauge = gauge
+
+    async def handle_async_request(self, request):
+        self.gauge.enter()
+        try:
+            return await super().handle_async_request(request)
+        finally:
+            self.gauge.exit()
+
+    def open_connections(self) -> int:
+        return len(self._pool.connections)
+
+
+class _GaugedHTTPAdapter(HTTPAdapter):
+    def __init__(self, gauge, **kwargs):
+        self.gauge = gauge
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        self.gauge.enter()
+        try:
+            return super().send(request, **kwargs)
+        finally:
+            self.gauge.exit()
+
+    def open_connections(self) -> int:
+        return sum(
+            pool.num_connections for pool in list(self.poolmanager.pools._container.values())
+        )
+
+
+class PooledInspeqEval(InspeqEval):
+    """
+    InspeqEval sending its requests through a shared requests.Session.
+
+    The SDK calls requests.post, which opens (and TLS-handshakes) a new
+    connection for every evaluation; the payload and error handling here
+    are the SDK's, only the transport differs.
+    """
+
+    def __init__(self, *args, session=None, timeout=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.session = session or requests.Session()
+        self.timeout = timeout
+
+    def evaluate_llm_task(
+        self, metrics_list, input_data, task_name=None, metrics_config=None
+    ):
+        url = f"{self.inspeq_api_url}/api/v2/sdk/evaluate_llm"
+        headers = {"accept": "application/json", "Content-Type": "application/json"}
+        payload = {
+            "request_body": {
+                "project_id": self.inspeq_project_id,
+                "secret_key": self.inspeq_api_key,
+                "metrics": metrics_list,
+                "input_data": input_data,
+                "task_name": task_name,
+            },
+            "metrics_config": metrics_config or {},
+        }
+
+        response = self.session.post(url, headers=headers, json=payload, timeout=self.timeout)
+        if response.status_code == 200:
+            return response.json()
+        error = APIError(
+            f"API call failed with status code {response.status_code}: {response.text}"
+        )
+        # Lets the resilience layer back off on 429s and honour retry-after
+        error.status_code = response.status_code
+        error.retry_after = response.headers.get("retry-after")
+        raise error
+
+
+class SharedTransport:
+    """
+    Builds and owns the pooled HTTP clients used by every AI client in the process.
+
+    Anthropic (sync and async) gets a shared httpx client, Inspeq a shared
+    requests.Session and boto3 a botocore Config with the same pool size and
+    keep-alive. stats() reports requests, in-flight and peak concurrency
+    against pool capacity, and open connections per upstream.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or TransportConfig.from_env()
+        self._lock = threading.Lock()
+        self._anthropic = None
+        self._async_anthropic = None
+        self._inspeq_session = None
+        self._gauges = {
+            name: _PoolGauge(name, self.config.max_connections)
+            for name in ("anthropic", "anthropic_async", "inspeq")
+        }
+
+    def _limits(self):
+        return httpx.Limits(
+            max_connections=self.config.max_connections,
+            max_keepalive_connections=self.config.max_keepalive_connections,
+            keepalive_expiry=self.config.keepalive_expiry,
+        )
+
+    def _http2(self) -> bool:
+        if not self.config.http2:
+            return False
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("HTTP/2 requested but the h2 package is missing, using HTTP/1.1")
+            return False
+        return True
+
+    def _anthropic_timeout(self):
+        return httpx.Timeout(
+            self.config.anthropic_read_timeout, connect=self.config.connect_timeout
+        )
+
+    def anthropic_http_client(self):
+        """Shared httpx.Client for Anthropic(http_client=...)"""
+        from anthropic import DefaultHttpxClient
+
+        with self._lock:
+            if self._anthropic is None:
+                transport = _GaugedHTTPTransport(
+                    self._gauges["anthropic"], limits=self._limits(), http2=self._http2()
+                )
+                self._anthropic = DefaultHttpxClient(
+                    transport=transport, timeout=self._anthropic_timeout()
+                )
+            return self._anthropic
+
+    def async_anthropic_http_client(self):
+        """Shared httpx.AsyncClient for AsyncAnthropic(http_client=...); one event loop per process"""
+        from anthropic import DefaultAsyncHttpxClient
+
+        with self._lock:
+            if self._async_anthropic is None:
+                transport = _GaugedAsyncHTTPTransport(
+                    self._gauges["anthropic_async"],
+                    limits=self._limits(),
+                    http2=self._http2(),
+                )
+                self._async_anthropic = DefaultAsyncHttpxClient(
+                    transport=transport, timeout=self._anthropic_timeout()
+                )
+            return self._async_anthropic
+
+    def inspeq_session(self):
+        """Shared requests.Session with a keep-alive pool for the Inspeq API"""
+        with self._lock:
+            if self._inspeq_session is None:
+                session = requests.Session()
+                adapter = _GaugedHTTPAdapter(
+                    self._gauges["inspeq"],
+                    pool_connections=4,
+                    pool_maxsize=self.config.max_connections,
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._inspeq_session = session
+            return self._inspeq_session
+
+    def inspeq_client(self, api_key, project_id):
+        return PooledInspeqEval(
+            inspeq_api_key=api_key,
+            inspeq_project_id=project_id,
+            session=self.inspeq_session(),
+            timeout=(self.config.connect_timeout, self.config.inspeq_read_timeout),
+        )
+
+    def botocore_config(self, **overrides):
+        """botocore Config with the shared pool size, timeouts and TCP keep-alive"""
+        return botocore_config(self.config, **overrides)
+
+    def stats(self) -> dict:
+        stats = {name: gauge.snapshot() for name, gauge in self._gauges.items()}
+        clients = {
+            "anthropic": self._anthropic,
+            "anthropic_async": self._async_anthropic,
+        }
+        for name, client in clients.items():
+            if client is not None:
+                stats[name]["open_connections"] = client._transport.open_connections()
+        if self._inspeq_session is not None:
+            stats["inspeq"]["open_connections"] = self._inspeq_session.get_adapter(
+                "https://"
+            ).open_connections()
+        return stats
+
+    def close(self) -> None:
+        """Close the sync clients; the async one needs aclose() on its event loop"""
+        with self._lock:
+            if self._anthropic is not None:
+                self._anthropic.close()
+                self._anthropic = None
+            if self._inspeq_session is not None:
+                self._inspeq_session.close()
+                self._inspeq_session = None
+
+    async def aclose(self) -> None:
+        """Close every client, the async Anthropic one included"""
+        with self._lock:
+            client, self._async_anthropic = self._async_anthropic, None
+        if client is not None:
+            await client.aclose()
+        self.close()
+
+
+_shared = Shared(lambda: SharedTransport())
+
+
+def get_transport() -> SharedTransport:
+    """Process-wide SharedTransport, built from the environment on first use"""
+    return _shared.get()
@@ -0,0 +1,45 @@
+from dataclasses import dataclass
+from env_policy import policy_from_env
+
+
+@dataclass
+class TransportConfig:
+    """
+    Connection pool, keep-alive and timeout settings shared by the Anthropic,
+    Inspeq and AWS clients of a process. Every field can be overridden with
+    the matching TRANSPORT_* environment variable (see from_env).
+
+    It lives apart from transport.py, which needs httpx, requests and the
+    Inspeq SDK, so the Lambdas can build their boto3 clients from it too.
+    """
+
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    http2: bool = False
+    connect_timeout: float = 5.0
+    anthropic_read_timeout: float = 120.0
+    inspeq_read_timeout: float = 60.0
+    aws_read_timeout: float = 120.0
+    aws_max_attempts: int = 5
+
+    @classmethod
+    def from_env(cls) -> "TransportConfig":
+        return policy_from_env(cls, "TRANSPORT")
+
+
+def botocore_config(config=None, **overrides):
+    """botocore Config with the shared pool size, timeouts and TCP keep-alive"""
+    from botocore.config import Config
+
+    config = config or TransportConfig.from_env()
+    settings = {
+        "max_pool_connections": config.max_connections,
+        "connect_timeout": config.connect_timeout,
+        "read_timeout": config.aws_read_timeout,
+        "tcp_keepalive": True,
+        # Client-side rate limiting that backs off when AWS throttles
+        "retries": {"mode": "adaptive", "max_attempts": config.aws_max_attempts},
+    }
+    settings.update(overrides)
+    return Config(**settings)
@@ -0,0 +1,6 @@
+import os, sys
+
+# The modules in src/ and the Lambda handlers import each other by bare name
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+for path in ("src", os.path.join("src", "lambda_functions"), "benchmarks"):
+    sys.path.insert(0, os.path.join(ROOT, path))
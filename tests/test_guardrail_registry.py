@@ -0,0 +1,99 @@
+from call_guardrails import (
+    CONFIG_HASH_TAG,
+    GUARDRAIL_CONFIG,
+    FileGuardrailStore,
+    GuardrailRegistry,
+)
+from stand_ins import FakeBedrockControl
+import pytest
+
+
+class CountingControl:
+    """FakeBedrockControl behind a wrapper that counts each control-plane call"""
+
+    def __init__(self):
+        self.fake = FakeBedrockControl(latency=0)
+        self.calls = {}
+
+    def __getattr__(self, name):
+        method = getattr(self.fake, name)
+
+        def counted(*args, **kwargs):
+            self.calls[name] = self.calls.get(name, 0) + 1
+            return method(*args, **kwargs)
+
+        return counted
+
+
+@pytest.fixture
+def store(tmp_path):
+    return FileGuardrailStore(str(tmp_path / "guardrails.json"))
+
+
+def tagged_hash(control, guardrail_id):
+    arn = control.fake.guardrails[guardrail_id]["summary"]["arn"]
+    return next(t["value"] for t in control.fake.tags[arn] if t["key"] == CONFIG_HASH_TAG)
+
+
+def test_miss_creates_one_guardrail_and_persists_it(store):
+    control = CountingControl()
+    registry = GuardrailRegistry(control, store=store)
+
+    record = registry.ensure()
+
+    assert list(control.fake.guardrails) == [record["guardrailIdentifier"]]
+    assert record["guardrailVersion"] == "1"
+    assert tagged_hash(control, record["guardrailIdentifier"]) == registry.config_hash
+    assert store.load(registry.name) == record
+    assert control.calls["create_guardrail"] == 1
+
+
+def test_warm_hit_makes_no_control_plane_calls(store):
+    control = CountingControl()
+    registry = GuardrailRegistry(control, store=store)
+    first = registry.ensure()
+    calls = dict(control.calls)
+
+    assert registry.ensure() is first
+    assert control.calls == calls
+
+
+def test_cold_start_hits_the_persisted_store(store):
+    control = CountingControl()
+    first = GuardrailRegistry(control, store=store).ensure()
+    calls = dict(control.calls)
+
+    # A new container: fresh registry, same store
+    record = GuardrailRegistry(control, store=store).ensure()
+
+    assert record == first
+    assert control.calls == calls
+
+
+def test_without_a_store_the_guardrail_is_found_by_name_and_tag():
+    control = CountingControl()
+    first = GuardrailRegistry(control).ensure()
+
+    record = GuardrailRegistry(control).ensure()
+
+    assert record == first
+    assert len(control.fake.guardrails) == 1
+    assert control.calls["create_guardrail"] == 1
+    assert control.calls["create_guardrail_version"] == 1
+
+
+def test_changed_config_hash_updates_and_versions_the_guardrail(store):
+    control = CountingControl()
+    first = GuardrailRegistry(control, store=store).ensure()
+    changed = dict(GUARDRAIL_CONFIG, description="Blocks PII in prompts and responses.")
+
+    registry = GuardrailRegistry(control, store=store, config=changed)
+    record = registry.ensure()
+
+    assert registry.config_hash != first["configHash"]
+    assert record["guardrailIdentifier"] == first["guardrailIdentifier"]
+    assert record["guardrailVersion"] == "2"
+    assert len(control.fake.guardrails) == 1
+    assert control.calls["update_guardrail"] == 1
+    assert tagged_hash(control, record["guardrailIdentifier"]) == registry.config_hash
+    assert store.load(registry.name)["configHash"] == registry.config_hash
@@ -0,0 +1,135 @@
+from bench_resilience import FakeAPIError, FlakyUpstream
+from resilience import AdaptiveTokenBucket, Upstream, UpstreamPolicy, UpstreamUnavailable
+import pytest, time
+
+PHASE = 60.0
+STAGES = ("healthy", "partial outage", "full outage", "recovered")
+
+
+def flaky(stage, capacity=1000, partial_failure=0.5):
+    """FlakyUpstream held in one stage of its schedule for the length of a test"""
+    upstream = FlakyUpstream(capacity, latency=0, phase=PHASE, partial_failure=partial_failure)
+    move_to(upstream, stage)
+    return upstream
+
+
+def move_to(upstream, stage):
+    upstream.started = time.monotonic() - STAGES.index(stage) * PHASE - 1
+
+
+def attempts(upstream):
+    return sum(upstream.attempts.values())
+
+
+def policy(**overrides):
+    settings = dict(rate=1000.0, burst=1000, max_rate=1000.0, base_delay=0.001, max_delay=0.01)
+    settings.update(overrides)
+    return UpstreamPolicy(**settings)
+
+
+def test_breaker_opens_after_consecutive_failures_and_stops_calling():
+    fake = flaky("full outage")
+    upstream = Upstream("fake", policy(failure_threshold=3, max_attempts=1, recovery_time=60))
+
+    for _ in range(3):
+        with pytest.raises(FakeAPIError):
+            upstream.call(fake)
+    with pytest.raises(UpstreamUnavailable):
+        upstream.call(fake)
+
+    assert upstream.breaker.state == "open"
+    assert attempts(fake) == 3
+    assert upstream.stats()["rejected"] == 1
+
+
+def test_breaker_probes_after_recovery_time_and_closes():
+    fake = flaky("full outage")
+    upstream = Upstream("fake", policy(failure_threshold=2, max_attempts=1, recovery_time=0.05))
+    for _ in range(2):
+        with pytest.raises(FakeAPIError):
+            upstream.call(fake)
+    assert upstream.breaker.state == "open"
+
+    move_to(fake, "recovered")
+    time.sleep(0.06)
+
+    assert upstream.call(fake) == "ok"
+    assert upstream.breaker.state == "closed"
+    assert upstream.breaker.opened == 1
+
+
+def test_failed_probe_reopens_the_circuit():
+    fake = flaky("full outage")
+    upstream = Upstream("fake", policy(failure_threshold=2, max_attempts=1, recovery_time=0.05))
+    for _ in range(2):
+        with pytest.raises(FakeAPIError):
+            upstream.call(fake)
+    time.sleep(0.06)
+
+    with pytest.raises(FakeAPIError):
+        upstream.call(fake)
+
+    assert upstream.breaker.state == "open"
+    assert upstream.breaker.opened == 2
+
+
+def test_throttling_halves_the_rate_and_waits_for_retry_after():
+    # One request per 100 ms slice, so back-to-back calls are answered 429
+    fake = flaky("healthy", capacity=10)
+    upstream = Upstream("fake", policy(rate=100.0, burst=100, max_rate=100.0, max_attempts=3))
+
+    assert [upstream.call(fake) for _ in range(3)] == ["ok"] * 3
+
+    stats = upstream.stats()
+    assert stats["throttled"] >= 1
+    assert stats["successes"] == 3
+    assert stats["circuit"] == "closed"
+    assert upstream.limiter.rate < 100.0
+
+
+def test_token_bucket_decreases_once_per_cooldown():
+    bucket = AdaptiveTokenBucket(rate=40.0, burst=10, min_rate=1.0, max_rate=100.0, cooldown=60)
+
+    bucket.throttled()
+    bucket.throttled()
+
+    assert bucket.rate == 20.0
+    bucket.succeeded()
+    assert bucket.rate == 20.5
+
+
+def test_token_bucket_pauses_callers_until_retry_after():
+    bucket = AdaptiveTokenBucket(rate=100.0, burst=10, min_rate=1.0, max_rate=100.0)
+    assert bucket.reserve() == 0.0
+
+    bucket.throttled(retry_after=0.5)
+
+    assert 0.4 < bucket.reserve() <= 0.5
+
+
+def test_retry_budget_caps_retries_during_an_outage():
+    fake = flaky("full outage")
+    # No budget refill: the first 5 calls spend the 10 initial retry tokens, the rest fail at once
+    upstream = Upstream(
+        "fake",
+        policy(failure_threshold=1000, max_attempts=3, retry_ratio=0, min_retries_per_second=0),
+    )
+
+    for _ in range(20):
+        with pytest.raises(FakeAPIError):
+            upstream.call(fake)
+
+    stats = upstream.stats()
+    assert stats["retries"] == 10
+    assert stats["budget_exhausted"] == 20 - 5
+    assert attempts(fake) == stats["attempts"] == 20 + 10
+
+
+def test_partial_outage_is_retried_to_success():
+    fake = flaky("partial outage", partial_failure=0.3)
+    upstream = Upstream("fake", policy(failure_threshold=1000, max_attempts=5))
+
+    results = [upstream.call(fake) for _ in range(20)]
+
+    assert results == ["ok"] * 20
+    assert upstream.stats()["retries"] > 0